@@ -0,0 +1,66 @@
+# Benchmark: FastTextSplitter vs RecursiveCharacterTextSplitter on a synthetic corpus
+#
+# Usage: python benchmarks/bench_chunker.py [--paragraphs 20000] [--chunk-size 1500] [--chunk-overlap 150]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from config.settings import RAW_DATA_DIR
+from src.chunker import FastTextSplitter
+
+
+def make_text(paragraphs: int, seed: int = 0) -> str:
+    """Paragraphs of random length built from the words of the raw corpus."""
+    words = []
+    for name in sorted(os.listdir(RAW_DATA_DIR)):
+        with open(os.path.join(RAW_DATA_DIR, name), encoding="utf-8") as f:
+            words.extend(f.read().split())
+    words = words or ["war"]
+    rng = random.Random(seed)
+    parts = []
+    for _ in range(paragraphs):
+        parts.append(" ".join(rng.choice(words) for _ in range(rng.randint(5, 400))))
+        parts.append(rng.choice(["\n\n", "\n", "\n\n\n"]))
+    return "".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--paragraphs", type=int, default=20000)
+    parser.add_argument("--chunk-size", type=int, default=1500)
+    parser.add_argument("--chunk-overlap", type=int, default=150)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    text = make_text(args.paragraphs)
+    splitters = {
+        "RecursiveCharacterTextSplitter": RecursiveCharacterTextSplitter(
+            chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap, length_function=len, is_separator_regex=False),
+        "FastTextSplitter": FastTextSplitter(args.chunk_size, args.chunk_overlap),
+    }
+    print(f"Corpus: {len(text) / 1e6:.1f}M characters")
+    best, outputs = {}, {}
+    for name, splitter in splitters.items():
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            outputs[name] = splitter.split_text(text)
+            timings.append(time.perf_counter() - start)
+        best[name] = min(timings)
+        print(f"{name:<32} {len(outputs[name]):>7} chunks  {best[name]:7.3f}s")
+
+    identical = outputs["RecursiveCharacterTextSplitter"] == outputs["FastTextSplitter"]
+    print(f"Identical output: {identical}")
+    print(f"Speedup: {best['RecursiveCharacterTextSplitter'] / best['FastTextSplitter']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Benchmark: fast document loading vs DirectoryLoader on a directory of many files
+#
+# Usage: python benchmarks/bench_loader.py [--files 2000] [--workers 8] [--html 200]
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from config.settings import RAW_DATA_DIR
+from src.file_reader import iter_file_contents
+
+
+def make_corpus(directory: str, files: int, html: int = 0) -> None:
+    """Fill `directory` with copies of the raw corpus split into roughly 8 KB files."""
+    seed = ""
+    for name in sorted(os.listdir(RAW_DATA_DIR)):
+        with open(os.path.join(RAW_DATA_DIR, name), encoding="utf-8") as f:
+            seed += f.read()
+    seed = seed or "World War I was a global conflict. " * 500
+    for i in range(files):
+        offset = (i * 8192) % max(1, len(seed) - 8192)
+        with open(os.path.join(directory, f"doc_{i:05d}.txt"), "w", encoding="utf-8") as f:
+            f.write(seed[offset:offset + 8192])
+    # A few rich-format files exercise the unstructured/process-pool path
+    for i in range(html):
+        with open(os.path.join(directory, f"page_{i:05d}.html"), "w", encoding="utf-8") as f:
+            f.write(f"<html><body><p>{seed[i * 512:(i + 1) * 512]}</p></body></html>")
+
+
+def timed(label: str, fn) -> float:
+    start = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {count:>6} docs  {elapsed:8.3f}s  {count / elapsed:10.1f} docs/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--html", type=int, default=0, help="number of HTML files parsed with unstructured")
+    parser.add_argument("--skip-baseline", action="store_true", help="do not time DirectoryLoader")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_loader_")
+    try:
+        make_corpus(directory, args.files, args.html)
+        timed("fast (single process)", lambda: sum(1 for _ in iter_file_contents(directory, max_workers=1)))
+        fast = timed("fast (process pool)", lambda: sum(1 for _ in iter_file_contents(directory, args.workers)))
+        if not args.skip_baseline:
+            from langchain.document_loaders import DirectoryLoader
+            baseline = timed("DirectoryLoader (unstructured)", lambda: len(DirectoryLoader(directory).load()))
+            print(f"Speedup vs DirectoryLoader: {baseline / fast:.1f}x")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# Benchmark: Parquet intermediate tables vs the CSV files they replace
+#
+# Builds a chunk table and a graph table of the requested size, writes both formats and
+# reads each one in a fresh subprocess, reporting load time and resident memory growth (Linux).
+#
+# Usage: python benchmarks/bench_storage.py [--chunks 20000] [--edges 200000]
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+import pandas as pd
+from config.settings import RAW_DATA_DIR
+from src.storage import write_table, CHUNK_SCHEMA, GRAPH_SCHEMA
+
+READERS = {
+    "csv": "pd.read_csv(path{usecols})",
+    "parquet": "read_table(path{columns})",
+}
+
+
+def make_tables(chunks: int, edges: int) -> tuple:
+    seed = ""
+    for name in sorted(os.listdir(os.path.join(parent_dir, RAW_DATA_DIR))):
+        with open(os.path.join(parent_dir, RAW_DATA_DIR, name), encoding="utf-8") as f:
+            seed += f.read()
+    seed = seed or "World War I was a global conflict. " * 500
+    rng = random.Random(0)
+    offsets = [rng.randrange(max(1, len(seed) - 1500)) for _ in range(chunks)]
+    df_chunks = pd.DataFrame({
+        "Page Content": [seed[o:o + 1500] for o in offsets],
+        "Source": [f"data/raw/doc_{i % 50}.txt" for i in range(chunks)],
+        "chunk_id": [f"{i:032x}" for i in range(chunks)],
+    })
+    # Zipf-like name reuse, as in real extractions where a few entities dominate
+    names = sorted(set(seed.split()))[:max(100, edges // 20)] or ["Germany"]
+    pick = lambda: names[min(int(rng.paretovariate(1.2)) - 1, len(names) - 1)]
+    df_graph = pd.DataFrame({
+        "node_1": [pick() for _ in range(edges)],
+        "node_2": [pick() for _ in range(edges)],
+        "edge": [f"related through event {rng.randrange(5000)}" for _ in range(edges)],
+        "entity": [rng.choice(["Person", "Event", "Country", "Organization"]) for _ in range(edges)],
+        "importance": [rng.randint(1, 5) for _ in range(edges)],
+        "category": [rng.choice(["Historical Event", "Geopolitical Entity", "Historical Figure"]) for _ in range(edges)],
+        "count": [rng.randint(1, 4) for _ in range(edges)],
+    })
+    return df_chunks, df_graph
+
+
+def measure(fmt: str, path: str, columns: list = None) -> dict:
+    """Load `path` in a fresh interpreter and return its load time and RSS growth."""
+    reader = READERS[fmt].format(usecols=f", usecols={columns!r}" if columns else "",
+                                 columns=f", columns={columns!r}" if columns else "")
+    script = f"""
+import json, os, sys, time
+sys.path.insert(0, {parent_dir!r})
+import pandas as pd
+from src.storage import read_table
+def rss_mb():
+    # Resident set size from /proc (Linux); the import-time peak would hide ru_maxrss changes
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+path = {path!r}
+before = rss_mb()
+start = time.perf_counter()
+df = {reader}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "rss_mb": rss_mb() - before, "rows": len(df),
+                  "frame_mb": df.memory_usage(deep=True).sum() / 2**20}}))
+"""
+    out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare CSV and Parquet intermediate tables")
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--edges", type=int, default=200000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_storage_")
+    try:
+        df_chunks, df_graph = make_tables(args.chunks, args.edges)
+        cases = [
+            ("chunks", df_chunks, CHUNK_SCHEMA, None),
+            ("chunks[chunk_id]", df_chunks, CHUNK_SCHEMA, ["chunk_id"]),
+            ("graph", df_graph, GRAPH_SCHEMA, None),
+            ("graph[node_1,node_2,edge]", df_graph, GRAPH_SCHEMA, ["node_1", "node_2", "edge"]),
+        ]
+        print(f"{'table':<28}{'format':<9}{'file MB':>9}{'load s':>9}{'RSS +MB':>9}{'frame MB':>10}")
+        for label, df, schema, columns in cases:
+            name = label.split("[")[0]
+            csv_path = os.path.join(directory, f"{name}.csv")
+            parquet_path = os.path.join(directory, f"{name}.parquet")
+            if not os.path.exists(csv_path):
+                df.to_csv(csv_path, index=False)
+                write_table(df, parquet_path, schema)
+            for fmt, path in (("csv", csv_path), ("parquet", parquet_path)):
+                result = measure(fmt, path, columns)
+                print(f"{label:<28}{fmt:<9}{os.path.getsize(path) / 2**20:>9.1f}{result['seconds']:>9.3f}"
+                      f"{result['rss_mb']:>9.1f}{result['frame_mb']:>10.1f}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
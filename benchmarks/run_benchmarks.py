@@ -0,0 +1,243 @@
+# End-to-end pipeline benchmark against local stubs (no Ollama, Neo4j or network needed)
+#
+# Every stage of the pipeline is timed at several corpus sizes: Wikipedia fetch (local
+# MediaWiki stand-in, cold and from the page cache), document loading, splitting, chunk DataFrame, LLM extraction (fake Ollama server
+# with configurable latency, one chunk per request and batched), Neo4j insert (in-memory sink), the offline query path,
+# the BM25 chunk index and query_graph over a stubbed chain (LLM, Cypher cache, result cache).
+# Results are written as JSON so runs can be compared across commits.
+#
+# Usage: python benchmarks/run_benchmarks.py [--sizes 1 4 16] [--latency 0.05]
+#                                            [--batch-tokens 0] [--compare-batch-tokens 2000]
+#                                            [--compare benchmarks/results/old.json]
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from benchmarks.stubs import FakeOllamaServer, FakeWikipediaServer, InMemoryGraphSink, StubNeo4jGraph, StubCypherChain
+
+RESULTS_DIR = os.path.join(parent_dir, "benchmarks", "results")
+QUESTIONS = [
+    "What happened between Germany and France?",
+    "Who were the Allies?",
+    "How did the Ottoman Empire enter the war?",
+]
+
+
+def read_seed_corpus() -> dict:
+    """Recorded page text keyed by title, taken from the raw data directory."""
+    from config.settings import RAW_DATA_DIR
+    raw_dir = os.path.join(parent_dir, RAW_DATA_DIR)
+    pages = {}
+    for name in sorted(os.listdir(raw_dir)):
+        with open(os.path.join(raw_dir, name), encoding="utf-8") as f:
+            pages[os.path.splitext(name)[0].replace("_", " ")] = f.read()
+    return pages or {"World War I": "World War I was a global conflict between the Allies and the Central Powers. " * 500}
+
+
+def make_corpus(directory: str, pages: dict, copies: int) -> None:
+    """Write `copies` copies of every recorded page into `directory`."""
+    for i in range(copies):
+        for title, text in pages.items():
+            with open(os.path.join(directory, f"{title.replace(' ', '_')}_{i:04d}.txt"), "w", encoding="utf-8") as f:
+                f.write(text)
+
+
+class StageTimer:
+    """Collects (seconds, items) per stage for one corpus size."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def run(self, stage: str, fn, count=len):
+        start = time.perf_counter()
+        value = fn()
+        elapsed = time.perf_counter() - start
+        items = count(value)
+        self.stages[stage] = {
+            "seconds": round(elapsed, 6),
+            "items": items,
+            "items_per_second": round(items / elapsed, 2) if elapsed > 0 else None,
+        }
+        print(f"  {stage:<26} {items:>8} items  {elapsed:9.3f}s")
+        return value
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=parent_dir, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_size(copies: int, pages: dict, args, ollama: FakeOllamaServer) -> dict:
+    # Imported lazily so OLLAMA_HOST already points at the stub when config.settings is read
+    import src.create_graph as create_graph
+    import src.graph_handler as graph_handler
+    import src.neo4j_client as neo4j_client
+    from src.data_loader import load_documents, split_documents, documents_to_dataframe
+    from src.graph_engine import GraphEngine
+    from src.lexical_index import LexicalIndex
+    from src.metrics import metrics
+    from src.wiki_fetcher import WikiClient, PageCache, fetch_pages
+
+    metrics.reset()
+    timer = StageTimer()
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    cwd = os.getcwd()
+    try:
+        # Every copy is a distinct page; the second pass finds every revision in the page cache
+        recorded = {f"{title} {i}": text for i in range(copies) for title, text in pages.items()}
+        with FakeWikipediaServer(recorded, latency=args.wiki_latency) as wiki:
+            client = WikiClient(api_url=wiki.url, rate=0)
+            cache = PageCache(os.path.join(workdir, "wiki_cache.sqlite"))
+            fetch = lambda: fetch_pages(list(recorded), workers=args.workers, client=client, cache=cache)
+            timer.run("wikipedia_fetch", fetch)
+            timer.stages["wikipedia_fetch"]["requests"] = wiki.requests
+            timer.run("wikipedia_fetch_cached", fetch)
+            timer.stages["wikipedia_fetch_cached"]["requests"] = wiki.requests - timer.stages["wikipedia_fetch"]["requests"]
+            cache.close()
+
+        corpus = os.path.join(workdir, "raw")
+        os.makedirs(corpus)
+        make_corpus(corpus, pages, copies)
+        documents = timer.run("load_documents", lambda: load_documents(corpus))
+        chunks = timer.run("split_documents", lambda: split_documents(documents))
+        df = timer.run("documents_to_dataframe", lambda: documents_to_dataframe(chunks))
+
+        # df_to_graph writes its output table under the working directory; keep it out of the tree
+        os.chdir(workdir)
+        def extract(stage: str, batch_tokens: int):
+            requests_before, usage_before = ollama.requests, dict(graph_handler.token_usage)
+            edges = timer.run(stage, lambda: graph_handler.df_to_graph(
+                df, model="llama3", max_workers=args.workers, use_cache=False, batch_tokens=batch_tokens))
+            timer.stages[stage].update(
+                batch_tokens=batch_tokens, edges=len(edges), llm_requests=ollama.requests - requests_before,
+                prompt_tokens=graph_handler.token_usage["prompt_tokens"] - usage_before["prompt_tokens"],
+                completion_tokens=graph_handler.token_usage["completion_tokens"] - usage_before["completion_tokens"])
+            return edges
+
+        graph = extract("df_to_graph", args.batch_tokens)
+        # The same chunks packed into multi-chunk requests, for the batched/unbatched comparison
+        if args.compare_batch_tokens and args.compare_batch_tokens != args.batch_tokens:
+            extract("df_to_graph_batched", args.compare_batch_tokens)
+
+        sink = InMemoryGraphSink()
+        neo4j_client.close_driver()
+        neo4j_client.GraphDatabase = sink
+        timer.run("insert_neo4j", lambda: graph_handler.insert_dataframe_to_neo4j(graph, workers=args.writers),
+                  count=lambda _: len(graph))
+        timer.stages["insert_neo4j"]["transactions"] = sink.transactions
+
+        engine = timer.run("graph_engine_build", lambda: GraphEngine(sink.edge_dataframe()), count=lambda e: e.edge_count)
+        questions = QUESTIONS * args.queries
+        timer.run("query_offline", lambda: [engine.query(q) for q in questions])
+        timer.run("entity_index_find", lambda: [graph_handler.entity_index.find(q) for q in questions])
+        lexical = LexicalIndex(os.path.join(workdir, "lexical_index"))
+        timer.run("lexical_index_build", lambda: lexical.add(df), count=lambda _: len(df))
+        timer.run("lexical_search", lambda: [lexical.search(q) for q in questions])
+
+        # query_graph with the chain and Neo4jGraph stubbed, so the Cypher cache, validation, result
+        # cache and ranking run as in the app; the chain waits the Ollama latency per call
+        neo4j_graph = StubNeo4jGraph(sink)
+        chain = StubCypherChain(neo4j_graph, latency=args.latency)
+        create_graph.get_graph = lambda: neo4j_graph
+        create_graph.get_chain = lambda force_refresh=False: chain
+        create_graph.get_lexical_index = lambda: lexical
+        create_graph.cypher_cache.clear()
+        create_graph.result_cache.clear()
+
+        def query_graph(stage: str, qs: list, **kwargs):
+            paths = Counter()
+
+            def run():
+                for q in qs:
+                    paths[create_graph.query_path(create_graph.query_graph(q, **kwargs))] += 1
+                return qs
+            timer.run(stage, run)
+            timer.stages[stage]["paths"] = dict(paths)
+
+        query_graph("query_graph_chain", QUESTIONS, use_fast_path=False)
+        query_graph("query_graph_result_cache", questions, use_fast_path=False)
+        sink.version += 1  # a write: cached results are stale, cached Cypher is re-run
+        query_graph("query_graph_cypher_cache", QUESTIONS, use_fast_path=False)
+        query_graph("query_graph_fast_path", questions)
+        timer.stages["query_graph_chain"]["chain_calls"] = chain.calls
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+    # Histograms and counters recorded by the pipeline itself (LLM latency, transactions, ...)
+    timer.stages["pipeline_metrics"] = metrics.report()
+    return timer.stages
+
+
+def compare(report: dict, baseline_path: str) -> None:
+    """Print per-stage time deltas against an earlier report."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nComparison with {baseline_path} ({baseline.get('revision')} -> {report['revision']}):")
+    for size, stages in report["sizes"].items():
+        old_stages = baseline.get("sizes", {}).get(size, {})
+        for stage, result in stages.items():
+            old = old_stages.get(stage)
+            if not old or not old.get("seconds") or "seconds" not in result:
+                continue
+            change = (result["seconds"] - old["seconds"]) / old["seconds"] * 100
+            print(f"  x{size:<4} {stage:<26} {old['seconds']:9.3f}s -> {result['seconds']:9.3f}s  {change:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage against local stubs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 16], help="corpus copies per run")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Ollama latency per request (s)")
+    parser.add_argument("--wiki-latency", type=float, default=0.02, help="fake Wikipedia API latency per request (s)")
+    parser.add_argument("--workers", type=int, default=4, help="extraction workers")
+    parser.add_argument("--writers", type=int, default=4, help="concurrent Neo4j writer threads")
+    parser.add_argument("--batch-tokens", type=int, default=0, help="extraction batch budget (0 disables batching)")
+    parser.add_argument("--compare-batch-tokens", type=int, default=2000,
+                        help="batch budget of the extra df_to_graph_batched run (0 skips it)")
+    parser.add_argument("--queries", type=int, default=100, help="repetitions of the question set")
+    parser.add_argument("--output", default=None, help="report path (default: benchmarks/results/<revision>.json)")
+    parser.add_argument("--compare", default=None, help="earlier report to diff against")
+    args = parser.parse_args()
+
+    with FakeOllamaServer(latency=args.latency) as ollama:
+        os.environ["OLLAMA_HOST"] = ollama.url
+        pages = read_seed_corpus()
+        report = {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "ollama_latency": args.latency,
+            "workers": args.workers,
+            "batch_tokens": args.batch_tokens,
+            "compare_batch_tokens": args.compare_batch_tokens,
+            "sizes": {},
+        }
+        for copies in args.sizes:
+            print(f"Corpus x{copies}:")
+            report["sizes"][str(copies)] = run_size(copies, pages, args, ollama)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['revision']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {output}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
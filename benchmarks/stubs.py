@@ -0,0 +1,337 @@
+# Local stand-ins for Ollama, Wikipedia and Neo4j used by the benchmark suite
+
+import json
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+_CAPITALISED = re.compile(r"\b[A-Z][a-z]+(?: [A-Z][a-z]+)*\b")
+
+
+def canned_extraction(prompt: str, edges_per_chunk: int = 6) -> str:
+    """Plausible extraction JSON built from the capitalised terms of each context in the prompt.
+
+    Handles single-chunk prompts and the batched `### chunk cN` layout, so the graph the
+    benchmark builds grows with the corpus the way a real model's would.
+    """
+    def edges_for(context: str) -> list:
+        terms = list(dict.fromkeys(_CAPITALISED.findall(context)))[:edges_per_chunk + 1]
+        return [{"node_1": a, "node_2": b, "edge": "mentioned with", "entity": "Concept",
+                 "importance": 3, "category": "Term"} for a, b in zip(terms, terms[1:])]
+
+    batched = re.findall(r"### chunk (c\d+)\n```(.*?)```", prompt, flags=re.S)
+    if batched:
+        return json.dumps({label: {"nodes": edges_for(context)} for label, context in batched})
+    # The system prompt itself mentions ```, so take the chunk from the last `context:` block
+    context = prompt.rpartition("context: ```")[2]
+    return json.dumps({"nodes": edges_for(context.rsplit("```", 1)[0])})
+
+
+class FakeOllamaServer:
+    """Minimal Ollama HTTP API (/api/chat, /api/generate, /api/tags) served from a thread.
+
+    Every request sleeps `latency` seconds and then answers with `responder(prompt)`, streamed
+    as NDJSON in pieces of `piece_size` characters when the client asks for streaming.
+    Prompt/eval token counts are estimated at four characters per token.
+    """
+
+    def __init__(self, latency: float = 0.0, responder=canned_extraction, host: str = "127.0.0.1",
+                 port: int = 0, piece_size: int = 32):
+        self.latency = latency
+        self.responder = responder
+        self.piece_size = piece_size
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body: bytes, content_type: str = "application/json"):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.startswith("/api/tags"):
+                    self._send(json.dumps({"models": [{"name": "llama3"}]}).encode())
+                else:
+                    self._send(b"Ollama is running", "text/plain")
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                chat = self.path.startswith("/api/chat")
+                prompt = "\n".join(m.get("content", "") for m in payload.get("messages", [])) if chat \
+                    else payload.get("prompt", "")
+                with stub._lock:
+                    stub.requests += 1
+                time.sleep(stub.latency)
+                content = stub.responder(prompt)
+                model = payload.get("model", "llama3")
+
+                def message(text: str, done: bool) -> dict:
+                    body = {"model": model, "created_at": "2024-01-01T00:00:00Z", "done": done}
+                    if chat:
+                        body["message"] = {"role": "assistant", "content": text}
+                    else:
+                        body["response"] = text
+                    if done:
+                        body.update(done_reason="stop", prompt_eval_count=len(prompt) // 4,
+                                    eval_count=len(content) // 4, total_duration=int(stub.latency * 1e9))
+                    return body
+
+                if payload.get("stream", True):
+                    pieces = [content[i:i + stub.piece_size] for i in range(0, len(content), stub.piece_size)]
+                    lines = [json.dumps(message(piece, False)) for piece in pieces]
+                    lines.append(json.dumps(message("", True)))
+                    self._send(("\n".join(lines) + "\n").encode(), "application/x-ndjson")
+                else:
+                    self._send(json.dumps(message(content, True)).encode())
+
+        return Handler
+
+
+class FakeWikipediaServer:
+    """The subset of the MediaWiki Action API used by src.wiki_fetcher, served from a thread.
+
+    `pages` maps titles to recorded text and `categories` maps category titles to member titles
+    (subcategories included, as "Category:..." titles). Revision ids are derived from the text,
+    so `edit` gives a page a new revision. Every request sleeps `latency` seconds.
+    """
+
+    def __init__(self, pages: dict, categories: dict = None, latency: float = 0.0, host: str = "127.0.0.1",
+                 port: int = 0):
+        self.pages = dict(pages)
+        self.categories = categories or {}
+        self.latency = latency
+        self.requests = 0
+        self.content_requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-wikipedia", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/w/api.php"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def edit(self, title: str, text: str) -> None:
+        self.pages[title] = text
+
+    def revid(self, title: str) -> int:
+        return zlib.crc32(self.pages[title].encode("utf-8"))
+
+    def answer(self, params: dict) -> dict:
+        titles = params["titles"].split("|") if "titles" in params else []
+        if params.get("list") == "categorymembers":
+            members = [{"ns": 14 if m.startswith("Category:") else 0, "title": m}
+                       for m in self.categories.get(params["cmtitle"], [])]
+            return {"query": {"categorymembers": members}}
+        if params.get("prop") == "revisions":
+            pages = [{"title": t, "revisions": [{"revid": self.revid(t)}]} if t in self.pages
+                     else {"title": t, "missing": True} for t in titles]
+            return {"query": {"pages": pages}}
+        if params.get("prop") == "extracts":
+            with self._lock:
+                self.content_requests += 1
+            return {"query": {"pages": [{"title": t, "extract": self.pages.get(t, "")} for t in titles]}}
+        return {"error": {"code": "badparams"}}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                time.sleep(server.latency)
+                params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                body = json.dumps(server.answer(params)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+class _SinkResult:
+    """The part of a driver result the pipeline uses: `single()`, `consume()` and iteration."""
+
+    def __init__(self, record: dict = None):
+        self.record = record
+
+    def single(self):
+        return self.record
+
+    def consume(self):
+        return None
+
+    def __iter__(self):
+        return iter([self.record] if self.record is not None else [])
+
+
+class InMemoryGraphSink:
+    """Drop-in for `neo4j.GraphDatabase` that applies the UNWIND edge batches to Python dicts.
+
+    Nodes are merged on name and relationships on (node_1, node_2, type), as the real
+    MERGE query does; the graph version kept on :GraphMeta is a counter. Transaction and
+    statement counts are kept for the report.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.relationships = {}
+        self.version = 0
+        self.transactions = 0
+        self.statements = 0
+        self._lock = threading.Lock()
+
+    # GraphDatabase.driver(...) / driver.session(...) / context managers
+    def driver(self, *args, **kwargs):
+        return self
+
+    def session(self, *args, **kwargs):
+        return self
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute_write(self, fn, *args, **kwargs):
+        with self._lock:
+            self.transactions += 1
+        return fn(self, *args, **kwargs)
+
+    def run(self, query: str, parameters: dict = None, **kwargs):
+        params = {**(parameters or {}), **kwargs}
+        with self._lock:
+            self.statements += 1
+            for row in params.get("rows", []) if "UNWIND $rows" in query else []:
+                self.nodes.setdefault(row["node_1"], {}).update(row["node1_props"])
+                self.nodes.setdefault(row["node_2"], {}).update(row["node2_props"])
+                key = (row["node_1"], row["node_2"], row["edge"])
+                props = self.relationships.setdefault(key, {})
+                props.update(row["edge_props"])
+                props["importance"] = max((value for value in (props.get("importance"), row["importance"])
+                                           if value is not None), default=None)
+                known = props.setdefault("chunk_ids", [])
+                fresh = [i for i, chunk_id in enumerate(row["chunk_ids"]) if chunk_id not in known]
+                known.extend(row["chunk_ids"][i] for i in fresh)
+                props["count"] = props.get("count", 0) + sum(row["chunk_counts"][i] for i in fresh) \
+                    if row["chunk_ids"] else row["count"] or props.get("count") or 1
+            if "GraphMeta" in query:
+                if "SET m.version" in query:
+                    self.version += 1
+                return _SinkResult({"version": self.version})
+        return _SinkResult()
+
+    def edge_dataframe(self):
+        """The stored graph as a node_1/node_2/edge/... DataFrame, e.g. for GraphEngine."""
+        import pandas as pd
+        rows = [(a, b, edge, self.nodes[a].get("entity"), props.get("importance"), props.get("category"))
+                for (a, b, edge), props in self.relationships.items()]
+        return pd.DataFrame(rows, columns=["node_1", "node_2", "edge", "entity", "importance", "category"])
+
+
+class StubNeo4jGraph:
+    """`langchain.graphs.Neo4jGraph` over an InMemoryGraphSink, for the query path.
+
+    Answers the queries src.create_graph sends: EXPLAIN (always valid), the graph version,
+    node names, the `$names` neighbourhood and generated Cypher filtering on
+    `name CONTAINS '...'`. Records have the chain's n/relatedNode/type(r)/properties(r) shape.
+    """
+
+    def __init__(self, sink: InMemoryGraphSink):
+        self.sink = sink
+        self.queries = 0
+
+    def record(self, key: tuple, props: dict) -> dict:
+        a, b, edge = key
+        return {"n": {"name": a, **self.sink.nodes.get(a, {})},
+                "relatedNode": {"name": b, **self.sink.nodes.get(b, {})},
+                "type(r)": "RELATIONSHIP", "properties(r)": {**props, "relationship": edge}}
+
+    def query(self, query: str, params: dict = None) -> list:
+        params = params or {}
+        self.queries += 1
+        if query.startswith("EXPLAIN"):
+            return []
+        if "GraphMeta" in query:
+            return [{"version": self.sink.version}]
+        if "RETURN n.name AS name" in query:
+            return [{"name": name} for name in self.sink.nodes]
+        if "names" in params:
+            names = set(params["names"])
+            rows = [self.record(key, props) for key, props in self.sink.relationships.items()
+                    if key[0] in names or key[1] in names]
+            return rows[:params.get("limit", len(rows))]
+        terms = re.findall(r"CONTAINS '([^']*)'", query)
+        return [self.record(key, props) for key, props in self.sink.relationships.items()
+                if any(term in key[0] or term in key[1] for term in terms)]
+
+
+class StubCypherChain:
+    """GraphCypherQAChain stand-in: waits `latency` seconds for the "LLM", then runs a CONTAINS query.
+
+    Returns the chain's return_direct/intermediate_steps shape, so the Cypher cache, validation
+    and result cache in src.create_graph are exercised as with the real chain.
+    """
+
+    def __init__(self, graph: StubNeo4jGraph, latency: float = 0.0):
+        self.graph = graph
+        self.latency = latency
+        self.calls = 0
+
+    def invoke(self, question: str) -> dict:
+        self.calls += 1
+        time.sleep(self.latency)
+        terms = _CAPITALISED.findall(question) or [question]
+        cypher = ("MATCH (n:Node)-[r:RELATIONSHIP]->(relatedNode)\nWHERE "
+                  + " OR ".join(f"n.name CONTAINS '{t}' OR relatedNode.name CONTAINS '{t}'" for t in terms)
+                  + "\nRETURN n, relatedNode, type(r), properties(r)")
+        return {"query": question, "result": self.graph.query(cypher), "intermediate_steps": [{"query": cypher}]}
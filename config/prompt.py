@@ -0,0 +1,39 @@
+# Prompt templates
+
+# Bump whenever GRAPH_SYS_PROMPT changes so cached extractions are not reused
+GRAPH_PROMPT_VERSION = "1"
+
+GRAPH_SYS_PROMPT = (
+    "You are a network graph maker who extracts terms and their relations from a given context. "
+    "You are provided with a context chunk (delimited by ```) Your task is to extract the ontology "
+    "of terms mentioned in the given context. These terms should represent the key concepts as per the context. \n"
+    "Thought 1: While traversing through each sentence, Think about the key terms mentioned in it.\n"
+        "\tTerms may include object, entity, location, organization, person, \n"
+        "\tcondition, acronym, documents, service, concept, etc.\n"
+        "\tTerms should be as atomistic as possible\n\n"
+    "Thought 2: Think about how these terms can have one on one relation with other terms.\n"
+        "\tTerms that are mentioned in the same sentence or the same paragraph are typically related to each other.\n"
+        "\tTerms can be related to many other terms\n\n"
+    "Thought 3: Find out the relation between each such related pair of terms. \n\n"
+    "Format your output as a list of json. Each element of the list contains a pair of terms"
+    "and the relation between them, like the following: \n"
+    "   {\n"
+    '       "node_1": "A concept from extracted ontology",\n'
+    '       "node_2": "A related concept from extracted ontology",\n'
+    '       "edge": "relationship between the two concepts, node_1 and node_2 in one or two sentences"\n'
+    '       "entity": The Concept,\n'
+    '       "importance": The contextual importance of the concept on a scale of 1 to 5 (5 being the highest),\n'
+    '       "category": The Type of Concept,\n'
+    "   }, {...}\n Strictly the response should be in JSON format\n"
+)
+
+# Appended to GRAPH_SYS_PROMPT when several chunks are packed into one request
+GRAPH_BATCH_INSTRUCTIONS = (
+    "You are given several context chunks. Each chunk starts with a line `### chunk <id>` and is "
+    "delimited by ```. Extract the terms and relations of every chunk separately, never mixing "
+    "terms from different chunks.\n"
+    "Respond with one JSON object whose keys are the chunk ids and whose values are objects of the form "
+    '{"nodes": [ ...the list described above for that chunk... ]}, e.g. '
+    '{"c0": {"nodes": [...]}, "c1": {"nodes": [...]}}. Include every chunk id, using an empty list '
+    "when a chunk has no relations.\n"
+)
@@ -1,14 +1,106 @@
 # Configuration & Constants
 
+import os
+
 NEO4J_URL = "bolt://localhost:7687"
 NEO4J_DATABASE = "neo4j"
 NEO4J_USER = "neo4j"
 NEO4J_PASSWORD = "pass1234"
 AUTH = (NEO4J_USER, NEO4J_PASSWORD)
+NEO4J_BATCH_SIZE = 1000          # edges per UNWIND write transaction
+NEO4J_MAX_RETRY_TIME = 30.0      # seconds a transaction is retried on transient errors
+NEO4J_MAX_POOL_SIZE = 50         # connections held by the shared driver
+NEO4J_ACQUISITION_TIMEOUT = 60.0 # seconds to wait for a free pooled connection
+NEO4J_WRITE_WORKERS = 4          # concurrent writer threads; 1 writes batches sequentially
+NEO4J_WRITE_PARTITIONS = 0       # node-name hash partitions for parallel writes; 0 means 2 x workers
 
 RAW_DATA_DIR = "data/raw"
 OUTPUT_DIR = "output"
 WIKI_TOPIC = "World War I"
 WIKI_OUTPUT_FILE = "World war 1.txt"
 
+# Wikipedia ingestion (pages are written to WIKI_PAGES_DIR, inside the corpus)
+WIKI_TOPICS = []                 # extra page titles to ingest
+WIKI_CATEGORIES = []             # categories whose articles are ingested, e.g. "World War I"
+WIKI_CATEGORY_DEPTH = 0          # levels of subcategories to descend into
+WIKI_PAGES_DIR = "data/raw/wikipedia"
+WIKI_API_URL = os.environ.get("WIKI_API_URL", "https://en.wikipedia.org/w/api.php")
+WIKI_FETCH_WORKERS = 4           # concurrent page downloads
+WIKI_RATE_LIMIT = 5.0            # API requests per second across all workers; 0 disables the limit
+WIKI_TIMEOUT = 30                # seconds per API request
+WIKI_RETRIES = 3                 # extra attempts on throttling, server or network errors
+WIKI_USER_AGENT = "webscrapqa/1.0 (knowledge graph ingestion)"
+WIKI_CACHE_PATH = "output/wiki_cache.sqlite"        # compressed page text keyed by title + revision id
+
+# Intermediate tables (Parquet; dictionary-encoded names, memory-mapped reads)
+CHUNKS_TABLE = "output/chunks.parquet"
+GRAPH_TABLE = "output/graph.parquet"                 # resolved graph, input to the Neo4j insert and offline engine
+EXTRACTED_EDGES_TABLE = "output/extracted_edges.parquet"  # raw df_to_graph output before resolution
+STREAM_EDGES_DIR = "output/stream_edges"             # one part file per streaming run, appended per batch
+PARQUET_COMPRESSION = "zstd"
+PARQUET_ROW_GROUP_SIZE = 64 * 1024
+
+# LLM extraction
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+EXTRACTION_WORKERS = 4          # concurrent requests sent to the Ollama server
+EXTRACTION_TIMEOUT = 120        # seconds before a single chunk request is abandoned
+EXTRACTION_RETRIES = 2          # extra attempts per chunk after a failure
+EXTRACTION_BACKOFF = 1.0        # base delay (seconds) between retries, doubled each attempt
+EXTRACTION_BATCH_TOKENS = 2000  # prompt-token budget for multi-chunk requests; 0 sends one chunk per request
+CHARS_PER_TOKEN = 4             # rough characters-per-token ratio used when packing batches
+
+# Extraction cache (re-runs only send new or changed chunks to the LLM)
+EXTRACTION_CACHE_PATH = "output/extraction_cache.sqlite"
+EXTRACTION_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Streaming pipeline
+STREAM_QUEUE_SIZE = 64                              # max items buffered between stages
+STREAM_CHECKPOINT_FILE = "output/stream_checkpoint.txt"
+STREAM_FLUSH_CHUNKS = 64                            # commit after this many chunks even if the edge batch is not full
+STREAM_FLUSH_BYTES = 4 * 1024 * 1024                # ... or once the pending chunk text reaches this size
+
+# Background ingestion (Streamlit app)
+INGEST_STATE_FILE = "output/ingest_state.json"      # corpus fingerprint each ingestion stage last completed for
+
+# Incremental sync
+SYNC_DELETE_BATCH = 500          # stale chunks retracted per write transaction
+
+# Entity resolution
+RESOLUTION_THRESHOLD = 0.85      # trigram cosine similarity above which two names are merged
+RESOLUTION_MAX_BLOCK = 500       # tokens shared by more names than this are not used for blocking
+
+# Lexical retrieval (BM25 over chunk text)
+LEXICAL_INDEX_DIR = "output/lexical_index"
+LEXICAL_TOP_K = 5                # chunks returned with every answer
+LEXICAL_MAX_SEGMENTS = 8         # segments allowed before they are merged into one
+LEXICAL_ENTITY_CHUNKS = 3        # top chunks scanned for entity names when the question names none
+LEXICAL_MAX_ENTITIES = 5         # entities taken from those chunks for the graph neighbourhood
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Graph analytics (node properties written after ingestion, used to rank answers)
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOLERANCE = 1e-6        # L1 change between iterations at which PageRank stops
+PAGERANK_MAX_ITER = 100
+COMMUNITY_MAX_ITER = 30          # label propagation rounds
+
+# Query path
+SCHEMA_CHECK_INTERVAL = 60       # seconds between graph schema checks for the shared chain
+CYPHER_CACHE_SIZE = 512          # questions kept in the generated-Cypher cache
+CYPHER_CACHE_TTL = 3600          # seconds a cached Cypher query stays valid
+RESULT_CACHE_SIZE = 1024         # query results kept for the current graph version
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024  # approximate memory bound of the result cache
+FAST_PATH_LIMIT = 200            # max relationships returned by the entity-index fast path
+RESULT_TOP_K = 50                # relationships returned (and rendered) per answer, highest PageRank first
+QUERY_PAGE_SIZE = 25             # relationships per page when results are paginated and streamed
+QUERY_FETCH_SIZE = 100           # records the driver pulls per round trip while streaming a result
+SUMMARY_MAX_RECORDS = 30         # relationships of a page given to the LLM for the streamed summary
+
+# Instrumentation
+METRICS_PREFIX = "webscrapqa"                          # namespace of the exported Prometheus series
+METRICS_REPORT_FILE = "output/run_report.json"
+METRICS_PROMETHEUS_FILE = "output/metrics.prom"
+PROFILE_STAGE = os.environ.get("PROFILE_STAGE")       # stage name to capture with cProfile, e.g. "extract"
+PROFILE_DIR = "output/profiles"
+
 DB_URI = 'your_database_uri_here'
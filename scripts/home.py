@@ -1,19 +1,58 @@
+import json
 import os
 import sys
 import streamlit as st
-import numpy as np
-import pandas as pd
 
 # Ensure the parent directory is in sys.path to resolve modules like config.settings
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
-from config.settings import RAW_DATA_DIR, OUTPUT_DIR, WIKI_TOPIC, WIKI_OUTPUT_FILE
-from src.text_processor import get_wikipedia_content, write_text_to_file
-from src.data_loader import load_documents, split_documents, documents_to_dataframe
-from src.graph_handler import df_to_graph, initialise_neo4j_schema, insert_dataframe_to_neo4j
-from src.create_graph import generate_chain
+from config.settings import RAW_DATA_DIR, CHUNKS_TABLE, GRAPH_TABLE
+from src.file_reader import corpus_fingerprint
+from src.ingestion import IngestionJob, load_ingest_state
+
+# Streamlit re-runs this script on every interaction. Only cheap modules are imported above;
+# everything heavy (langchain, neo4j, pyarrow, ingestion) sits behind the caches below, so a
+# rerun costs only what the interaction itself needs.
+
+
+@st.cache_resource
+def ingestion_job() -> IngestionJob:
+    """One background ingestion job per server process, shared by every session."""
+    return IngestionJob()
+
+
+@st.cache_resource(show_spinner="Connecting to the knowledge graph... ⏳")
+def query_api():
+    """The query module (LangChain, Neo4j driver, chain and caches), imported once per process."""
+    from src import create_graph
+    return create_graph
+
+
+def file_fingerprint(path: str) -> tuple:
+    """Cache key for a table on disk: changes whenever the file (or part directory) is rewritten."""
+    if not os.path.exists(path):
+        return (path, None)
+    return (path, os.path.getmtime(path), os.path.getsize(path))
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def cached_corpus_fingerprint(path: str) -> str:
+    """Corpus fingerprint for the status panel; the corpus walk runs at most every 30 seconds."""
+    return corpus_fingerprint(path)
+
+
+@st.cache_data(show_spinner=False)
+def table_preview(fingerprint: tuple, rows: int = 5) -> tuple:
+    """(row count, first rows) of a table; re-read only when its fingerprint changes."""
+    from src.storage import read_table, table_exists
+    path = fingerprint[0]
+    if not table_exists(path):
+        return 0, None
+    df = read_table(path)
+    return len(df), df.head(rows)
+
 
 # 🌟 --- Streamlit UI ---
 st.set_page_config(page_title="Graph Query Pipeline", page_icon="🕵️‍♂️", layout="wide")
@@ -23,99 +62,153 @@ with st.sidebar:
     # st.image("https://upload.wikimedia.org/wikipedia/commons/8/8e/Neo4j-logo.png", width=200)
     st.markdown("### ⚡ **Graph Query Pipeline**")
     st.info("This app extracts Wikipedia content, builds a Neo4j graph, and translates natural language into Cypher queries.")
-    # st.markdown("#### 🔗 **Quick Links**")
-    # st.markdown("[📖 Neo4j Docs](https://neo4j.com/docs/)")
-    # st.markdown("[🛠 LangChain](https://python.langchain.com/)")
-    # st.markdown("[📊 Streamlit](https://streamlit.io/)")
+
+    # ✅ Ingestion runs as an explicit background job instead of on every rerun
+    st.markdown("#### 🛠 **Ingestion**")
+    job = ingestion_job()
+    progress = job.snapshot()
+    ingest_state = load_ingest_state()
+    ingested = ingest_state.get("sync")
+    if ingest_state.get("failed_chunks"):
+        st.warning(f"{ingest_state['failed_chunks']} chunk(s) failed extraction in the last run; "
+                   "run the ingestion again to retry them.")
+    elif ingested is None:
+        st.warning("The graph has not been ingested yet.")
+    elif ingested != cached_corpus_fingerprint(RAW_DATA_DIR):
+        st.warning("The corpus changed since the last ingestion.")
+    else:
+        st.success("✅ The graph is up to date with the corpus.")
+
+    if job.running:
+        st.info(f"⏳ Running: **{progress['stage']}** ({progress['seconds']:.0f}s)")
+        st.button("🔄 Refresh status", on_click=cached_corpus_fingerprint.clear)
+    elif st.button("🚀 Run ingestion"):
+        job.start(model="llama3")
+        st.rerun()
+    if progress["status"] == "done":
+        st.success(f"Last run finished in {progress['seconds']:.1f}s: {progress['totals']}")
+    elif progress["status"] == "failed":
+        st.error(f"Last run failed during {progress['stage']}: {progress['error']}")
 
 # 🌟 Header Section
 st.title("🕵️ Graph Query Pipeline")
 st.subheader("🔎 Extract insights from Wikipedia, build a knowledge graph, and explore relationships!")
 
-# ✅ Step 1: Get Wikipedia content
-with st.expander("📖 Fetch Wikipedia Content"):
-    if not os.path.exists(WIKI_OUTPUT_FILE):
-        st.info("Fetching content from Wikipedia... ⏳")
-        wiki_text = get_wikipedia_content(WIKI_TOPIC)
-        write_text_to_file(WIKI_OUTPUT_FILE, wiki_text)
-        st.success("✅ Wikipedia content saved successfully.")
+# ✅ Previews of the current intermediate tables (cached until the files change)
+with st.expander("📂 Document Chunks"):
+    count, preview = table_preview(file_fingerprint(CHUNKS_TABLE))
+    if preview is None:
+        st.info("No chunk table yet — run the ingestion job from the sidebar.")
     else:
-        st.success("✅ Wikipedia content already exists.")
+        st.write(f"📊 **{count} chunk(s).** Data preview:")
+        st.dataframe(preview)
 
-# ✅ Step 2: Load and process documents
-with st.expander("📂 Load & Process Documents"):
-    documents = load_documents(RAW_DATA_DIR)
-    pages = split_documents(documents)
-    df_chunks = documents_to_dataframe(pages)
+with st.expander("📊 Graph Data"):
+    count, preview = table_preview(file_fingerprint(GRAPH_TABLE))
+    if preview is None:
+        st.info("No exported graph table yet.")
+    else:
+        st.write(f"📌 **{count} edge(s).** Graph data preview:")
+        st.dataframe(preview)
 
-    st.success("✅ Documents successfully loaded and split into pages!")
-    st.write("📊 **Data Preview:**")
-    st.dataframe(df_chunks.head(5))
+# ✅ Query the Graph using Natural Language
+st.markdown("---")
+st.subheader("🔍 Query the Knowledge Graph")
 
-# ✅ Step 3: Create or load graph DataFrame
-with st.expander("📊 Generate Graph DataFrame"):
-    graph_csv = os.path.join(OUTPUT_DIR, "graph.csv")
+query = st.text_input("✍️ **Enter your graph query:**", "")
+summarise = st.checkbox("📝 Summarise each page with the LLM", value=True)
 
-    if not os.path.exists(graph_csv):
-        st.info("Generating graph DataFrame... ⏳")
-        df_graph = df_to_graph(df_chunks.head(1), model="llama3")
-        df_graph.replace("", np.nan, inplace=True)
-        df_graph["count"] = 4  # Default count value
 
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-        df_graph.to_csv(graph_csv, index=False)
-        df_chunks.to_csv(os.path.join(OUTPUT_DIR, "chunks.csv"), index=False)
+def render_record(item: dict) -> None:
+    n = item.get("n", {})
+    relatedNode = item.get("relatedNode", {})
+    relationshipType = item.get("type(r)", "Unknown")
+    relationshipProperties = item.get("properties(r)", {})
 
-        st.success("✅ Graph data saved!")
-    else:
-        st.success("✅ Graph CSV already exists, loading data...")
-        df_graph = pd.read_csv(graph_csv)
+    with st.expander(f"🔗 {n.get('name', 'Unknown')} ➝ {relatedNode.get('name', 'Unknown')}"):
+        st.markdown(f"**🔹 Entity:** `{n.get('name', 'Unknown')}` ({n.get('category', 'N/A')})")
+        st.markdown(f"**🔹 Relationship:** `{relationshipType}`")
+        st.markdown(f"**🔹 Related To:** `{relatedNode.get('name', 'Unknown')}` ({relatedNode.get('category', 'N/A')})")
+        st.markdown(f"**🔹 Relationship Details:** `{relationshipProperties.get('relationship', 'No details')}`")
 
-    st.write("📌 **Graph Data Preview:**")
-    st.dataframe(df_graph.head(5))
 
-# ✅ Step 4: Initialize Neo4j Schema & Insert Data
-with st.expander("🛠 Initialize & Insert Data into Neo4j"):
-    st.info("Setting up Neo4j schema & inserting data...")
-    initialise_neo4j_schema()
-    insert_dataframe_to_neo4j(df_graph)
-    st.success("✅ Data successfully inserted into Neo4j!")
+# The question and the cursors of the pages visited so far live in the session, so paging
+# re-runs only the query for the page being shown
+def open_page(cursor: dict) -> None:
+    st.session_state["cursors"].append(cursor)
 
-# ✅ Step 5: Query the Graph using Natural Language
-st.markdown("---")
-st.subheader("🔍 Query the Knowledge Graph")
 
-query = st.text_input("✍️ **Enter your graph query:**", "")
+def previous_page() -> None:
+    st.session_state["cursors"].pop()
+
+
+def page_key(api, question: str, cursor) -> tuple:
+    """Identity of a rendered page; its query and summary are only re-run when this changes."""
+    try:
+        version = api.graph_version(api.get_graph())
+    except Exception:
+        # Offline answers come from the graph table, which changes when it is rewritten
+        version = file_fingerprint(GRAPH_TABLE)
+    return question, json.dumps(cursor, sort_keys=True, default=str), version
+
 
 if st.button("🚀 Run Query"):
-    with st.spinner("Processing your query... ⏳"):
-        chain = generate_chain()
-        response = chain.invoke(query)
-
-        # Extract full context from the response
-        full_context = response.get("full_context") or response.get("result", [])
-
-        # ✅ Display Results in a Better UI
-        if isinstance(full_context, list):
-            st.subheader("📊 **Extracted Relationships**")
-            for item in full_context:
-                n = item.get("n", {})
-                relatedNode = item.get("relatedNode", {})
-                relationshipType = item.get("type(r)", "Unknown")
-                relationshipProperties = item.get("properties(r)", {})
-
-                with st.expander(f"🔗 {n.get('name', 'Unknown')} ➝ {relatedNode.get('name', 'Unknown')}"):
-                    st.markdown(f"**🔹 Entity:** `{n.get('name', 'Unknown')}` ({n.get('category', 'N/A')})")
-                    st.markdown(f"**🔹 Relationship:** `{relationshipType}`")
-                    st.markdown(f"**🔹 Related To:** `{relatedNode.get('name', 'Unknown')}` ({relatedNode.get('category', 'N/A')})")
-                    st.markdown(f"**🔹 Relationship Details:** `{relationshipProperties.get('relationship', 'No details')}`")
-
-        elif isinstance(full_context, str):
-            st.subheader("📜 **Summary Response**")
-            st.write(full_context)
+    st.session_state.update(question=query, cursors=[None])
+
+question = st.session_state.get("question")
+if question:
+    api = query_api()
+    cursors = st.session_state["cursors"]
+    key = page_key(api, question, cursors[-1])
+    page = st.session_state.get("page")
+
+    st.subheader(f"📊 **Extracted Relationships** (page {len(cursors)})")
+    timing = st.empty()
+    if page is None or page["key"] != key:
+        # ✅ Records are rendered as they arrive instead of after the whole result is in
+        timing.caption("⏳ Waiting for the first result...")
+        stream = api.ResultStream(question, cursor=cursors[-1])
+        for item in stream:
+            render_record(item)
+        page = {"key": key, "records": stream.records, "next_cursor": stream.next_cursor, "path": stream.path,
+                "result_cached": stream.result_cached, "chunks": stream.chunks, "summary": None,
+                "first_result_seconds": stream.first_result_seconds, "seconds": stream.seconds}
+        st.session_state["page"] = page
+    else:
+        # Reruns from other widgets redraw the page without querying again
+        for item in page["records"]:
+            render_record(item)
+    if not page["records"]:
+        st.info("No relationships found for this question.")
+    source = "result cache" if page["result_cached"] else page["path"]
+    timing.caption(f"⚡ First result after {page['first_result_seconds']:.2f}s · page complete in "
+                   f"{page['seconds']:.2f}s · {len(page['records'])} relationship(s) via {source}")
+
+    previous_column, next_column = st.columns(2)
+    with previous_column:
+        if len(cursors) > 1:
+            st.button("⬅️ Previous page", on_click=previous_page)
+    with next_column:
+        if page["next_cursor"] is not None:
+            st.button("Next page ➡️", on_click=open_page, args=(page["next_cursor"],))
+
+    # ✅ The LLM summary streams token by token below the records it summarises, once per page
+    if summarise and page["records"]:
+        st.subheader("📜 **Summary Response**")
+        if page["summary"] is None:
+            page["summary"] = st.write_stream(api.stream_summary(question, page["records"]))
         else:
-            st.error("⚠️ Unexpected response format!")
-            st.write(response)
+            st.markdown(page["summary"])
+
+    stats = api.result_cache.stats()
+    st.caption(f"Result cache: {stats['hits']} hit(s), {stats['misses']} miss(es), {stats['size']} entries "
+               f"at graph version {stats['version']} · Cypher cache hit rate {api.cypher_cache.stats()['hit_rate']:.0%}")
+
+    if page["chunks"]:
+        st.subheader("📄 **Supporting Passages**")
+        for hit in page["chunks"]:
+            with st.expander(f"{os.path.basename(hit['source'])} (score {hit['score']:.2f})"):
+                st.write(hit["text"])
 
 st.markdown("---")
 st.markdown("👨‍💻 **Built with ❤️ using Streamlit, Neo4j & LangChain** 🚀")
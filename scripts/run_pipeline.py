@@ -1,3 +1,4 @@
+import argparse
 import os
 import sys
 
@@ -11,10 +12,35 @@ import pandas as pd
 
 
 from config.settings import RAW_DATA_DIR, OUTPUT_DIR, WIKI_TOPIC, WIKI_OUTPUT_FILE
+from config.settings import METRICS_REPORT_FILE, METRICS_PROMETHEUS_FILE, CHUNKS_TABLE, GRAPH_TABLE
+from config.settings import WIKI_TOPICS, WIKI_CATEGORIES, WIKI_CATEGORY_DEPTH
 from src.text_processor import get_wikipedia_content, write_text_to_file
 from src.data_loader import load_documents, split_documents, documents_to_dataframe
 from src.graph_handler import df_to_graph, initialise_neo4j_schema, insert_dataframe_to_neo4j, execute_with_fallback
-from src.create_graph import generate_chain
+from src.create_graph import ResultStream, stream_summary
+from src.entity_resolution import resolve_graph
+from src.streaming_pipeline import run_streaming_pipeline
+from src.graph_sync import sync_graph
+from src.graph_analytics import update_graph_analytics
+from src.ingestion import fetch_stage
+from src.lexical_index import get_lexical_index
+from src.metrics import metrics
+from src.storage import write_table, read_table, table_exists, convert_csv, CHUNK_SCHEMA, GRAPH_SCHEMA
+
+def main_streaming():
+    # Streams load -> split -> extract -> insert with bounded memory and resumes from the checkpoint file
+    fetch_stage([], [])
+    initialise_neo4j_schema()
+    run_streaming_pipeline(RAW_DATA_DIR, model="llama3")
+    update_graph_analytics()
+
+def main_sync():
+    # Re-extracts only new or changed chunks and retracts edges of chunks that disappeared
+    initialise_neo4j_schema()
+    df_chunks = documents_to_dataframe(split_documents(load_documents(RAW_DATA_DIR)))
+    write_table(df_chunks, CHUNKS_TABLE, CHUNK_SCHEMA)
+    sync_graph(df_chunks, model="llama3")
+    update_graph_analytics()
 
 def main():
     # Step 1: Get content from Wikipedia
@@ -22,72 +48,100 @@ def main():
         print("Fetching content from Wikipedia...")
         wiki_text = get_wikipedia_content(WIKI_TOPIC)
         write_text_to_file(WIKI_OUTPUT_FILE, wiki_text)
-
         print("Wikipedia content saved.")
-        # Step 2: Load raw documents and split into pages
-        documents = load_documents(RAW_DATA_DIR)
-        pages = split_documents(documents)
-
 
-        print("Documents loaded and split into pages.")
-        # Step 3: Create DataFrame from pages and generate unique chunk IDs
-        df_chunks = documents_to_dataframe(pages)
+    # Step 2: Load raw documents and split into pages
+    documents = load_documents(RAW_DATA_DIR)
+    pages = split_documents(documents)
+    print("Documents loaded and split into pages.")
 
+    # Step 3: Create DataFrame from pages and generate unique chunk IDs
+    df_chunks = documents_to_dataframe(pages)
+    print("DataFrame created from pages.")
+    # The chunk table and lexical index follow the corpus whichever way the graph table is obtained
+    write_table(df_chunks, CHUNKS_TABLE, CHUNK_SCHEMA)
+    print(f"Indexed {get_lexical_index().add(df_chunks)} new chunk(s) for lexical retrieval")
 
-        print("DataFrame created from pages.")
 # Process a subset for testing
-    if not os.path.exists(os.path.join(OUTPUT_DIR, "graph.csv")):
+    # Graphs saved as CSV by earlier versions are converted once instead of re-extracted
+    if not table_exists(GRAPH_TABLE) and not convert_csv(os.path.join(OUTPUT_DIR, "graph.csv"), GRAPH_TABLE, GRAPH_SCHEMA):
         df_graph = df_to_graph(df_chunks.head(1), model="llama3")
         df_graph.replace("", np.nan, inplace=True)
         # df_graph.dropna(subset=["node_1", "node_2", "edge"], inplace=True)
-        df_graph["count"] = 4  # default value
+        df_graph = resolve_graph(df_graph)  # merges duplicate entities/edges and sets a real count
     
     # Save intermediate outputs
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-        df_graph.to_csv(os.path.join(OUTPUT_DIR, "graph.csv"), index=False)
-        df_chunks.to_csv(os.path.join(OUTPUT_DIR, "chunks.csv"), index=False)
-        print("CSV files exported.")
+        write_table(df_graph, GRAPH_TABLE, GRAPH_SCHEMA)
+        print("Intermediate tables exported.")
     else:
-        df_graph = pd.read_csv(os.path.join(OUTPUT_DIR, "graph.csv"))
+        df_graph = read_table(GRAPH_TABLE)
         
     # Step 4: Initialise Neo4j and insert graph data
     initialise_neo4j_schema()
     insert_dataframe_to_neo4j(df_graph)
+    update_graph_analytics()  # degree / PageRank / community used to rank query results
     
     # Step 5: Execute a sample query on the graph
 
-    chain = generate_chain()
     # sample_query = "tell about Hitler"
     # result = execute_with_fallback(sample_query, chain)
     # print("Query Result:", result)
-    # ✅ Invoke the Chain
+    # ✅ Stream the first page of the answer; records print as they arrive
     query = "tell about Japan and China"
-    response = chain.invoke(query)  # OR response = chain.run(query)
-
-    # ✅ Extract Full Context (Avoid Iterating Over String)
-    full_context = response.get("full_context") or response.get("result", [])
-
-    # ✅ Check if full_context is a list (structured data) or just a plain string
-    if isinstance(full_context, list):  
-        print("\n🔹 **Extracted Relationships** 🔹\n")
-        for item in full_context:
-            n = item.get("n", {})
-            relatedNode = item.get("relatedNode", {})
-            relationshipType = item.get("type(r)", "Unknown")  # Adjusted key
-            relationshipProperties = item.get("properties(r)", {})
-
-            print(f"🌍 Entity: {n.get('name', 'Unknown')} ({n.get('category', 'N/A')})")
-            print(f"🔗 Relationship: {relationshipType}")
-            print(f"➡️ Related To: {relatedNode.get('name', 'Unknown')} ({relatedNode.get('category', 'N/A')})")
-            print(f"📜 Relationship Details: {relationshipProperties.get('relationship', 'No details')}")
-            print("-" * 50)
-
-    elif isinstance(full_context, str):  
-        print("📝 **Summary Response:**", full_context)  # Handle plain text responses properly
-
-    else:
-        print("⚠️ Unexpected response format:", response)
-
+    stream = ResultStream(query)  # shared chain; repeat questions reuse cached Cypher
+
+    print("\n🔹 **Extracted Relationships** 🔹\n")
+    for item in stream:
+        n = item.get("n", {})
+        relatedNode = item.get("relatedNode", {})
+        relationshipType = item.get("type(r)", "Unknown")  # Adjusted key
+        relationshipProperties = item.get("properties(r)", {})
+
+        print(f"🌍 Entity: {n.get('name', 'Unknown')} ({n.get('category', 'N/A')})")
+        print(f"🔗 Relationship: {relationshipType}")
+        print(f"➡️ Related To: {relatedNode.get('name', 'Unknown')} ({relatedNode.get('category', 'N/A')})")
+        print(f"📜 Relationship Details: {relationshipProperties.get('relationship', 'No details')}")
+        print("-" * 50)
+    more = " (more pages available)" if stream.next_cursor is not None else ""
+    print(f"⚡ {len(stream.records)} relationship(s){more}: first after {stream.first_result_seconds:.2f}s, "
+          f"all after {stream.seconds:.2f}s via {stream.path}")
+
+    # ✅ Summary, printed token by token as the LLM produces it
+    if stream.records:
+        print("📝 **Summary Response:** ", end="", flush=True)
+        for token in stream_summary(query, stream.records):
+            print(token, end="", flush=True)
+        print()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build the knowledge graph and run a sample query.")
+    parser.add_argument("--stream", action="store_true",
+                        help="ingest the whole corpus with the streaming pipeline instead of the batch steps")
+    parser.add_argument("--sync", action="store_true",
+                        help="update the graph incrementally from the current corpus, touching only changed chunks")
+    parser.add_argument("--topics", nargs="+", default=WIKI_TOPICS, metavar="TITLE",
+                        help="Wikipedia pages to fetch into the corpus first (re-downloaded only on a new revision)")
+    parser.add_argument("--category", nargs="+", default=WIKI_CATEGORIES, dest="categories", metavar="CATEGORY",
+                        help="Wikipedia categories whose articles are fetched into the corpus")
+    parser.add_argument("--depth", type=int, default=WIKI_CATEGORY_DEPTH, help="subcategory levels to crawl")
+    parser.add_argument("--report", default=METRICS_REPORT_FILE, help="path of the JSON run report")
+    parser.add_argument("--prometheus", nargs="?", const=METRICS_PROMETHEUS_FILE, default=None,
+                        help="also write metrics in Prometheus text format (default path: %(const)s)")
+    parser.add_argument("--profile", metavar="STAGE", default=None,
+                        help="capture a cProfile dump of one stage, e.g. extract or neo4j_insert")
+    args = parser.parse_args()
+    if args.profile:
+        metrics.profile_stage = args.profile
+    try:
+        if args.topics or args.categories:
+            fetch_stage(args.topics, args.categories, args.depth)
+        if args.stream:
+            main_streaming()
+        elif args.sync:
+            main_sync()
+        else:
+            main()
+    finally:
+        metrics.write_report(args.report)
+        if args.prometheus:
+            metrics.write_prometheus(args.prometheus)
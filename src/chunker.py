@@ -0,0 +1,121 @@
+# Offset-based text chunker, a drop-in replacement for RecursiveCharacterTextSplitter
+
+import copy
+import re
+from bisect import bisect_left, bisect_right
+import numpy as np
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+
+class FastTextSplitter:
+    """Recursive character splitter that works on (start, end) offsets into the source text.
+
+    Produces exactly the chunks of LangChain's RecursiveCharacterTextSplitter with its default
+    behaviour (separators kept at the start of the following piece, whitespace stripped,
+    length measured with `len`). Single-character separator positions are found once per
+    text with a vectorised scan, piece boundaries come from binary searches over those
+    positions, and the greedy merge with overlap bisects straight to each chunk boundary
+    instead of re-measuring every piece. No substrings are built until the final chunks
+    are sliced out.
+    """
+
+    def __init__(self, chunk_size: int = 1500, chunk_overlap: int = 150, separators: list = None):
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"Got a larger chunk overlap ({chunk_overlap}) than chunk size ({chunk_size}).")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or DEFAULT_SEPARATORS
+
+    def split_text(self, text: str) -> list:
+        return [text[start:end] for start, end in self.chunk_spans(text)]
+
+    def split_documents(self, documents) -> list:
+        from langchain.schema import Document
+        chunks = []
+        for document in documents:
+            for start, end in self.chunk_spans(document.page_content):
+                chunks.append(Document(page_content=document.page_content[start:end],
+                                       metadata=copy.deepcopy(document.metadata)))
+        return chunks
+
+    def chunk_spans(self, text: str) -> list:
+        """Return the chunks of `text` as (start, end) offsets."""
+        spans = []
+        self._split(text, 0, len(text), 0, {}, spans)
+        return spans
+
+    def _separator_positions(self, text: str, separator: str, start: int, end: int, positions: dict) -> np.ndarray:
+        if len(separator) == 1:
+            # Found once per text, on first use: UTF-32 gives one array element per character
+            if separator not in positions:
+                if "codepoints" not in positions:
+                    positions["codepoints"] = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+                positions[separator] = np.flatnonzero(positions["codepoints"] == ord(separator))
+            found = positions[separator]
+            return found[np.searchsorted(found, start):np.searchsorted(found, end - 1, side="right")]
+        # Multi-character separators are matched within the span itself, as re.split would on the substring
+        pattern = re.compile(re.escape(separator))
+        return np.fromiter((m.start() for m in pattern.finditer(text, start, end)), dtype=np.int64)
+
+    def _split(self, text: str, start: int, end: int, level: int, positions: dict, spans: list) -> None:
+        # Pick the first separator that occurs in this span; "" splits into single characters
+        cuts, next_level = None, len(self.separators)
+        for i in range(level, len(self.separators)):
+            if not self.separators[i]:
+                break
+            found = self._separator_positions(text, self.separators[i], start, end, positions)
+            if found.size:
+                cuts, next_level = found.tolist(), i + 1
+                break
+
+        if cuts is not None:
+            # The separator stays attached to the start of the following piece
+            bounds = cuts + [end] if cuts[0] == start else [start] + cuts + [end]
+        else:
+            bounds = list(range(start, end + 1))
+
+        has_more = next_level < len(self.separators)
+        run_start = 0
+        for piece in range(len(bounds) - 1):
+            if bounds[piece + 1] - bounds[piece] < self.chunk_size:
+                continue
+            if piece > run_start:
+                self._merge(text, bounds[run_start:piece + 1], spans)
+            if has_more:
+                self._split(text, bounds[piece], bounds[piece + 1], next_level, positions, spans)
+            else:
+                spans.append((bounds[piece], bounds[piece + 1]))
+            run_start = piece + 1
+        if run_start < len(bounds) - 1:
+            self._merge(text, bounds[run_start:], spans)
+
+    def _merge(self, text: str, bounds: list, spans: list) -> None:
+        """Greedily pack consecutive pieces into chunks of at most chunk_size with overlap.
+
+        `bounds` holds the piece boundaries; with the separator kept on the pieces, pieces
+        i..j-1 span bounds[i]:bounds[j], so each chunk boundary is one bisect away.
+        """
+        count = len(bounds) - 1
+        first = 0
+        while True:
+            # First piece that would push the window past chunk_size
+            overflow = bisect_right(bounds, bounds[first] + self.chunk_size) - 1
+            if overflow >= count:
+                self._emit(text, bounds[first], bounds[count], spans)
+                return
+            if overflow > first:
+                self._emit(text, bounds[first], bounds[overflow], spans)
+            # Drop pieces from the front until the window fits the overlap and leaves room for the next piece
+            keep_overlap = bisect_left(bounds, bounds[overflow] - self.chunk_overlap)
+            make_room = bisect_left(bounds, bounds[overflow + 1] - self.chunk_size)
+            first = min(max(first, keep_overlap, make_room), overflow)
+
+    @staticmethod
+    def _emit(text: str, start: int, end: int, spans: list) -> None:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            spans.append((start, end))
@@ -1,34 +1,413 @@
+import itertools
+import json
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
 from langchain.chains import GraphCypherQAChain
 from langchain.graphs import Neo4jGraph
-from langchain.chat_models import ChatOllama
 from langchain.prompts import PromptTemplate
 from langchain_ollama import OllamaLLM
+from neo4j.exceptions import ServiceUnavailable
+from config.settings import GRAPH_TABLE, OLLAMA_BASE_URL
+from config.settings import SCHEMA_CHECK_INTERVAL, CYPHER_CACHE_SIZE, CYPHER_CACHE_TTL, FAST_PATH_LIMIT
+from config.settings import RESULT_CACHE_SIZE, RESULT_CACHE_MAX_BYTES, RESULT_TOP_K
+from config.settings import QUERY_PAGE_SIZE, QUERY_FETCH_SIZE, SUMMARY_MAX_RECORDS
+from config.settings import LEXICAL_TOP_K, LEXICAL_ENTITY_CHUNKS, LEXICAL_MAX_ENTITIES
+from src.entity_index import entity_index
+from src.graph_analytics import rank_results
+from src.graph_engine import get_offline_engine
+from src.graph_handler import INTERNAL_LABELS, INTERNAL_RELATIONSHIPS, GRAPH_VERSION_QUERY
+from src.lexical_index import get_lexical_index
+from src.metrics import metrics
+from src.storage import table_exists
+from src import neo4j_client
 
-def generate_chain():
-    # ✅ Use ChatOllama from LangChain
-    llm = ChatOllama(model="llama3", temperature=0)
+OFFLINE_GRAPH_FILE = GRAPH_TABLE
 
-    # ✅ Connect to Neo4j
-    graph = Neo4jGraph(
-        url="bolt://localhost:7687",
-        username="neo4j",
-        password="password"
-    )
+SCHEMA_QUERY = """
+CALL db.labels() YIELD label
+WITH collect(label) AS labels
+CALL db.relationshipTypes() YIELD relationshipType
+RETURN labels, collect(relationshipType) AS relationships;
+"""
 
-    # ✅ Step 1: Get existing labels and relationships
-    schema_query = """
-    CALL db.labels() YIELD label
-    RETURN collect(label) AS labels;
+NODE_NAMES_QUERY = "MATCH (n:Node) RETURN n.name AS name"
+
+# Same result shape as the chain's Cypher prompt, so callers render both paths identically;
+# most central neighbours first (see src/graph_analytics.py)
+NEIGHBOURHOOD_QUERY = """
+MATCH (n:Node)-[r:RELATIONSHIP]-(relatedNode:Node)
+WHERE n.name IN $names
+RETURN n, relatedNode, type(r), properties(r)
+ORDER BY coalesce(relatedNode.pagerank, 0.0) DESC
+LIMIT $limit
+"""
+
+# Keyset-paginated form of the above: rows are ordered by (related PageRank, position) and each page
+# resumes after the last row of the previous one, so no page re-reads and discards the rows before it
+# the way SKIP does. The position tells apart the two directions of a relationship between two $names.
+NEIGHBOURHOOD_PAGE_QUERY = """
+MATCH (n:Node)-[r:RELATIONSHIP]-(relatedNode:Node)
+WHERE n.name IN $names
+WITH n, r, relatedNode, coalesce(relatedNode.pagerank, 0.0) AS score, elementId(r) + '/' + n.name AS position
+WHERE $after IS NULL OR score < $after.score OR (score = $after.score AND position > $after.position)
+RETURN n, relatedNode, type(r), properties(r), score, position
+ORDER BY score DESC, position
+LIMIT $limit
+"""
+
+SUMMARY_PROMPT = """Answer the question using only the facts from the knowledge graph below.
+Be concise and do not mention the facts list itself.
+
+Facts:
+{facts}
+
+Question: {question}
+Answer:"""
+
+# Filler words dropped when normalising questions, so near-repeats share a cache entry
+_QUESTION_STOPWORDS = {"a", "an", "the", "me", "tell", "about", "please", "what", "who", "is", "are", "was", "were"}
+
+
+class CypherCache:
+    """LRU cache from normalised question to validated Cypher, with a per-entry TTL."""
+
+    def __init__(self, max_size: int = CYPHER_CACHE_SIZE, ttl: float = CYPHER_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        words = re.sub(r"[^\w\s]", " ", question.lower()).split()
+        return " ".join(word for word in words if word not in _QUESTION_STOPWORDS)
+
+    def get(self, question: str):
+        key = self.normalize(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                metrics.inc("cache_requests_total", cache="cypher", result="miss")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            metrics.inc("cache_requests_total", cache="cypher", result="hit")
+            return entry[0]
+
+    def put(self, question: str, cypher: str) -> None:
+        key = self.normalize(question)
+        with self._lock:
+            self._entries[key] = (cypher, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+class ResultCache:
+    """LRU cache of query results keyed by (Cypher, parameters), valid for one graph version.
+
+    Writers bump the version stored in the graph (see `bump_graph_version`), so entries are
+    served until the graph actually changes and are all dropped at once when it does.
+    The cache is bounded both in entries and in approximate (serialised) size.
     """
-    labels_result = graph.query(schema_query)
-    existing_labels = labels_result[0]["labels"]
 
-    relationship_query = """
-    CALL db.relationshipTypes() YIELD relationshipType
-    RETURN collect(relationshipType) AS relationships;
+    def __init__(self, max_size: int = RESULT_CACHE_SIZE, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.version = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # key -> (result, size)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(cypher: str, params: dict = None) -> str:
+        return f"{cypher.strip()}\0{json.dumps(params or {}, sort_keys=True, default=str)}"
+
+    def _advance(self, version) -> None:
+        """Move to `version`, dropping every entry, whenever it differs from the cached one.
+
+        Any change counts, not only an increase: a graph that was reset restarts its version
+        lower, and entries from before the reset must not come back once it climbs again.
+        """
+        if version != self.version:
+            self._entries.clear()
+            self.bytes = 0
+            self.version = version
+
+    def get(self, cypher: str, params: dict, version):
+        key = self.key(cypher, params)
+        with self._lock:
+            self._advance(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                metrics.inc("cache_requests_total", cache="result", result="miss")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            metrics.inc("cache_requests_total", cache="result", result="hit")
+            return entry[0]
+
+    def put(self, cypher: str, params: dict, version, result) -> None:
+        size = len(json.dumps(result, default=str))
+        if size > self.max_bytes:
+            return
+        key = self.key(cypher, params)
+        with self._lock:
+            # Lookups move the cache to the current version; a result read before a concurrent
+            # write committed carries the older one and is not stored
+            if self.version is None:
+                self._advance(version)
+            elif version != self.version:
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (result, size)
+            self.bytes += size
+            while len(self._entries) > self.max_size or self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.version = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "bytes": self.bytes,
+                "version": self.version, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+# Process-wide chain state and caches, shared by every caller (and every Streamlit session)
+_state = {"chain": None, "schema": None, "checked_at": 0.0, "llm": None}
+_state_lock = threading.Lock()
+cypher_cache = CypherCache()
+result_cache = ResultCache()
+
+
+def get_graph() -> Neo4jGraph:
+    return neo4j_client.get_graph()
+
+
+def get_llm() -> OllamaLLM:
+    """The shared Ollama LLM used by the chain and the streamed summaries."""
+    if _state["llm"] is None:
+        _state["llm"] = OllamaLLM(model="llama3", base_url=OLLAMA_BASE_URL)
+    return _state["llm"]
+
+
+def get_schema(graph: Neo4jGraph) -> tuple:
+    """Return (labels, relationship types) currently present in the graph, minus sync bookkeeping."""
+    result = graph.query(SCHEMA_QUERY)
+    if not result:
+        return (), ()
+    labels = (label for label in result[0]["labels"] if label not in INTERNAL_LABELS)
+    relationships = (rel for rel in result[0]["relationships"] if rel not in INTERNAL_RELATIONSHIPS)
+    return tuple(sorted(labels)), tuple(sorted(relationships))
+
+
+def get_chain(force_refresh: bool = False) -> GraphCypherQAChain:
+    """Return the shared chain, rebuilding it only when the graph schema has changed.
+
+    The schema is re-read at most every SCHEMA_CHECK_INTERVAL seconds.
     """
-    relationships_result = graph.query(relationship_query)
-    existing_relationships = relationships_result[0]["relationships"]
+    with _state_lock:
+        now = time.monotonic()
+        if _state["chain"] is not None and not force_refresh and now - _state["checked_at"] < SCHEMA_CHECK_INTERVAL:
+            return _state["chain"]
+
+        graph = get_graph()
+        schema = get_schema(graph)
+        _state["checked_at"] = now
+        if _state["chain"] is None or force_refresh or schema != _state["schema"]:
+            _state["chain"] = generate_chain(graph, schema)
+            _state["schema"] = schema
+            # Cypher generated against the old schema may no longer be valid
+            cypher_cache.clear()
+        return _state["chain"]
+
+
+def validate_cypher(graph: Neo4jGraph, cypher: str) -> bool:
+    """Check that Cypher compiles against the current database without executing it."""
+    try:
+        graph.query(f"EXPLAIN {cypher}")
+        return True
+    except Exception as e:
+        print("Generated Cypher failed validation:", e)
+        return False
+
+
+def graph_version(graph: Neo4jGraph) -> int:
+    """Current graph version; 0 for a graph written before versions were recorded."""
+    result = graph.query(GRAPH_VERSION_QUERY)
+    return (result[0]["version"] or 0) if result else 0
+
+
+def run_cached(graph: Neo4jGraph, cypher: str, params: dict = None) -> tuple:
+    """Run read-only Cypher through the result cache; returns (result, served from cache)."""
+    # Read the version first: a write committing while the query runs then invalidates the entry
+    version = graph_version(graph)
+    result = result_cache.get(cypher, params, version)
+    if result is not None:
+        return result, True
+    result = graph.query(cypher, params=params or {})
+    result_cache.put(cypher, params, version, result)
+    return result, False
+
+
+def load_entity_index(graph: Neo4jGraph = None) -> None:
+    """Fill the shared entity index with every Node.name the first time it is needed."""
+    if entity_index.loaded:
+        return
+    graph = graph or get_graph()
+    added = entity_index.add_names(row["name"] for row in graph.query(NODE_NAMES_QUERY))
+    entity_index.loaded = True
+    print(f"Entity index loaded with {added} name(s)")
+
+
+def retrieve_chunks(question: str, k: int = LEXICAL_TOP_K) -> list:
+    """Top-`k` chunks for the question from the local BM25 index; [] until an index has been built."""
+    start = time.perf_counter()
+    hits = get_lexical_index().search(question, k)
+    metrics.observe("lexical_search_seconds", time.perf_counter() - start)
+    return hits
+
+
+def entities_in_chunks(hits: list, chunks: int = LEXICAL_ENTITY_CHUNKS, limit: int = LEXICAL_MAX_ENTITIES) -> list:
+    """The indexed entities mentioned most often in the best-ranked chunks."""
+    counts = Counter(name for hit in hits[:chunks] for name in entity_index.find(hit["text"]))
+    return [name for name, _ in counts.most_common(limit)]
+
+
+def question_entities(question: str, hits: list = None) -> tuple:
+    """(entity names, taken from the chunks) for a question.
+
+    Entities named in the question come first; otherwise those mentioned in the lexical hits.
+    """
+    names = entity_index.find(question)
+    from_chunks = not names and bool(hits)
+    if from_chunks:
+        names = entities_in_chunks(hits)
+    return names, from_chunks
+
+
+def route_query(question: str, limit: int = FAST_PATH_LIMIT, hits: list = None):
+    """Answer directly from the entity index when the question or its best chunks name known entities.
+
+    Returns None when neither names one, so the caller can fall back to the LLM chain.
+    """
+    graph = get_graph()
+    load_entity_index(graph)
+    names, from_chunks = question_entities(question, hits)
+    if not names:
+        return None
+    result, hit = run_cached(graph, NEIGHBOURHOOD_QUERY, {"names": names, "limit": limit})
+    return {"query": question, "result": result, "cypher": NEIGHBOURHOOD_QUERY, "entities": names,
+            "cached": False, "result_cached": hit, "lexical": from_chunks}
+
+
+def query_graph(question: str, use_fast_path: bool = True, offline_fallback: bool = True,
+                top_k: int = RESULT_TOP_K) -> dict:
+    """Answer a question, avoiding the LLM whenever the entity index or the Cypher cache can.
+
+    Returns the same shape as `chain.invoke`: a dict with `query` and `result`, plus the
+    best-matching source chunks under `chunks`. Relationship results are cut to the `top_k`
+    with the highest-PageRank endpoints; `total` holds the count before the cut. If Neo4j is
+    unreachable the question is answered by the embedded engine over the graph table instead.
+    """
+    start = time.perf_counter()
+    with metrics.stage("query", rows_in=1) as stage:
+        hits = retrieve_chunks(question)
+        try:
+            response = _query_neo4j(question, use_fast_path, hits)
+        except (ServiceUnavailable, ValueError) as e:
+            # Neo4jGraph reports a failed connection as ValueError
+            if not offline_fallback or not table_exists(OFFLINE_GRAPH_FILE):
+                raise
+            print("Neo4j unavailable, answering from the offline graph engine:", e)
+            response = get_offline_engine(OFFLINE_GRAPH_FILE).query(question, limit=FAST_PATH_LIMIT)
+            response["offline"] = True
+        response["chunks"] = hits
+        result = response.get("result")
+        if isinstance(result, list):
+            # sorted() returns a new list, so cached results are never reordered in place
+            response["result"], response["total"] = rank_results(result, top_k)
+            result = response["result"]
+        stage["rows_out"] = len(result) if isinstance(result, list) else 1
+    metrics.observe("query_seconds", time.perf_counter() - start, path=query_path(response))
+    return response
+
+
+def query_path(response: dict) -> str:
+    """Which route answered a question: offline engine, result cache, chunk entities, entity fast path,
+    Cypher cache or the LLM chain."""
+    if response.get("offline"):
+        return "offline"
+    if response.get("result_cached"):
+        return "result_cache"
+    if response.get("lexical"):
+        return "lexical"
+    if "entities" in response:
+        return "fast_path"
+    return "cypher_cache" if response.get("cached") else "chain"
+
+
+def _query_neo4j(question: str, use_fast_path: bool = True, hits: list = None) -> dict:
+    if use_fast_path:
+        response = route_query(question, hits=hits)
+        if response is not None:
+            return response
+
+    chain = get_chain()
+    graph = get_graph()
+
+    cypher = cypher_cache.get(question)
+    if cypher is not None:
+        result, hit = run_cached(graph, cypher)
+        return {"query": question, "result": result, "cypher": cypher, "cached": True, "result_cached": hit}
+
+    version = graph_version(graph)
+    response = chain.invoke(question)
+    steps = response.get("intermediate_steps") or []
+    cypher = steps[0].get("query") if steps else None
+    if cypher and validate_cypher(graph, cypher):
+        cypher_cache.put(question, cypher)
+        if isinstance(response.get("result"), list):
+            # The chain already ran the query; keep its result for the next identical Cypher
+            result_cache.put(cypher, None, version, response["result"])
+    response["cypher"] = cypher
+    response["cached"] = False
+    response["result_cached"] = False
+    return response
+
+
+def generate_chain(graph: Neo4jGraph = None, schema: tuple = None) -> GraphCypherQAChain:
+    # ✅ Connect to Neo4j
+    graph = graph or get_graph()
+
+    # ✅ Step 1: Get existing labels and relationships
+    existing_labels, existing_relationships = schema or get_schema(graph)
+    existing_labels, existing_relationships = list(existing_labels), list(existing_relationships)
 
     print("Existing Labels:", existing_labels)
     print("Existing Relationships:", existing_relationships)
@@ -64,7 +443,7 @@ def generate_chain():
     Cypher Query:
 """
 )
-    llm = OllamaLLM(model="llama3")
+    llm = get_llm()
 
     # ✅ Step 3: Use GraphCypherQAChain without keyword dependency
     chain = GraphCypherQAChain.from_llm(
@@ -73,9 +452,148 @@ def generate_chain():
     cypher_prompt=cypher_prompt,
     verbose=True,
     include_run_info=True,  # ✅ Ensures we capture raw execution info
+    return_intermediate_steps=True,  # ✅ Exposes the generated Cypher so it can be cached
     return_direct=True,  # ✅ Forces returning the raw Cypher query result
     allow_dangerous_requests=True
 )
 
     return chain
 
+
+
+def stream_records(cypher: str, params: dict = None, fetch_size: int = QUERY_FETCH_SIZE):
+    """Yield the rows of read-only Cypher as dicts while the result is still arriving.
+
+    The driver pulls `fetch_size` rows per round trip; closing the generator early discards the rest.
+    """
+    with neo4j_client.session(default_access_mode="READ", fetch_size=fetch_size) as session:
+        for record in session.run(cypher, params or {}):
+            yield record.data()
+
+
+class ResultStream:
+    """One page of the answer to a question, yielded record by record as it arrives.
+
+    Iterate it once. The entity fast path pages by keyset, streaming each page from Neo4j
+    and keeping it in the result cache for the current graph version. Cached Cypher and the
+    chain produce complete results, which go through the result cache as in `query_graph`
+    and are ranked by PageRank before being sliced into pages; a question that needs the
+    chain runs it once (which caches its Cypher), so later pages are served from the caches.
+    Afterwards `records` holds the page, `next_cursor` the cursor of the next page (None on
+    the last one), `result_cached` whether it came from the result cache, and
+    `first_result_seconds` / `seconds` the time to the first record and to the whole page.
+    """
+
+    def __init__(self, question: str, cursor: dict = None, page_size: int = QUERY_PAGE_SIZE,
+                 offline_fallback: bool = True):
+        self.question = question
+        self.cursor = cursor or {}
+        self.page_size = page_size
+        self.offline_fallback = offline_fallback
+        self.path = None
+        self.chunks = []
+        self.records = []
+        self.next_cursor = None
+        self.result_cached = False
+        self.first_result_seconds = None
+        self.seconds = None
+
+    def _page(self, rows, cursor_of):
+        # Rows are requested one past the page, so the last page is known without another query.
+        # The extra row is read rather than abandoned, so a streamed page reaches the result cache.
+        for i, record in enumerate(rows):
+            if i < self.page_size:
+                yield record
+            else:
+                self.next_cursor = cursor_of(self.records[-1])
+
+    def _slice(self, result: list):
+        """Page of a complete result, most central relationships first."""
+        skip = self.cursor.get("skip", 0)
+        ranked, _ = rank_results(result if isinstance(result, list) else [], len(result or []))
+        return self._page(iter(ranked[skip:skip + self.page_size + 1]), lambda last: {"skip": skip + self.page_size})
+
+    def _stream_cached(self, graph, cypher: str, params: dict):
+        """Stream a bounded query, or replay it from the result cache for the current graph version."""
+        version = graph_version(graph)
+        cached = result_cache.get(cypher, params, version)
+        if cached is not None:
+            self.result_cached = True
+            yield from cached
+            return
+        rows = []
+        for record in stream_records(cypher, params):
+            rows.append(record)
+            yield record
+        result_cache.put(cypher, params, version, rows)
+
+    def _neo4j_rows(self):
+        graph = get_graph()
+        load_entity_index(graph)
+        names, from_chunks = question_entities(self.question, self.chunks)
+        if names:
+            self.path = "lexical" if from_chunks else "fast_path"
+            params = {"names": names, "after": self.cursor.get("after"), "limit": self.page_size + 1}
+            return self._page(self._stream_cached(graph, NEIGHBOURHOOD_PAGE_QUERY, params),
+                              lambda last: {"after": {"score": last["score"], "position": last["position"]}})
+
+        cypher = cypher_cache.get(self.question)
+        if cypher is not None:
+            self.path = "cypher_cache"
+            result, self.result_cached = run_cached(graph, cypher)
+            return self._slice(result)
+
+        self.path = "chain"
+        return self._slice(_query_neo4j(self.question, use_fast_path=False).get("result"))
+
+    def _offline_rows(self):
+        self.path = "offline"
+        engine = get_offline_engine(OFFLINE_GRAPH_FILE)
+        return self._slice(engine.neighbourhood(engine.entity_index.find(self.question)))
+
+    def __iter__(self):
+        start = time.perf_counter()
+        self.chunks = retrieve_chunks(self.question)
+        try:
+            rows = self._neo4j_rows()
+            first = next(rows, None)
+        except (ServiceUnavailable, ValueError) as e:
+            # Only a failure before the first record can fall back; later ones surface to the caller
+            if not self.offline_fallback or not table_exists(OFFLINE_GRAPH_FILE):
+                raise
+            print("Neo4j unavailable, answering from the offline graph engine:", e)
+            rows = self._offline_rows()
+            first = next(rows, None)
+
+        if first is not None:
+            self.first_result_seconds = time.perf_counter() - start
+            for record in itertools.chain([first], rows):
+                self.records.append(record)
+                yield record
+        self.seconds = time.perf_counter() - start
+        if self.first_result_seconds is None:
+            self.first_result_seconds = self.seconds
+        metrics.observe("query_first_result_seconds", self.first_result_seconds, path=self.path)
+        metrics.observe("query_seconds", self.seconds, path=self.path)
+
+
+def describe_record(record: dict) -> str:
+    """One relationship record as a line of text for the LLM."""
+    n, related = record.get("n") or {}, record.get("relatedNode") or {}
+    relationship = (record.get("properties(r)") or {}).get("relationship") or record.get("type(r)", "related to")
+    return f"- {n.get('name', 'Unknown')} -[{relationship}]- {related.get('name', 'Unknown')}"
+
+
+def stream_summary(question: str, records: list, max_records: int = SUMMARY_MAX_RECORDS):
+    """Yield the LLM's answer to `question` over the first `max_records` records, token by token."""
+    if not records:
+        return
+    facts = "\n".join(describe_record(record) for record in records[:max_records])
+    start = time.perf_counter()
+    first = True
+    for token in get_llm().stream(SUMMARY_PROMPT.format(facts=facts, question=question)):
+        if first:
+            metrics.observe("summary_first_token_seconds", time.perf_counter() - start)
+            first = False
+        yield token
+    metrics.observe("summary_seconds", time.perf_counter() - start)
@@ -1,36 +1,14 @@
 # Handles data loading and preprocessing
 
 import os
-import uuid
+import hashlib
 import pandas as pd
 import numpy as np
-import wikipedia
-from langchain.document_loaders import DirectoryLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-
-# Configuration & Constants
-
-NEO4J_URL = "bolt://localhost:7687"
-NEO4J_DATABASE = "neo4j"
-NEO4J_USER = "neo4j"
-NEO4J_PASSWORD = "pass1234"
-AUTH = (NEO4J_USER, NEO4J_PASSWORD)
-
-RAW_DATA_DIR = "data/raw"
-OUTPUT_DIR = "output"
-WIKI_TOPIC = "World War I"
-WIKI_OUTPUT_FILE = "World war 1.txt"
-
-def get_wikipedia_content(topic: str) -> str:
-    """Fetch and format Wikipedia content."""
-    page = wikipedia.page(topic)
-    return page.content.replace('==', '').replace('\n', ' ').strip()
-
-def write_text_to_file(file_path: str, text: str) -> None:
-    """Write text with UTF-8 encoding."""
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(text)
-    print(f"Content written to {file_path}")
+from config.settings import WIKI_TOPIC, WIKI_OUTPUT_FILE
+from src.file_reader import iter_file_contents
+from src.chunker import FastTextSplitter
+from src.metrics import metrics
+from src.text_processor import get_wikipedia_content, write_text_to_file
 
 def load_data(file_path):
     # Get the Wikipedia page content
@@ -42,30 +20,74 @@ def load_data(file_path):
     # Write to a file
     write_text_to_file(WIKI_OUTPUT_FILE, text)
 
-def load_documents(loader_path: str) -> list:
-    loader = DirectoryLoader(loader_path, show_progress=True)
-    documents = loader.load()
+def load_documents(loader_path: str, fast: bool = True, max_workers: int = None) -> list:
+    with metrics.stage("load_documents") as stage:
+        if not fast:
+            from langchain.document_loaders import DirectoryLoader
+            loader = DirectoryLoader(loader_path, show_progress=True)
+            documents = loader.load()
+        else:
+            documents = list(iter_documents(loader_path, max_workers=max_workers))
+        stage["rows_out"] = len(documents)
     print(f"Loaded {len(documents)} document(s) from {loader_path}")
     return documents
 
-def split_documents(documents: list, chunk_size: int = 1500, chunk_overlap: int = 150) -> list:
-    splitter = RecursiveCharacterTextSplitter(
+def iter_documents(loader_path: str, max_workers: int = None):
+    """Yield documents one at a time instead of loading the whole directory into memory.
+
+    Plain-text files are read directly; other types go through `unstructured`, with files
+    spread across a process pool for large directories.
+    """
+    # langchain is only imported once documents are actually produced, keeping imports of this module cheap
+    from langchain.schema import Document
+    for text, metadata in iter_file_contents(loader_path, max_workers=max_workers):
+        yield Document(page_content=text, metadata=metadata)
+
+def iter_wikipedia_documents(topics=(), categories=(), depth: int = 0):
+    """Document source that reads straight from Wikipedia (through the revision-aware page cache)."""
+    from langchain.schema import Document
+    from src.wiki_fetcher import fetch_pages, format_content
+    for page in fetch_pages(topics, categories, depth):
+        yield Document(page_content=format_content(page["text"]),
+                       metadata={'source': f"wikipedia:{page['title']}", 'revision': page['revid']})
+
+def get_splitter(chunk_size: int = 1500, chunk_overlap: int = 150, fast: bool = True):
+    """Return the chunker; the fast one produces the same chunks as RecursiveCharacterTextSplitter."""
+    if fast:
+        return FastTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         length_function=len,
         is_separator_regex=False
     )
-    pages = splitter.split_documents(documents)
+
+def split_documents(documents: list, chunk_size: int = 1500, chunk_overlap: int = 150, fast: bool = True) -> list:
+    with metrics.stage("split_documents", rows_in=len(documents)) as stage:
+        splitter = get_splitter(chunk_size, chunk_overlap, fast)
+        pages = splitter.split_documents(documents)
+        stage["rows_out"] = len(pages)
     print(f"Number of pages after splitting: {len(pages)}")
     return pages
 
-def documents_to_dataframe(pages: list) -> pd.DataFrame:
-    page_data = [{
-        'Page Content': page.page_content,
-        'Source': page.metadata.get('source', 'N/A'),
-        'chunk_id': uuid.uuid4().hex
-    } for page in pages]
-    
-    df = pd.DataFrame(page_data)
+def chunk_id_for(content: str, source: str, chunk_size: int = 1500, chunk_overlap: int = 150) -> str:
+    """Deterministic chunk id from the chunk text, its source and the splitter settings."""
+    digest = hashlib.sha256()
+    for part in (source, str(chunk_size), str(chunk_overlap), content):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:32]
+
+def documents_to_dataframe(pages: list, chunk_size: int = 1500, chunk_overlap: int = 150) -> pd.DataFrame:
+    with metrics.stage("documents_to_dataframe", rows_in=len(pages)) as stage:
+        page_data = [{
+            'Page Content': page.page_content,
+            'Source': page.metadata.get('source', 'N/A'),
+            'chunk_id': chunk_id_for(page.page_content, page.metadata.get('source', 'N/A'), chunk_size, chunk_overlap)
+        } for page in pages]
+
+        df = pd.DataFrame(page_data)
+        stage["rows_out"] = len(df)
     print(f"DataFrame created with {len(df)} rows")
     return df
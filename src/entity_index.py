@@ -0,0 +1,139 @@
+# In-memory multi-pattern matcher over Node.name values
+
+import threading
+
+
+class EntityIndex:
+    """Aho-Corasick automaton over entity names for finding entities mentioned in a question.
+
+    Names are matched case-insensitively on word boundaries. Names can be added or removed at
+    any time; only the trie grows, and the failure links are recomputed lazily on the next search.
+    """
+
+    def __init__(self, names=()):
+        self._goto = [{}]            # state -> {char: next state}
+        self._fail = [0]
+        self._output = [None]        # state -> normalised name ending at that state
+        self._names = {}             # normalised name -> set of original spellings
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.add_names(names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        return " ".join(str(name).lower().split())
+
+    def add_names(self, names) -> int:
+        """Insert names not already indexed; returns how many were new."""
+        added = 0
+        with self._lock:
+            for name in names:
+                if not isinstance(name, str):
+                    continue
+                key = self.normalize(name)
+                if len(key) < 2:
+                    continue
+                spellings = self._names.setdefault(key, set())
+                spellings.add(name)
+                if len(spellings) > 1:
+                    continue
+                state = 0
+                for char in key:
+                    nxt = self._goto[state].get(char)
+                    if nxt is None:
+                        nxt = len(self._goto)
+                        self._goto[state][char] = nxt
+                        self._goto.append({})
+                        self._fail.append(0)
+                        self._output.append(None)
+                    state = nxt
+                self._output[state] = key
+                added += 1
+            if added:
+                self._dirty = True
+        return added
+
+    def remove_names(self, names) -> int:
+        """Stop matching names (e.g. of deleted nodes); returns how many names are gone entirely.
+
+        A name stays matchable while another spelling of it is still indexed. Trie states
+        are left in place and simply stop reporting a match.
+        """
+        removed = 0
+        with self._lock:
+            for name in names:
+                if not isinstance(name, str):
+                    continue
+                key = self.normalize(name)
+                spellings = self._names.get(key)
+                if spellings is None:
+                    continue
+                spellings.discard(name)
+                if spellings:
+                    continue
+                del self._names[key]
+                state = 0
+                for char in key:
+                    state = self._goto[state][char]
+                self._output[state] = None
+                removed += 1
+            if removed:
+                self._dirty = True
+        return removed
+
+    def _build_failure_links(self) -> None:
+        self._fail = [0] * len(self._goto)
+        self._dict_link = [0] * len(self._goto)  # nearest proper suffix state that ends a name
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for char, nxt in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                link = self._fail[nxt]
+                self._dict_link[nxt] = link if self._output[link] else self._dict_link[link]
+                queue.append(nxt)
+        self._dirty = False
+
+    def find(self, text: str) -> list:
+        """Return the indexed names mentioned in `text`, longest non-overlapping matches first."""
+        with self._lock:
+            if self._dirty or not hasattr(self, "_dict_link"):
+                self._build_failure_links()
+            haystack = self.normalize(text)
+            matches = []
+            state = 0
+            for end, char in enumerate(haystack, 1):
+                while state and char not in self._goto[state]:
+                    state = self._fail[state]
+                state = self._goto[state].get(char, 0)
+                hit = state if self._output[state] else self._dict_link[state]
+                while hit:
+                    key = self._output[hit]
+                    start = end - len(key)
+                    if (start == 0 or not haystack[start - 1].isalnum()) and \
+                            (end == len(haystack) or not haystack[end].isalnum()):
+                        matches.append((start, end, key))
+                    hit = self._dict_link[hit]
+
+            # Prefer longer names ("World War II" over "World War") and drop overlaps
+            matches.sort(key=lambda m: (-(m[1] - m[0]), m[0]))
+            taken = []
+            for start, end, key in matches:
+                if any(start < t_start + len(t_key) and t_start < end for t_start, t_key in taken):
+                    continue
+                taken.append((start, key))
+            return [name for _, key in sorted(taken) for name in sorted(self._names[key])]
+
+
+# Process-wide index shared by the ingestion and query paths
+entity_index = EntityIndex()
@@ -0,0 +1,170 @@
+# Entity resolution and edge aggregation between extraction and insertion
+
+import re
+import unicodedata
+import numpy as np
+import pandas as pd
+from config.settings import RESOLUTION_THRESHOLD, RESOLUTION_MAX_BLOCK
+
+_ORDINALS = {
+    "first": "i", "second": "ii", "third": "iii", "fourth": "iv", "fifth": "v",
+    "sixth": "vi", "seventh": "vii", "eighth": "viii", "ninth": "ix", "tenth": "x",
+}
+_ORDINAL_PREFIX = re.compile(r"^(%s) (.+)$" % "|".join(_ORDINALS))
+_TOKEN_STOPWORDS = {"the", "of", "and", "a", "an", "in", "on", "for", "to"}
+# Numbers and roman numerals tell otherwise similar names apart ("World War I" vs "World War II")
+_DISCRIMINATOR = re.compile(r"^(\d+|[ivxlc]+)$")
+
+
+def normalize_name(name) -> str:
+    """Clean up whitespace, quotes and possessives while keeping the original casing."""
+    if not isinstance(name, str):
+        return name
+    name = unicodedata.normalize("NFKC", name)
+    name = " ".join(name.split()).strip(" \"'`.,;:")
+    return re.sub(r"['’]s$", "", name)
+
+
+def match_key(name: str) -> str:
+    """Case-folded comparison key; "Second World War" and "World War II" share one."""
+    key = re.sub(r"[^\w\s]", " ", name.casefold())
+    key = " ".join(key.split())
+    if key.startswith("the "):
+        key = key[4:]
+    ordinal = _ORDINAL_PREFIX.match(key)
+    if ordinal:
+        key = f"{ordinal.group(2)} {_ORDINALS[ordinal.group(1)]}"
+    return key
+
+
+def _discriminators(key: str) -> str:
+    return " ".join(sorted(token for token in key.split() if _DISCRIMINATOR.match(token)))
+
+
+def _trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _DisjointSet:
+    def __init__(self, n: int):
+        self.parent = np.arange(n)
+
+    def find(self, i: int) -> int:
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def cluster_names(names: pd.Series, threshold: float = RESOLUTION_THRESHOLD,
+                  max_block: int = RESOLUTION_MAX_BLOCK) -> dict:
+    """Map each name to the canonical spelling of its near-duplicate cluster.
+
+    Names with the same match key are merged outright. Remaining keys are blocked on shared
+    tokens (tokens appearing in more than `max_block` keys are too common to block on) and
+    compared within each block by cosine similarity of character-trigram vectors, computed
+    as one matrix product per block. Keys whose numbers or roman numerals differ are never
+    merged. The most frequent spelling names the cluster.
+    """
+    names = names.dropna().astype(str)
+    frequency = names.value_counts()
+    keys = pd.Series([match_key(name) for name in frequency.index], index=frequency.index)
+    unique_keys = pd.Index(keys.unique())
+    key_ids = unique_keys.get_indexer(keys)
+    sets = _DisjointSet(len(unique_keys))
+
+    # Block on tokens: key ids grouped by each (not too common) token they contain
+    tokens = pd.DataFrame([(i, token) for i, key in enumerate(unique_keys)
+                           for token in set(key.split()) if token not in _TOKEN_STOPWORDS],
+                          columns=["key_id", "token"])
+    if not tokens.empty:
+        block_sizes = tokens.groupby("token")["key_id"].transform("size")
+        tokens = tokens[(block_sizes > 1) & (block_sizes <= max_block)]
+        grams = [_trigrams(key) for key in unique_keys]
+        signatures, _ = pd.factorize(pd.Series([_discriminators(key) for key in unique_keys]))
+        for members in tokens.groupby("token")["key_id"].agg(list):
+            vocab = {}
+            rows, cols = [], []
+            for row, key_id in enumerate(members):
+                for gram in grams[key_id]:
+                    rows.append(row)
+                    cols.append(vocab.setdefault(gram, len(vocab)))
+            matrix = np.zeros((len(members), len(vocab)), dtype=np.float32)
+            matrix[rows, cols] = 1.0
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+            similarity = np.triu(matrix @ matrix.T, k=1)
+            signature = signatures[members]
+            similar = (similarity >= threshold) & (signature[:, None] == signature[None, :])
+            for a, b in zip(*np.nonzero(similar)):
+                sets.union(members[a], members[b])
+
+    roots = np.array([sets.find(i) for i in range(len(unique_keys))])
+    cluster = pd.Series(roots[key_ids], index=frequency.index)
+    # value_counts is sorted by frequency, so the first spelling seen per cluster is the most common
+    canonical = pd.Series(frequency.index, index=frequency.index).groupby(cluster.values).transform("first")
+    return canonical.to_dict()
+
+
+def _merge_provenance(triples) -> dict:
+    """{(chunk_id, source): summed count} over (chunk_id, source, count) triples, in first-seen order."""
+    chunks = {}
+    for chunk_id, source, count in triples:
+        if pd.notna(chunk_id):
+            chunks[(chunk_id, source)] = chunks.get((chunk_id, source), 0) + int(count)
+    return chunks
+
+
+def resolve_graph(df: pd.DataFrame, threshold: float = RESOLUTION_THRESHOLD) -> pd.DataFrame:
+    """Canonicalise node names and collapse duplicate edges.
+
+    Duplicate (node_1, node_2, edge) rows are merged into one with a real `count` (summed
+    when the input already carries counts) and the maximum `importance`. Edges that become
+    self-loops after merging, e.g. "World War II" -> "Second World War", are dropped.
+    Per-edge `chunk_id`/`source` columns become parallel `chunk_ids`/`sources`/`chunk_counts`
+    lists, `chunk_counts` holding each chunk's share of `count`.
+    """
+    df = df.dropna(subset=["node_1", "node_2", "edge"]).copy()
+    before_nodes = pd.concat([df["node_1"], df["node_2"]]).nunique()
+    before_edges = len(df)
+
+    # Plain strings: dictionary-encoded frames from read_table have per-column categories,
+    # which cannot be compared across node_1 and node_2
+    for column in ("node_1", "node_2", "edge"):
+        df[column] = df[column].astype(str).map(normalize_name)
+    mapping = cluster_names(pd.concat([df["node_1"], df["node_2"]]), threshold)
+    df["node_1"] = df["node_1"].map(mapping)
+    df["node_2"] = df["node_2"].map(mapping)
+    df = df[df["node_1"] != df["node_2"]]
+
+    df["importance"] = pd.to_numeric(df["importance"], errors="coerce")
+    df["count"] = pd.to_numeric(df["count"], errors="coerce").fillna(1) if "count" in df else 1
+    df["_edge_key"] = df["edge"].str.casefold()
+    aggregations = {"edge": "first", "importance": "max", "count": "sum"}
+    # Provenance: every (chunk, source) pair behind a merged edge, as parallel lists
+    provenance = "chunk_id" in df
+    if provenance:
+        df["_provenance"] = list(zip(df["chunk_id"], df["source"] if "source" in df else [None] * len(df), df["count"]))
+        aggregations["_provenance"] = _merge_provenance
+    skip = {"node_1", "node_2", "_edge_key", "chunk_id", "source"} if provenance else {"node_1", "node_2", "_edge_key"}
+    aggregations.update({column: "first" for column in df.columns if column not in aggregations and column not in skip})
+    resolved = (df.groupby(["node_1", "node_2", "_edge_key"], sort=False, as_index=False)
+                  .agg(aggregations)
+                  .drop(columns="_edge_key"))
+    resolved["count"] = resolved["count"].astype(int)
+    if provenance:
+        resolved["chunk_ids"] = [[chunk_id for chunk_id, _ in chunks] for chunks in resolved["_provenance"]]
+        resolved["sources"] = [[source for _, source in chunks] for chunks in resolved["_provenance"]]
+        resolved["chunk_counts"] = [list(chunks.values()) for chunks in resolved["_provenance"]]
+        resolved = resolved.drop(columns="_provenance")
+
+    after_nodes = pd.concat([resolved["node_1"], resolved["node_2"]]).nunique()
+    print(f"Entity resolution: {before_nodes} -> {after_nodes} node(s), {before_edges} -> {len(resolved)} edge(s)")
+    return resolved
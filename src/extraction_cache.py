@@ -0,0 +1,102 @@
+# On-disk cache of parsed graph_prompt output
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from config.prompt import GRAPH_PROMPT_VERSION
+from config.settings import EXTRACTION_CACHE_PATH, EXTRACTION_CACHE_MAX_BYTES
+from src.metrics import metrics
+
+
+class ExtractionCache:
+    """SQLite store of extraction results keyed by chunk id + model + prompt version.
+
+    Entries are evicted least-recently-used first once the stored payloads exceed
+    `max_bytes`. Safe to share between the extraction worker threads.
+    """
+
+    def __init__(self, path: str = EXTRACTION_CACHE_PATH, max_bytes: int = EXTRACTION_CACHE_MAX_BYTES,
+                 prompt_version: str = GRAPH_PROMPT_VERSION):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.prompt_version = prompt_version
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS extractions (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON extractions(last_access)")
+        self._conn.commit()
+
+    def _key(self, chunk_id: str, model: str) -> str:
+        return f"{chunk_id}:{model}:{self.prompt_version}"
+
+    def get(self, chunk_id: str, model: str):
+        """Return the cached result for a chunk, or None on a miss."""
+        key = self._key(chunk_id, model)
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM extractions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                metrics.inc("cache_requests_total", cache="extraction", result="miss")
+                return None
+            self.hits += 1
+            metrics.inc("cache_requests_total", cache="extraction", result="hit")
+            self._conn.execute("UPDATE extractions SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, chunk_id: str, model: str, result) -> None:
+        """Store a parsed result; failed extractions (None) are never cached."""
+        if result is None:
+            return
+        payload = json.dumps(result, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractions (key, payload, size, last_access) VALUES (?, ?, ?, ?)",
+                (self._key(chunk_id, model), payload, len(payload.encode("utf-8")), time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        stale = []
+        for key, size in self._conn.execute("SELECT key, size FROM extractions ORDER BY last_access"):
+            stale.append((key,))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        self._conn.executemany("DELETE FROM extractions WHERE key = ?", stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extractions").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,293 @@
+# Incremental, schema-validated parsing of graph_prompt output
+
+import json
+import re
+
+EDGE_FIELDS = ('node_1', 'node_2', 'edge', 'entity', 'importance', 'category')
+REQUIRED_FIELDS = ('node_1', 'node_2', 'edge')
+
+# Key spellings seen in model output, mapped onto the edge schema
+KEY_ALIASES = {
+    'node_1': ('node_1', 'node1', 'source', 'from', 'head', 'subject', 'term_1', 'term1', 'concept_1'),
+    'node_2': ('node_2', 'node2', 'target', 'to', 'tail', 'object', 'term_2', 'term2', 'concept_2', 'related_term'),
+    'edge': ('edge', 'edges', 'relation', 'relationship', 'label', 'predicate', 'relation_type'),
+    'entity': ('entity', 'entity_type', 'type', 'concept'),
+    'importance': ('importance', 'weight', 'score'),
+    'category': ('category', 'categories', 'class', 'group'),
+}
+_FIELD_FOR_KEY = {alias: field for field, aliases in KEY_ALIASES.items() for alias in aliases}
+# Term-centric layout: {"term": "A", "category": ..., "edges": [{"node_2": "B", "edge": ...}, ...]}
+_TERM_KEYS = ('term', 'name', 'node')
+_TERM_EDGE_LISTS = ('edges', 'relations', 'relationships', 'related_terms')
+
+
+def _normalize_key(key) -> str:
+    return re.sub(r'[\s\-]+', '_', str(key).strip().lower())
+
+
+def _repair(text: str) -> str:
+    """Fix the JSON mistakes models make most often."""
+    fixed = re.sub(r',\s*([}\]])', r'\1', text)                                  # trailing commas
+    fixed = re.sub(r'("|\d|true|false|null)(\s*\n\s*")', r'\1,\2', fixed)        # missing comma between lines
+    fixed = re.sub(r'([{,]\s*)([A-Za-z_][\w ]*?)\s*:(?!\s*//)', r'\1"\2":', fixed)  # unquoted keys
+    fixed = re.sub(r'\bNone\b', 'null', fixed)
+    fixed = re.sub(r'\bTrue\b', 'true', re.sub(r'\bFalse\b', 'false', fixed))
+    if '"' not in fixed:
+        fixed = fixed.replace("'", '"')
+    return fixed
+
+
+# A JSON string, honouring escapes; the open variant has lost its closing quote
+_STRING = r'"(?:[^"\\]|\\.)*"'
+_OPEN_STRING = r'"(?:[^"\\]|\\.)*$'
+
+
+def _close_fragment(fragment: str, in_string: bool) -> str:
+    """Trim an object cut off mid-way back to its last complete member.
+
+    Complete `"key": "value"` pairs are kept. A dangling key (`"k"` or `"k":`) is removed,
+    and so is a pair whose string value was cut off, since a truncated value is not trustworthy.
+    """
+    if in_string:
+        fragment = re.sub(rf'([{{,])\s*{_STRING}\s*:\s*{_OPEN_STRING}', r'\1', fragment)   # "k": "partial
+        fragment = re.sub(rf'([{{,])\s*{_OPEN_STRING}', r'\1', fragment)                    # "partial key
+    else:
+        fragment = re.sub(rf'([{{,])\s*{_STRING}\s*:?\s*$', r'\1', fragment)               # "k" or "k":
+    return fragment.rstrip().rstrip(',')
+
+
+def parse_json_fragment(text: str):
+    """Return (value, repaired) for a JSON fragment, or (None, False) if it cannot be salvaged."""
+    try:
+        return json.loads(text, strict=False), False
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(_repair(text), strict=False), True
+    except json.JSONDecodeError:
+        return None, False
+
+
+def _coerce_text(value):
+    if isinstance(value, list):
+        value = ", ".join(str(item) for item in value if item not in (None, ""))
+    if value is None:
+        return None, False
+    coerced = str(value).strip()
+    return (coerced or None), not isinstance(value, str)
+
+
+def _coerce_importance(value):
+    if value is None or isinstance(value, bool):
+        return None, value is not None
+    try:
+        number = int(round(float(value)))
+    except (TypeError, ValueError):
+        return None, True
+    clamped = min(5, max(1, number))
+    return clamped, not isinstance(value, int) or clamped != value
+
+
+def normalize_record(obj: dict, defaults: dict = None):
+    """Map one model record onto the edge schema.
+
+    Returns (edges, repaired, edge_like): the typed edge dicts it yields, whether any value
+    needed coercion, and whether the record looked like an edge at all.
+    """
+    own, extra = {}, {}
+    for key, value in obj.items():
+        normalized = _normalize_key(key)
+        field = _FIELD_FOR_KEY.get(normalized)
+        if normalized in _TERM_EDGE_LISTS and isinstance(value, list):
+            extra['edges'] = value
+        elif normalized in _TERM_KEYS:
+            # Inside a term's edge list the term key names the other end of the edge
+            if defaults and 'node_1' in defaults:
+                own.setdefault('node_2', value)
+            else:
+                extra['term'] = value
+        elif field and field not in own:
+            own[field] = value
+    fields = {**(defaults or {}), **own}
+
+    if 'edges' in extra and ('term' in extra or 'node_1' in fields):
+        parent = {key: value for key, value in fields.items() if key in ('entity', 'importance', 'category')}
+        parent['node_1'] = extra.get('term', fields.get('node_1'))
+        edges, repaired = [], False
+        for item in extra['edges']:
+            if isinstance(item, str):
+                item = {'node_2': item, 'edge': 'related to'}
+            if isinstance(item, dict):
+                child_edges, child_repaired, _ = normalize_record(item, parent)
+                edges.extend(child_edges)
+                repaired = repaired or child_repaired
+        return edges, repaired, True
+
+    edge_like = any(field in own for field in REQUIRED_FIELDS)
+    edge, repaired = {}, False
+    for field in EDGE_FIELDS:
+        if field == 'importance':
+            edge[field], changed = _coerce_importance(fields.get(field))
+        else:
+            edge[field], changed = _coerce_text(fields.get(field))
+        repaired = repaired or changed
+    if any(edge[field] is None for field in REQUIRED_FIELDS):
+        return [], repaired, edge_like
+    return [edge], repaired, True
+
+
+def _edge_key(edge: dict) -> tuple:
+    return edge['node_1'], edge['node_2'], edge['edge']
+
+
+class StreamingEdgeParser:
+    """Pull complete edge records out of a JSON response while it is still arriving.
+
+    Feed text as it streams in; every object that closes is validated and mapped onto the
+    edge schema straight away, so a malformed or truncated element later in the response
+    does not cost the edges before it. Objects nested under a top-level key (as in the
+    batched `{"c0": {...}, "c1": {...}}` layout) are tagged with that key, and keys whose
+    value closed are listed in `closed_keys`; a value cut off mid-way may be incomplete.
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.text = ""
+        self.edges = []             # (top-level key or None, edge dict)
+        self.top_level_keys = []
+        self.closed_keys = []       # top-level keys whose object or list value closed
+        self.recovered = 0
+        self.repaired = 0
+        self.dropped = 0
+        self.parsed_objects = 0     # JSON objects that parsed at all, edge-shaped or not
+        self._frames = []           # open containers: dict(kind, start, key, child_objects, pending)
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None    # (start, end) of the last string closed in the current frame
+        self._pos = 0
+
+    def feed(self, piece: str) -> list:
+        """Consume more response text; returns the edges completed by it."""
+        self.text += piece
+        completed = []
+        text = self.text
+        while self._pos < len(text):
+            char = text[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = (self._string_start, self._pos + 1)
+            elif char == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif char == ':':
+                if self._frames and self._last_string:
+                    key, _ = parse_json_fragment(text[self._last_string[0]:self._last_string[1]])
+                    self._frames[-1]['next_key'] = key
+                    if len(self._frames) == 1 and self._frames[0]['kind'] == '{':
+                        self.top_level_keys.append(key)
+            elif char in '{[':
+                # Records are tagged with the top-level key they sit under
+                if len(self._frames) == 1 and self._frames[0]['kind'] == '{':
+                    key = self._frames[0]['next_key']
+                else:
+                    key = self._frames[-1]['key'] if self._frames else None
+                if char == '{':
+                    for frame in self._frames:
+                        frame['child_objects'] = True
+                self._frames.append({'kind': char, 'start': self._pos, 'key': key, 'next_key': None,
+                                     'child_objects': False, 'pending': 0, 'emitted': []})
+            elif char in '}]' and self._frames:
+                frame = self._frames.pop()
+                if len(self._frames) == 1 and self._frames[0]['kind'] == '{':
+                    self.closed_keys.append(frame['key'])
+                if char == '}':
+                    completed.extend(self._close_object(frame, text[frame['start']:self._pos + 1]))
+                elif self._frames:
+                    self._frames[-1]['pending'] += frame['pending']
+                    self._frames[-1]['emitted'].extend(frame['emitted'])
+                else:
+                    self.dropped += frame['pending']
+            elif char == ',':
+                self._last_string = None
+            self._pos += 1
+        return completed
+
+    def _close_object(self, frame: dict, fragment: str) -> list:
+        value, repaired = parse_json_fragment(fragment)
+        parent = self._frames[-1] if self._frames else None
+        if value is None or not isinstance(value, dict):
+            if not frame['child_objects']:
+                self.dropped += 1
+            self._release_pending(frame)
+            if parent is not None:
+                parent['emitted'].extend(frame['emitted'])
+            return []
+        self.parsed_objects += 1
+        edges, coerced, edge_like = normalize_record(value)
+        # A term-layout record re-derives child edges that may already have been emitted
+        edges = [edge for edge in edges if _edge_key(edge) not in frame['emitted']]
+        if edges or (edge_like and frame['emitted']):
+            # A term-layout parent consumes the partial child records it was holding
+            self._accept(frame['key'], edges, repaired or coerced)
+            if parent is not None:
+                parent['emitted'].extend(frame['emitted'] + [_edge_key(edge) for edge in edges])
+            return edges
+        if edge_like and not frame['child_objects']:
+            # Possibly the child of a term-layout record; decided when the parent closes
+            if parent is not None:
+                parent['pending'] += 1
+            else:
+                self.dropped += 1
+            return []
+        self._release_pending(frame)
+        if parent is not None:
+            parent['emitted'].extend(frame['emitted'])
+        return []
+
+    def _release_pending(self, frame: dict) -> None:
+        # Partial records nobody could complete
+        self.dropped += frame['pending']
+
+    def _accept(self, key, edges: list, repaired: bool) -> None:
+        self.recovered += len(edges)
+        if repaired:
+            self.repaired += len(edges)
+        self.edges.extend((key, edge) for edge in edges)
+
+    def close(self) -> list:
+        """Finish the stream, salvaging a final element cut off mid-way."""
+        completed = []
+        if self._frames:
+            frame = self._frames[-1]
+            if frame['kind'] == '{' and not frame['child_objects']:
+                value, _ = parse_json_fragment(_close_fragment(self.text[frame['start']:], self._in_string) + '}')
+                if isinstance(value, dict):
+                    edges, _, _ = normalize_record(value)
+                    if edges:
+                        self._accept(frame['key'], edges, True)
+                        completed.extend(edges)
+                    else:
+                        self.dropped += 1
+                else:
+                    self.dropped += 1
+                self._frames.pop()
+            self.dropped += sum(frame['pending'] for frame in self._frames)
+            self._frames = []
+        return completed
+
+    def stats(self) -> dict:
+        return {"recovered": self.recovered, "repaired": self.repaired, "dropped": self.dropped}
+
+
+def parse_edges(text: str) -> StreamingEdgeParser:
+    """Parse a complete response in one go; returns the finished parser."""
+    parser = StreamingEdgeParser()
+    parser.feed(text)
+    parser.close()
+    return parser
@@ -0,0 +1,93 @@
+# Fast, parallel file reading for load_documents
+#
+# Kept free of heavy imports so process-pool workers start quickly; `unstructured` is only
+# imported for file types that actually need it.
+
+import hashlib
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Extensions read directly as UTF-8 text instead of going through unstructured
+PLAIN_TEXT_EXTENSIONS = {".txt", ".md", ".markdown", ".text", ".csv", ".tsv", ".log", ".rst"}
+# Parsed files allowed in flight per pool worker ahead of the consumer
+PREFETCH_PER_WORKER = 2
+
+
+def list_files(path: str) -> list:
+    """Every non-hidden file under `path`, in a stable order (matches DirectoryLoader's default glob)."""
+    found = []
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        found.extend(os.path.join(root, name) for name in sorted(files) if not name.startswith("."))
+    return found
+
+
+def corpus_fingerprint(path: str) -> str:
+    """Hash of every file's relative path, size and modification time; changes when the corpus does."""
+    digest = hashlib.sha256()
+    for file_path in list_files(path):
+        stat = os.stat(file_path)
+        digest.update(f"{os.path.relpath(file_path, path)}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def read_plain_text(file_path: str) -> str:
+    """Read a UTF-8 file through a memory map, avoiding Python-level buffered reads."""
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return mapped[:].decode("utf-8", errors="replace")
+
+
+def read_file(file_path: str) -> list:
+    """Return [(text, metadata), ...] for one file; plain tuples are cheap to send between processes."""
+    if os.path.splitext(file_path)[1].lower() in PLAIN_TEXT_EXTENSIONS:
+        return [(read_plain_text(file_path), {"source": file_path})]
+    from unstructured.partition.auto import partition
+    elements = partition(filename=file_path)
+    return [("\n\n".join(str(element) for element in elements), {"source": file_path})]
+
+
+def iter_file_contents(path: str, max_workers: int = None, prefetch: int = PREFETCH_PER_WORKER):
+    """Yield (text, metadata) for every file under `path`, in file order.
+
+    Plain-text files are read in-process (a memory-mapped read is cheaper than shipping the
+    text back from a worker); files that need `unstructured` are parsed across a process pool.
+    At most `max_workers * prefetch` parses are in flight or waiting to be consumed, so a slow
+    consumer holds back the pool instead of letting parsed text pile up.
+    """
+    files = list_files(path)
+    heavy = iter([f for f in files if os.path.splitext(f)[1].lower() not in PLAIN_TEXT_EXTENSIONS])
+    if max_workers == 1:
+        for file_path in files:
+            yield from read_file(file_path)
+        return
+    first = next(heavy, None)
+    if first is None:
+        for file_path in files:
+            yield from read_file(file_path)
+        return
+    workers = max_workers or os.cpu_count() or 1
+    window = max(1, workers * prefetch)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {first: executor.submit(read_file, first)}
+
+        def top_up():
+            # Heavy files are submitted in file order, so the next one needed is always in flight
+            while len(futures) < window:
+                file_path = next(heavy, None)
+                if file_path is None:
+                    return
+                futures[file_path] = executor.submit(read_file, file_path)
+
+        top_up()
+        for file_path in files:
+            future = futures.pop(file_path, None)
+            if future is None:
+                yield from read_file(file_path)
+                continue
+            result = future.result()
+            top_up()
+            yield from result
@@ -0,0 +1,218 @@
+# Node analytics (degree, PageRank, communities) computed over the edge list and stored on :Node
+#
+# Everything runs on integer edge arrays with NumPy scatter/gather (bincount as the sparse
+# matrix-vector product), so the same routines serve Neo4j write-back and the offline engine.
+# Plain NumPy rather than scipy.sparse keeps the dependency list unchanged.
+
+import time
+import numpy as np
+import pandas as pd
+from config.settings import PAGERANK_DAMPING, PAGERANK_TOLERANCE, PAGERANK_MAX_ITER, COMMUNITY_MAX_ITER
+from config.settings import NEO4J_BATCH_SIZE
+from src.metrics import metrics
+
+EDGES_QUERY = "MATCH (a:Node)-[:RELATIONSHIP]->(b:Node) RETURN a.name AS source, b.name AS target"
+NODES_QUERY = """
+MATCH (n:Node)
+RETURN n.name AS name, n.degree AS degree, n.pagerank AS pagerank, n.community AS community
+"""
+ANALYTICS_STATE_QUERY = """
+MATCH (m:GraphMeta {key: 'graph'})
+RETURN m.version AS version, m.analytics_version AS analytics_version
+"""
+WRITE_ANALYTICS_QUERY = """
+UNWIND $rows AS row
+MATCH (n:Node {name: row.name})
+SET n.degree = row.degree, n.in_degree = row.in_degree, n.out_degree = row.out_degree,
+    n.pagerank = row.pagerank, n.community = row.community
+"""
+# The scores are part of query results, so writing them is a graph change like any other
+MARK_ANALYTICS_QUERY = """
+MERGE (m:GraphMeta {key: 'graph'})
+SET m.version = coalesce(m.version, 0) + 1
+SET m.analytics_version = m.version
+"""
+# Nothing to write: record the run without invalidating cached results
+MARK_ANALYTICS_CURRENT_QUERY = """
+MERGE (m:GraphMeta {key: 'graph'})
+SET m.analytics_version = coalesce(m.version, 0)
+"""
+
+
+def degrees(src: np.ndarray, dst: np.ndarray, n: int) -> tuple:
+    """(in-degree, out-degree) per node."""
+    return np.bincount(dst, minlength=n), np.bincount(src, minlength=n)
+
+
+def pagerank(src: np.ndarray, dst: np.ndarray, n: int, damping: float = PAGERANK_DAMPING,
+             tol: float = PAGERANK_TOLERANCE, max_iter: int = PAGERANK_MAX_ITER, start: np.ndarray = None) -> tuple:
+    """PageRank by power iteration; returns (scores summing to 1, iterations).
+
+    `start` warm-starts the iteration (e.g. with the previous scores), which after a small
+    insert converges in a handful of steps. Rank of nodes without out-edges is spread evenly.
+    """
+    if n == 0:
+        return np.zeros(0), 0
+    out_degree = np.bincount(src, minlength=n)
+    weight = 1.0 / out_degree[src]
+    dangling = out_degree == 0
+    scores = np.full(n, 1.0 / n)
+    if start is not None and np.isfinite(start).all() and start.sum() > 0:
+        scores = start / start.sum()
+    for iteration in range(1, max_iter + 1):
+        spread = np.bincount(dst, weights=scores[src] * weight, minlength=n)
+        updated = damping * spread + (1.0 - damping + damping * scores[dangling].sum()) / n
+        delta = np.abs(updated - scores).sum()
+        scores = updated
+        if delta < tol:
+            break
+    return scores, iteration
+
+
+def label_propagation(src: np.ndarray, dst: np.ndarray, n: int, max_iter: int = COMMUNITY_MAX_ITER,
+                      start: np.ndarray = None, seed: int = 0) -> tuple:
+    """Community label per node by label propagation on the undirected graph; returns (labels, iterations).
+
+    Labels are node ids. Each round a random half of the nodes adopts the label most common
+    among its neighbours (ties to the smallest label), keeping its own label when that is
+    already as common; updating half at a time avoids the oscillation of fully synchronous
+    rounds. `start` warm-starts from earlier labels.
+    """
+    labels = np.arange(n) if start is None else start.astype(np.int64).copy()
+    if n == 0:
+        return labels, 0
+    keep = src != dst
+    rows = np.concatenate((src[keep], dst[keep]))
+    cols = np.concatenate((dst[keep], src[keep]))
+    rng = np.random.default_rng(seed)
+    iteration = 0
+    for iteration in range(1, max_iter + 1):
+        # Count (node, neighbour label) pairs; keys come back sorted
+        keys, counts = np.unique(rows * n + labels[cols], return_counts=True)
+        owners, candidates = keys // n, keys % n
+        order = np.lexsort((candidates, -counts, owners))
+        first = order[np.r_[True, owners[order][1:] != owners[order][:-1]]]
+        best_label = labels.copy()
+        best_count = np.zeros(n, dtype=np.int64)
+        best_label[owners[first]] = candidates[first]
+        best_count[owners[first]] = counts[first]
+
+        # How many neighbours already share each node's current label
+        own_keys = np.arange(n) * n + labels
+        pos = np.minimum(np.searchsorted(keys, own_keys), len(keys) - 1)
+        own_count = np.where(keys[pos] == own_keys, counts[pos], 0)
+
+        improvable = best_count > own_count
+        if not improvable.any():
+            break
+        move = improvable & (rng.random(n) < 0.5)
+        labels[move] = best_label[move]
+    return labels, iteration
+
+
+def compute_analytics(edges: pd.DataFrame, previous: pd.DataFrame = None) -> pd.DataFrame:
+    """Degree, PageRank and community per node of an edge list (`source`, `target` columns).
+
+    `previous` (name, pagerank, community) warm-starts PageRank and label propagation so
+    communities keep their ids across runs. Communities are named after a member node.
+    """
+    codes, names = pd.factorize(pd.concat([edges["source"], edges["target"]], ignore_index=True).astype(str))
+    n, n_edges = len(names), len(edges)
+    src, dst = codes[:n_edges].astype(np.int64), codes[n_edges:].astype(np.int64)
+
+    rank_start = label_start = None
+    if previous is not None and len(previous):
+        known = previous.set_index("name").reindex(names)
+        if known["pagerank"].notna().any():
+            rank_start = known["pagerank"].fillna(1.0 / max(n, 1)).to_numpy(dtype=float)
+        ids = pd.Series(np.arange(n), index=names)
+        label_start = known["community"].map(ids).fillna(pd.Series(np.arange(n), index=names)).to_numpy(np.int64)
+
+    in_degree, out_degree = degrees(src, dst, n)
+    scores, rank_iterations = pagerank(src, dst, n, start=rank_start)
+    labels, label_iterations = label_propagation(src, dst, n, start=label_start)
+    print(f"Analytics over {n} node(s), {n_edges} edge(s): PageRank in {rank_iterations} iteration(s), "
+          f"{len(np.unique(labels))} communit(ies) in {label_iterations} round(s)")
+    return pd.DataFrame({
+        "name": names,
+        "in_degree": in_degree,
+        "out_degree": out_degree,
+        "degree": in_degree + out_degree,
+        "pagerank": scores,
+        "community": np.asarray(names, dtype=object)[labels],
+    })
+
+
+def changed_rows(current: pd.DataFrame, previous: pd.DataFrame) -> pd.DataFrame:
+    """Rows of `current` whose stored values are missing or differ (PageRank to 0.1% relative)."""
+    if previous is None or not len(previous):
+        return current
+    old = previous.set_index("name").reindex(current["name"])
+    same = (old["degree"].to_numpy() == current["degree"].to_numpy()) \
+        & np.isclose(old["pagerank"].to_numpy(dtype=float), current["pagerank"].to_numpy(), rtol=1e-3, atol=0) \
+        & (old["community"].to_numpy() == current["community"].to_numpy())
+    return current[~same]
+
+
+def retired_rows(current: pd.DataFrame, previous: pd.DataFrame) -> pd.DataFrame:
+    """Reset rows for nodes that still carry scores but no longer have edges."""
+    if previous is None or not len(previous):
+        return current.iloc[:0]
+    gone = previous[~previous["name"].isin(set(current["name"]))]
+    scored = (gone["degree"].fillna(0) != 0) | (gone["pagerank"].fillna(0) != 0) | gone["community"].notna()
+    gone = gone[scored]
+    return pd.DataFrame({"name": gone["name"].to_numpy(), "in_degree": 0, "out_degree": 0, "degree": 0,
+                         "pagerank": 0.0, "community": None}, columns=current.columns)
+
+
+def _write_analytics(tx, rows: list, batch_size: int) -> None:
+    # One transaction, so readers never see half the graph re-scored
+    for offset in range(0, len(rows), batch_size):
+        tx.run(WRITE_ANALYTICS_QUERY, rows=rows[offset:offset + batch_size]).consume()
+    tx.run(MARK_ANALYTICS_QUERY if rows else MARK_ANALYTICS_CURRENT_QUERY).consume()
+
+
+def update_graph_analytics(force: bool = False, batch_size: int = NEO4J_BATCH_SIZE) -> dict:
+    """Recompute node analytics in Neo4j when the graph changed since the last run.
+
+    Only nodes whose values changed are written back. Nodes left without edges (e.g. after
+    sync retracted them) are reset to zero so they stop outranking live ones. The graph
+    version is bumped only when something was written.
+    """
+    # Imported here so the offline engine can use the math above without the driver installed
+    from src.neo4j_client import session as neo4j_session
+    with neo4j_session() as session:
+        state = session.run(ANALYTICS_STATE_QUERY).single()
+        if not force and state is not None and state["version"] == state["analytics_version"]:
+            print("Graph unchanged since the last analytics run")
+            return {"nodes": 0, "updated": 0}
+
+        with metrics.stage("analytics") as stage:
+            start = time.perf_counter()
+            edges = pd.DataFrame([tuple(record.values()) for record in session.run(EDGES_QUERY)],
+                                 columns=["source", "target"])
+            previous = pd.DataFrame([record.data() for record in session.run(NODES_QUERY)],
+                                    columns=["name", "degree", "pagerank", "community"])
+            current = compute_analytics(edges, previous)
+            update = pd.concat([changed_rows(current, previous), retired_rows(current, previous)], ignore_index=True)
+            rows = [{key: (value.item() if hasattr(value, "item") else value) for key, value in row.items()}
+                    for row in update.astype(object).where(update.notna(), None).to_dict("records")]
+            session.execute_write(_write_analytics, rows, batch_size)
+            stage["rows_out"] = len(rows)
+    print(f"Analytics written for {len(rows)} node(s), {len(current)} with edges, in {time.perf_counter() - start:.2f}s")
+    return {"nodes": len(current), "updated": len(rows)}
+
+
+def rank_results(result: list, k: int) -> tuple:
+    """Order relationship records by the PageRank of their endpoints and keep the top `k`.
+
+    Returns (top records, total count). Records without scores keep their relative order.
+    """
+    if not isinstance(result, list):
+        return result, 0
+
+    def score(record) -> float:
+        nodes = (record.get("n"), record.get("relatedNode")) if isinstance(record, dict) else ()
+        return max([node.get("pagerank") or 0.0 for node in nodes if isinstance(node, dict)], default=0.0)
+
+    return sorted(result, key=score, reverse=True)[:k], len(result)
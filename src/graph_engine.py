@@ -0,0 +1,198 @@
+# Embedded, read-only graph engine over the extracted edge list (no Neo4j required)
+
+import os
+import numpy as np
+import pandas as pd
+from config.settings import GRAPH_TABLE
+from src.entity_index import EntityIndex
+from src.graph_analytics import pagerank
+from src.storage import read_table
+
+NODE_PROPERTIES = ('entity', 'importance', 'category')
+# Only these columns are read from the graph table
+ENGINE_COLUMNS = ['node_1', 'node_2', 'edge', *NODE_PROPERTIES]
+
+
+def _to_csr(rows: np.ndarray, cols: np.ndarray, n: int) -> tuple:
+    """Return (indptr, neighbours, edge ids) for edges rows -> cols, grouped by row."""
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return indptr, cols[order], order
+
+
+def _gather(indptr: np.ndarray, values: np.ndarray, nodes: np.ndarray) -> tuple:
+    """Concatenate the CSR slices of `nodes`; returns (values, owning node) without a Python loop."""
+    starts = indptr[nodes]
+    lengths = indptr[nodes + 1] - starts
+    if lengths.sum() == 0:
+        return values[:0], nodes[:0]
+    owners = np.repeat(nodes, lengths)
+    offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return values[offsets + np.arange(lengths.sum())], owners
+
+
+class GraphEngine:
+    """Compact in-process copy of the knowledge graph.
+
+    Node names are interned to integer ids, adjacency is stored as NumPy CSR arrays
+    (outgoing, incoming and undirected) and edge attributes are kept as columns. Edges are
+    de-duplicated on (node_1, node_2, edge) the way the Neo4j MERGE does, last row winning.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        df = df.dropna(subset=['node_1', 'node_2', 'edge'])
+        df = df.drop_duplicates(subset=['node_1', 'node_2', 'edge'], keep='last')
+
+        codes, names = pd.factorize(pd.concat([df['node_1'], df['node_2']], ignore_index=True).astype(str))
+        self.names = np.asarray(names, dtype=object)
+        self._ids = {name: i for i, name in enumerate(self.names)}
+        n_edges = len(df)
+        self.src = codes[:n_edges].astype(np.int64)
+        self.dst = codes[n_edges:].astype(np.int64)
+
+        # Edge attribute columns
+        self.edge_label = df['edge'].astype(str).to_numpy(dtype=object)
+        self.edge_importance = df['importance'].to_numpy(dtype=object) if 'importance' in df else np.full(n_edges, None)
+        self.edge_category = df['category'].to_numpy(dtype=object) if 'category' in df else np.full(n_edges, None)
+
+        # Node attribute columns: the last edge touching a node sets its properties, as with SET n += props
+        n_nodes = len(self.names)
+        self.node_props = {}
+        for prop in NODE_PROPERTIES:
+            column = np.full(n_nodes, None, dtype=object)
+            if prop in df:
+                values = df[prop].to_numpy(dtype=object)
+                column[self.src] = values
+                column[self.dst] = values
+            self.node_props[prop] = column
+
+        self.out_indptr, self.out_nbrs, self.out_edges = _to_csr(self.src, self.dst, n_nodes)
+        self.in_indptr, self.in_nbrs, self.in_edges = _to_csr(self.dst, self.src, n_nodes)
+        both_rows = np.concatenate((self.src, self.dst))
+        both_cols = np.concatenate((self.dst, self.src))
+        self.adj_indptr, self.adj_nbrs, _ = _to_csr(both_rows, both_cols, n_nodes)
+
+        self.entity_index = EntityIndex(self.names)
+        self._pagerank = None
+
+    @classmethod
+    def from_csv(cls, path: str) -> "GraphEngine":
+        return cls(pd.read_csv(path))
+
+    @classmethod
+    def from_table(cls, path: str = GRAPH_TABLE) -> "GraphEngine":
+        return cls(read_table(path, columns=ENGINE_COLUMNS))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.src)
+
+    @property
+    def pagerank(self) -> np.ndarray:
+        """PageRank per node id, computed on first use."""
+        if self._pagerank is None:
+            self._pagerank, _ = pagerank(self.src, self.dst, len(self.names))
+        return self._pagerank
+
+    def node_ids(self, names) -> np.ndarray:
+        return np.array([self._ids[name] for name in names if name in self._ids], dtype=np.int64)
+
+    def node(self, node_id: int) -> dict:
+        props = {prop: column[node_id] for prop, column in self.node_props.items()}
+        return {'name': self.names[node_id], **props, 'pagerank': float(self.pagerank[node_id])}
+
+    def _record(self, node_id: int, related_id: int, edge_id: int) -> dict:
+        label = self.edge_label[edge_id]
+        return {
+            'n': self.node(node_id),
+            'relatedNode': self.node(related_id),
+            'type(r)': 'RELATIONSHIP',
+            'properties(r)': {
+                'type': label,
+                'relationship': label,
+                'importance': self.edge_importance[edge_id],
+                'category': self.edge_category[edge_id],
+            },
+        }
+
+    def contains(self, term: str) -> list:
+        """Names containing `term` (case-sensitive), like `n.name CONTAINS term` in Cypher."""
+        mask = pd.Series(self.names).str.contains(term, regex=False).to_numpy()
+        return list(self.names[mask])
+
+    def neighbourhood(self, names, limit: int = None) -> list:
+        """Relationships touching any of `names`, in the `n / relatedNode / type(r) / properties(r)` shape.
+
+        Ordered by the PageRank of the related node, so `limit` keeps the most central ones.
+        """
+        ids = self.node_ids(names)
+        out_nbrs, out_owner = _gather(self.out_indptr, self.out_nbrs, ids)
+        out_edges, _ = _gather(self.out_indptr, self.out_edges, ids)
+        in_nbrs, in_owner = _gather(self.in_indptr, self.in_nbrs, ids)
+        in_edges, _ = _gather(self.in_indptr, self.in_edges, ids)
+
+        owners = np.concatenate((out_owner, in_owner))
+        related = np.concatenate((out_nbrs, in_nbrs))
+        edges = np.concatenate((out_edges, in_edges))
+        order = np.argsort(-self.pagerank[related], kind='stable')
+        owners, related, edges = owners[order], related[order], edges[order]
+        if limit is not None:
+            owners, related, edges = owners[:limit], related[:limit], edges[:limit]
+        return [self._record(int(o), int(r), int(e)) for o, r, e in zip(owners, related, edges)]
+
+    def k_hop(self, names, k: int = 2) -> list:
+        """Names reachable from `names` within `k` hops, ignoring edge direction."""
+        frontier = self.node_ids(names)
+        seen = np.zeros(len(self.names), dtype=bool)
+        seen[frontier] = True
+        for _ in range(k):
+            nbrs, _ = _gather(self.adj_indptr, self.adj_nbrs, frontier)
+            nbrs = np.unique(nbrs)
+            frontier = nbrs[~seen[nbrs]]
+            if frontier.size == 0:
+                break
+            seen[frontier] = True
+        return list(self.names[seen])
+
+    def shortest_path(self, source: str, target: str) -> list:
+        """Node names on a shortest undirected path from `source` to `target`, or [] if none."""
+        if source not in self._ids or target not in self._ids:
+            return []
+        start, goal = self._ids[source], self._ids[target]
+        parent = np.full(len(self.names), -1, dtype=np.int64)
+        parent[start] = start
+        frontier = np.array([start], dtype=np.int64)
+        while frontier.size and parent[goal] < 0:
+            nbrs, owners = _gather(self.adj_indptr, self.adj_nbrs, frontier)
+            fresh = parent[nbrs] < 0
+            nbrs, owners = nbrs[fresh], owners[fresh]
+            nbrs, first = np.unique(nbrs, return_index=True)
+            parent[nbrs] = owners[first]
+            frontier = nbrs
+        if parent[goal] < 0:
+            return []
+        path = [goal]
+        while path[-1] != start:
+            path.append(int(parent[path[-1]]))
+        return [self.names[i] for i in reversed(path)]
+
+    def query(self, question: str, limit: int = None) -> dict:
+        """Answer a question from the entities it mentions, in the same shape as `chain.invoke`."""
+        names = self.entity_index.find(question)
+        return {"query": question, "result": self.neighbourhood(names, limit), "entities": names}
+
+
+_engine = {"path": None, "mtime": None, "engine": None}
+
+
+def get_offline_engine(path: str = GRAPH_TABLE) -> GraphEngine:
+    """Return a GraphEngine for `path`, reloading it only when the file changes."""
+    mtime = os.path.getmtime(path)
+    if _engine["engine"] is None or _engine["path"] != path or _engine["mtime"] != mtime:
+        load = GraphEngine.from_csv if path.endswith(".csv") else GraphEngine.from_table
+        _engine.update(path=path, mtime=mtime, engine=load(path))
+    return _engine["engine"]
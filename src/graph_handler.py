@@ -1,135 +1,534 @@
-import json
 import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 import numpy as np
+import ollama
 import pandas as pd
-from neo4j import GraphDatabase
 from langchain.chains import GraphCypherQAChain
 from langchain_ollama import ChatOllama
-from config.settings import NEO4J_URL, NEO4J_DATABASE, NEO4J_USER, NEO4J_PASSWORD, AUTH
+from config.settings import NEO4J_BATCH_SIZE, NEO4J_WRITE_WORKERS, NEO4J_WRITE_PARTITIONS
+from config.settings import OLLAMA_BASE_URL, EXTRACTION_WORKERS, EXTRACTION_TIMEOUT, EXTRACTION_RETRIES, EXTRACTION_BACKOFF
+from config.settings import EXTRACTION_BATCH_TOKENS, CHARS_PER_TOKEN, EXTRACTED_EDGES_TABLE
+from config.prompt import GRAPH_SYS_PROMPT, GRAPH_BATCH_INSTRUCTIONS, GRAPH_PROMPT_VERSION
+from src.extraction_cache import ExtractionCache
+from src.extraction_parser import StreamingEdgeParser, normalize_record, EDGE_FIELDS, REQUIRED_FIELDS
+from src.entity_index import entity_index
+from src.metrics import metrics
+from src.storage import write_table, GRAPH_SCHEMA
+from src.neo4j_client import get_graph, session as neo4j_session
 
 # Handles graph-related operations
 
-from langchain.graphs import Neo4jGraph
-
 def connect_to_graph():
-    return Neo4jGraph()
+    return get_graph()
 
-import pandas as pd
-import json
+# One ChatOllama client per (worker thread, model), reused across chunks
+_clients = threading.local()
+
+def get_model_instance(model: str, timeout: float = EXTRACTION_TIMEOUT) -> ChatOllama:
+    """Return the ChatOllama client owned by the calling thread, creating it on first use."""
+    cache = getattr(_clients, "instances", None)
+    if cache is None:
+        cache = _clients.instances = {}
+    key = (model, timeout)
+    if key not in cache:
+        cache[key] = ChatOllama(model=model, format="json", base_url=OLLAMA_BASE_URL,
+                                client_kwargs={"timeout": timeout})
+    return cache[key]
+
+# Prompt/completion token totals reported by Ollama across all extraction calls
+token_usage = {"prompt_tokens": 0, "completion_tokens": 0, "requests": 0}
+# Edge records recovered, repaired and dropped by the response parser across all calls
+parse_stats = {"recovered": 0, "repaired": 0, "dropped": 0}
+_token_lock = threading.Lock()
+
+def record_token_usage(message) -> None:
+    usage = getattr(message, "usage_metadata", None) or {}
+    with _token_lock:
+        token_usage["prompt_tokens"] += usage.get("input_tokens", 0)
+        token_usage["completion_tokens"] += usage.get("output_tokens", 0)
+        token_usage["requests"] += 1
+    metrics.inc("llm_requests_total")
+    metrics.inc("llm_prompt_tokens_total", usage.get("input_tokens", 0))
+    metrics.inc("llm_completion_tokens_total", usage.get("output_tokens", 0))
 
-def graph_prompt(input_text: str, metadata: dict = None, model: str = "mistral-openorca:latest") -> list:
+def estimate_tokens(text: str) -> int:
+    """Rough token count used for packing; exact counts come back from Ollama."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def stream_and_parse(model_instance, prompt: str) -> StreamingEdgeParser:
+    """Stream a completion into the edge parser, so records are validated as they arrive."""
+    parser = StreamingEdgeParser()
+    message = None
+    start = time.perf_counter()
+    for piece in model_instance.stream(prompt):
+        parser.feed(piece.content)
+        message = piece if message is None else message + piece
+    parser.close()
+    elapsed = time.perf_counter() - start
+    metrics.observe("llm_request_seconds", elapsed)
+    if message is not None:
+        record_token_usage(message)
+        completion = (getattr(message, "usage_metadata", None) or {}).get("output_tokens", 0)
+        if completion and elapsed > 0:
+            metrics.observe("llm_tokens_per_second", completion / elapsed)
+    with _token_lock:
+        for key, value in parser.stats().items():
+            parse_stats[key] += value
+    for key, value in parser.stats().items():
+        metrics.inc("parsed_edges_total", value, outcome=key)
+    return parser
+
+def graph_prompt(input_text: str, metadata: dict = None, model: str = "mistral-openorca:latest") -> dict:
     metadata = metadata or {}
 
-    model_instance = ChatOllama(model=model, format="json")
-    sys_prompt = (
-        "You are a network graph maker who extracts terms and their relations from a given context. "
-        "You are provided with a context chunk (delimited by ```) Your task is to extract the ontology "
-        "of terms mentioned in the given context. These terms should represent the key concepts as per the context. \n"
-        "Thought 1: While traversing through each sentence, Think about the key terms mentioned in it.\n"
-            "\tTerms may include object, entity, location, organization, person, \n"
-            "\tcondition, acronym, documents, service, concept, etc.\n"
-            "\tTerms should be as atomistic as possible\n\n"
-        "Thought 2: Think about how these terms can have one on one relation with other terms.\n"
-            "\tTerms that are mentioned in the same sentence or the same paragraph are typically related to each other.\n"
-            "\tTerms can be related to many other terms\n\n"
-        "Thought 3: Find out the relation between each such related pair of terms. \n\n"
-        "Format your output as a list of json. Each element of the list contains a pair of terms"
-        "and the relation between them, like the following: \n"
-        "   {\n"
-        '       "node_1": "A concept from extracted ontology",\n'
-        '       "node_2": "A related concept from extracted ontology",\n'
-        '       "edge": "relationship between the two concepts, node_1 and node_2 in one or two sentences"\n'
-        '       "entity": The Concept,\n'
-        '       "importance": The contextual importance of the concept on a scale of 1 to 5 (5 being the highest),\n'
-        '       "category": The Type of Concept,\n'
-        "   }, {...}\n Strictly the response should be in JSON format\n"
-    )
+    model_instance = get_model_instance(model)
     
     user_prompt = f"context: ```{input_text}```"
-    full_prompt = f"{sys_prompt}\n\n{user_prompt}"
+    full_prompt = f"{GRAPH_SYS_PROMPT}\n\n{user_prompt}"
     print("Getting graph prompt response...")
-    response = model_instance.invoke(full_prompt).content
-    try:
-        result = json.loads(response)
-        print("Graph prompt result:", result)
-        return result
-    except json.JSONDecodeError as e:
-        print("Failed to parse JSON:", e)
+    parser = stream_and_parse(model_instance, full_prompt)
+    if not parser.recovered and not parser.parsed_objects:
+        print(f"Failed to parse JSON for chunk {metadata.get('chunk_id')}: {parser.text[:200]!r}")
         return None
+    result = {"nodes": [edge for _, edge in parser.edges]}
+    print(f"Graph prompt result: {parser.recovered} edge(s) "
+          f"({parser.repaired} repaired, {parser.dropped} dropped)")
+    return result
 
-def df_to_graph(df: pd.DataFrame, model: str = "llama3.2:3B") -> pd.DataFrame:
-    
-    results = df.apply(
-        lambda row: graph_prompt(row['Page Content'], {"chunk_id": row['chunk_id']}, model),
-        axis=1
-    )
-    
+def batch_graph_prompt(chunks: list, model: str = "mistral-openorca:latest") -> dict:
+    """Extract several chunks in one request.
+
+    `chunks` is a list of (chunk_id, text). Returns {chunk_id: result} for every chunk whose
+    entry in the response is complete; chunks missing from it, or cut off mid-way, are left
+    out so the caller can retry them one at a time.
+    """
+    model_instance = get_model_instance(model)
+    # Short positional ids keep the delimiters cheap; they are mapped back below
+    labels = {f"c{i}": chunk_id for i, (chunk_id, _) in enumerate(chunks)}
+    contexts = "\n\n".join(f"### chunk c{i}\n```{text}```" for i, (_, text) in enumerate(chunks))
+    full_prompt = f"{GRAPH_SYS_PROMPT}\n{GRAPH_BATCH_INSTRUCTIONS}\n{contexts}"
+    print(f"Getting batched graph prompt response for {len(chunks)} chunk(s)...")
+    parser = stream_and_parse(model_instance, full_prompt)
+
+    results = {labels[label]: {"nodes": []} for label in parser.closed_keys if label in labels}
+    for label, edge in parser.edges:
+        if labels.get(label) in results:
+            results[labels[label]]["nodes"].append(edge)
+    return results
+
+def pack_chunks(texts: list, budget: int = EXTRACTION_BATCH_TOKENS) -> list:
+    """Group chunk indices into batches whose estimated prompt size stays within `budget` tokens.
+
+    The shared instructions are counted once per batch; a chunk too large to share a batch
+    is sent on its own.
+    """
+    overhead = estimate_tokens(GRAPH_SYS_PROMPT) + estimate_tokens(GRAPH_BATCH_INSTRUCTIONS)
+    batches, current, used = [], [], overhead
+    for i, text in enumerate(texts):
+        cost = estimate_tokens(text) + 8  # delimiter line and fences
+        if current and used + cost > budget:
+            batches.append(current)
+            current, used = [], overhead
+        current.append(i)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+# Failures worth retrying: Ollama was unreachable or too slow (ChatOllama talks to it over httpx)
+TRANSIENT_ERRORS = (httpx.TransportError, ConnectionError, TimeoutError)
+
+def is_transient(error: Exception) -> bool:
+    """True for timeouts, connection errors and overloaded-server responses (429 and 5xx)."""
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, TRANSIENT_ERRORS)
+
+def call_with_retry(fn, *args, retries: int = EXTRACTION_RETRIES, backoff: float = EXTRACTION_BACKOFF,
+                    label: str = "", default=None):
+    """Call fn(*args), retrying timeouts and connection errors with exponential backoff.
+
+    Any other exception is a bug or a request the server rejected, and is raised at once.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args)
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            if attempt == retries:
+                metrics.inc("llm_failures_total")
+                print(f"Extraction failed for {label}: {e}")
+                return default
+            metrics.inc("llm_retries_total")
+            delay = backoff * (2 ** attempt)
+            print(f"Extraction error ({e}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+def graph_prompt_with_retry(input_text: str, metadata: dict = None, model: str = "mistral-openorca:latest",
+                            retries: int = EXTRACTION_RETRIES, backoff: float = EXTRACTION_BACKOFF):
+    """Call graph_prompt, retrying timeouts and connection errors with exponential backoff."""
+    return call_with_retry(graph_prompt, input_text, metadata, model, retries=retries, backoff=backoff,
+                           label=f"chunk {(metadata or {}).get('chunk_id')}")
+
+def extract_graph(df: pd.DataFrame, model: str = "llama3.2:3B", max_workers: int = EXTRACTION_WORKERS,
+                  retries: int = EXTRACTION_RETRIES, cache: ExtractionCache = None,
+                  batch_tokens: int = 0) -> list:
+    """Run graph_prompt over every chunk with at most `max_workers` requests in flight.
+
+    Results are returned in the same order as the rows of `df`; chunks that still fail
+    after `retries` attempts yield None. When a cache is given, only chunks without a
+    cached result are sent to the model. With `batch_tokens` set, chunks are packed into
+    multi-chunk requests of about that many prompt tokens, and any chunk the batched
+    response does not cover is retried on its own.
+    """
+    texts = df['Page Content'].tolist()
+    chunk_ids = df['chunk_id'].tolist()
+    results = [cache.get(chunk_id, model) if cache is not None else None for chunk_id in chunk_ids]
+    pending = [i for i, result in enumerate(results) if result is None]
+    usage_before = dict(token_usage)
+    parse_before = dict(parse_stats)
+    start = time.perf_counter()
+
+    def run(i):
+        result = graph_prompt_with_retry(texts[i], {"chunk_id": chunk_ids[i]}, model, retries)
+        if cache is not None:
+            cache.put(chunk_ids[i], model, result)
+        return result
+
+    def run_batch(batch):
+        chunks = [(chunk_ids[i], texts[i]) for i in batch]
+        parsed = call_with_retry(batch_graph_prompt, chunks, model, retries=retries,
+                                 label=f"batch of {len(batch)} chunk(s)", default={})
+        for i in batch:
+            if chunk_ids[i] in parsed and cache is not None:
+                cache.put(chunk_ids[i], model, parsed[chunk_ids[i]])
+        return parsed
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="extract") as executor:
+        if batch_tokens:
+            batches = [[pending[j] for j in batch] for batch in pack_chunks([texts[i] for i in pending], batch_tokens)]
+            batches = [batch for batch in batches if len(batch) > 1]
+            for batch, parsed in zip(batches, executor.map(run_batch, batches)):
+                for i in batch:
+                    results[i] = parsed.get(chunk_ids[i])
+            fallback = [i for i in pending if results[i] is None]
+            if batches:
+                print(f"Batched {len(pending) - len(fallback)} chunk(s) into {len(batches)} request(s); "
+                      f"{len(fallback)} chunk(s) sent individually")
+        else:
+            fallback = pending
+        for i, result in zip(fallback, executor.map(run, fallback)):
+            results[i] = result
+
+    elapsed = time.perf_counter() - start
+    rate = len(pending) / elapsed if elapsed > 0 else 0.0
+    print(f"Extracted {len(pending)} chunk(s) in {elapsed:.1f}s ({rate:.2f} chunks/s, {max_workers} worker(s))")
+    print(f"Tokens: {token_usage['prompt_tokens'] - usage_before['prompt_tokens']} prompt, "
+          f"{token_usage['completion_tokens'] - usage_before['completion_tokens']} completion "
+          f"in {token_usage['requests'] - usage_before['requests']} request(s)")
+    print("Parsed edges: " + ", ".join(f"{parse_stats[key] - parse_before[key]} {key}" for key in parse_stats))
+    if cache is not None:
+        print(f"Extraction cache: {len(texts) - len(pending)} hit(s), {len(pending)} miss(es)")
+    return results
+
+def result_records(result) -> list:
+    """Return the edges of a graph_prompt result as typed records with exactly EDGE_FIELDS.
+
+    Results cached before the streaming parser existed may still use other key layouts, so
+    every record goes through normalize_record again (a no-op for already typed edges).
+    """
+    if not result:
+        return []
     # Dynamically handle both 'nodes' and 'ontology'
-    nodes_data = []
-    for result in results:
-        if result:
-            # Check if 'nodes' or 'ontology' is in the result
-            if 'nodes' in result:
-                nodes_data.append(result['nodes'])
-            elif 'ontology' in result:
-                nodes_data.append(result['ontology'])
-    
-    # Flatten the list of lists and convert to a DataFrame
-    flattened_nodes = [item for sublist in nodes_data for item in sublist]
-    
-    graph_data = pd.DataFrame(flattened_nodes)
-    
-    # Clean the DataFrame by dropping any NaN values and resetting the index
-    df_cleaned = graph_data.dropna().reset_index(drop=True)
+    records = result.get('nodes', result.get('ontology', [])) if isinstance(result, dict) else result
+    if not isinstance(records, list):
+        return []
+    return [edge for record in records if isinstance(record, dict) for edge in normalize_record(record)[0]]
+
+def extraction_version(model: str) -> str:
+    """Identifies the model and prompt that produced an edge; a change means re-extraction."""
+    return f"{model}@{GRAPH_PROMPT_VERSION}"
+
+# Per-edge provenance carried from df_to_graph through resolve_graph into Neo4j
+PROVENANCE_FIELDS = ('chunk_id', 'source', 'extraction_version')
+
+def df_to_graph(df: pd.DataFrame, model: str = "llama3.2:3B", max_workers: int = EXTRACTION_WORKERS,
+                use_cache: bool = True, batch_tokens: int = EXTRACTION_BATCH_TOKENS) -> pd.DataFrame:
+    return extract_edges(df, model, max_workers, use_cache, batch_tokens)[0]
+
+def extract_edges(df: pd.DataFrame, model: str = "llama3.2:3B", max_workers: int = EXTRACTION_WORKERS,
+                  use_cache: bool = True, batch_tokens: int = EXTRACTION_BATCH_TOKENS) -> tuple:
+    """df_to_graph that also returns the chunk ids whose extraction failed, as (edges, failed ids)."""
+    with metrics.stage("extract", rows_in=len(df)) as stage:
+        cache = ExtractionCache() if use_cache else None
+        try:
+            results = extract_graph(df, model=model, max_workers=max_workers, cache=cache, batch_tokens=batch_tokens)
+        finally:
+            if cache is not None:
+                cache.close()
+
+        # Flatten the list of lists and convert to a DataFrame, tagging every edge with its chunk
+        version = extraction_version(model)
+        failed = [chunk_id for chunk_id, result in zip(df['chunk_id'], results) if result is None]
+        flattened_nodes = [{**item, 'chunk_id': chunk_id, 'source': source, 'extraction_version': version}
+                           for chunk_id, source, result in zip(df['chunk_id'], df['Source'], results)
+                           for item in result_records(result)]
+
+        graph_data = pd.DataFrame(flattened_nodes, columns=list(EDGE_FIELDS + PROVENANCE_FIELDS))
+
+        # Drop edges missing an endpoint or relation and reset the index
+        df_cleaned = graph_data.dropna(subset=list(REQUIRED_FIELDS)).reset_index(drop=True)
+        stage["rows_out"] = len(df_cleaned)
     
-    # Save the cleaned data to a CSV
-    df_cleaned.to_csv("graph_data.csv", index=False)
+    # Keep the raw extraction output next to the other intermediate tables
+    write_table(df_cleaned, EXTRACTED_EDGES_TABLE, GRAPH_SCHEMA)
     
-    return df_cleaned
+    return df_cleaned, failed
+
+SCHEMA_STATEMENTS = [
+    # Uniqueness also gives MERGE (n:Node {name: ...}) an index lookup instead of a label scan
+    "CREATE CONSTRAINT node_name_unique IF NOT EXISTS FOR (n:Node) REQUIRE n.name IS UNIQUE",
+    # Backs the `n.name CONTAINS '...'` filters generated on the query path
+    "CREATE TEXT INDEX node_name_text IF NOT EXISTS FOR (n:Node) ON (n.name)",
+    "CREATE INDEX node_category IF NOT EXISTS FOR (n:Node) ON (n.category)",
+    "CREATE INDEX relationship_type IF NOT EXISTS FOR ()-[r:RELATIONSHIP]-() ON (r.type)",
+    # Chunk bookkeeping nodes used by incremental sync (see src/graph_sync.py)
+    "CREATE CONSTRAINT chunk_id_unique IF NOT EXISTS FOR (c:Chunk) REQUIRE c.chunk_id IS UNIQUE",
+    # Lets ORDER BY n.pagerank DESC LIMIT k read the index instead of sorting every match
+    "CREATE INDEX node_pagerank IF NOT EXISTS FOR (n:Node) ON (n.pagerank)",
+]
+
+INSERT_EDGES_QUERY = """
+UNWIND $rows AS row
+MERGE (n1:Node {name: row.node_1})
+SET n1 += row.node1_props
+MERGE (n2:Node {name: row.node_2})
+SET n2 += row.node2_props
+MERGE (n1)-[r:RELATIONSHIP {type: row.edge}]->(n2)
+SET r += row.edge_props
+// Another chunk re-asserting an edge can only raise its importance
+SET r.importance = CASE WHEN r.importance IS NULL OR row.importance > r.importance
+                        THEN coalesce(row.importance, r.importance) ELSE r.importance END
+WITH r, row, coalesce(r.chunk_ids, []) AS known
+// Provenance: parallel chunk_ids / sources / chunk_counts lists, each chunk recorded once.
+// The count grows by the occurrences of the chunks new to the edge, so re-inserting a chunk
+// leaves it unchanged; edges without provenance keep the count they are given.
+WITH r, known, row, [i IN range(0, size(row.chunk_ids) - 1) WHERE NOT row.chunk_ids[i] IN known] AS fresh
+SET r.chunk_ids = known + [i IN fresh | row.chunk_ids[i]],
+    r.sources = coalesce(r.sources, []) + [i IN fresh | row.sources[i]],
+    // edges stored before per-chunk counts existed count each known chunk once
+    r.chunk_counts = [i IN range(0, size(known) - 1) | coalesce(r.chunk_counts[i], 1)] + [i IN fresh | row.chunk_counts[i]],
+    r.count = CASE WHEN size(row.chunk_ids) = 0 THEN coalesce(row.count, r.count, 1)
+                   ELSE coalesce(r.count, 0) + reduce(total = 0, i IN fresh | total + row.chunk_counts[i]) END
+"""
+
+# Bookkeeping schema (sync chunks, graph version), hidden from the Cypher-generation prompt
+INTERNAL_LABELS = ('Chunk', 'GraphMeta')
+INTERNAL_RELATIONSHIPS = ('EXTRACTED',)
+
+# Chunk nodes record which chunks (and extraction version) the graph holds, and link to the
+# nodes each chunk mentioned so its edges can be found without scanning the whole graph
+REGISTER_CHUNKS_QUERY = """
+UNWIND $chunks AS chunk
+MERGE (c:Chunk {chunk_id: chunk.chunk_id})
+SET c.source = chunk.source, c.extraction_version = chunk.extraction_version
+WITH c, chunk
+UNWIND chunk.names AS name
+MATCH (n:Node {name: name})
+MERGE (c)-[:EXTRACTED]->(n)
+"""
+
+# Monotonic graph version, bumped after every committed write; query result caches are keyed on it
+GRAPH_VERSION_QUERY = "MATCH (m:GraphMeta {key: 'graph'}) RETURN m.version AS version"
+BUMP_GRAPH_VERSION_QUERY = """
+MERGE (m:GraphMeta {key: 'graph'})
+SET m.version = coalesce(m.version, 0) + 1, m.updated_at = timestamp()
+RETURN m.version AS version
+"""
+
+def _bump_graph_version(tx) -> int:
+    return tx.run(BUMP_GRAPH_VERSION_QUERY).single()["version"]
+
+def bump_graph_version() -> int:
+    """Record that the graph changed; call after the write has committed."""
+    with neo4j_session() as session:
+        return session.execute_write(_bump_graph_version)
 
 def initialise_neo4j_schema():
-    with GraphDatabase.driver(NEO4J_URL, auth=AUTH) as driver:
-        with driver.session(database=NEO4J_DATABASE) as session:
-            print("Schema initialized successfully.")
-
-def insert_dataframe_to_neo4j(df: pd.DataFrame) -> None:
-    with GraphDatabase.driver(NEO4J_URL, auth=AUTH) as driver:
-        with driver.session(database=NEO4J_DATABASE) as session:
-            for _, row in df.iterrows():
-                node_1_props = {
-                    'name': row['node_1'],
-                    'entity': row['entity'],
-                    'importance': row['importance'],
-                    'category': row['category']
-                }
-                node_2_props = {
-                    'name': row['node_2'],
-                    'entity': row['entity'],
-                    'importance': row['importance'],
-                    'category': row['category']
-                }
-                edge_props = {
-                    'type': row['edge'],
-                    'relationship': row['edge'],
-                    'importance': row['importance'],
-                    'category': row['category']
-                }
-                query = """
-                MERGE (n1:Node {name: $node1_name})
-                SET n1 += $node1_props
-                MERGE (n2:Node {name: $node2_name})
-                SET n2 += $node2_props
-                MERGE (n1)-[r:RELATIONSHIP {type: $edge_type}]->(n2)
-                SET r += $edge_props
-                """
-                session.run(query,
-                            node1_name=node_1_props['name'],
-                            node1_props=node_1_props,
-                            node2_name=node_2_props['name'],
-                            node2_props=node_2_props,
-                            edge_type=edge_props['type'],
-                            edge_props=edge_props)
-            print("Data inserted into Neo4j successfully.")
+    with neo4j_session() as session:
+        for statement in SCHEMA_STATEMENTS:
+            session.run(statement).consume()
+        print("Schema initialized successfully.")
+
+GRAPH_COLUMNS = EDGE_FIELDS
+
+def edge_row(node_1, node_2, edge, entity, importance, category, count=None,
+             chunk_ids=None, sources=None, extraction_version=None, chunk_counts=None) -> dict:
+    """Build the parameter map for one edge consumed by INSERT_EDGES_QUERY.
+
+    `chunk_ids` and `sources` are parallel lists naming the chunks the edge was extracted from;
+    `chunk_counts` holds how often each chunk produced it (1 each by default, or `count` for a
+    single chunk). `importance` and `count` are merged into the stored edge, not overwritten.
+    """
+    chunk_ids = list(chunk_ids or [])
+    if chunk_counts is None:
+        chunk_counts = [count or 1] if len(chunk_ids) == 1 else [1] * len(chunk_ids)
+    if importance is not None and pd.isna(importance):
+        importance = None
+    shared = {'entity': entity, 'importance': importance, 'category': category}
+    edge_props = {'type': edge, 'relationship': edge, 'category': category}
+    if extraction_version is not None:
+        edge_props['extraction_version'] = extraction_version
+    return {
+        'node_1': node_1,
+        'node_2': node_2,
+        'edge': edge,
+        'node1_props': {'name': node_1, **shared},
+        'node2_props': {'name': node_2, **shared},
+        'edge_props': edge_props,
+        'importance': importance,
+        'count': count,
+        'chunk_ids': chunk_ids,
+        'sources': list(sources or []),
+        'chunk_counts': [int(value) for value in chunk_counts],
+    }
+
+def _provenance_lists(df: pd.DataFrame, column: str) -> list:
+    """Per-row provenance lists from either an aggregated list column or a scalar one."""
+    if f'{column}s' in df:
+        return [list(value) if isinstance(value, (list, tuple, np.ndarray)) else [] for value in df[f'{column}s']]
+    if column in df:
+        return [[value] if pd.notna(value) else [] for value in df[column].tolist()]
+    return [[] for _ in range(len(df))]
+
+def dataframe_to_edge_rows(df: pd.DataFrame) -> list:
+    """Turn graph DataFrame rows into the parameter maps consumed by INSERT_EDGES_QUERY."""
+    df = df.dropna(subset=['node_1', 'node_2', 'edge'])
+    # tolist() yields native Python scalars, which the driver can serialise (numpy ints cannot always)
+    columns = [df[column].tolist() for column in GRAPH_COLUMNS]
+    counts = df['count'].tolist() if 'count' in df else [None] * len(df)
+    versions = [v if pd.notna(v) else None for v in df['extraction_version'].tolist()] \
+        if 'extraction_version' in df else [None] * len(df)
+    chunk_ids = _provenance_lists(df, 'chunk_id')
+    sources = _provenance_lists(df, 'source')
+    chunk_counts = _provenance_lists(df, 'chunk_count') if 'chunk_counts' in df else [None] * len(df)
+    return [edge_row(*values, count=count, chunk_ids=chunk_list, sources=source_list, extraction_version=version,
+                     chunk_counts=count_list)
+            for values, count, chunk_list, source_list, version, count_list
+            in zip(zip(*columns), counts, chunk_ids, sources, versions, chunk_counts)]
+
+def chunk_rows_from_edge_rows(rows: list) -> list:
+    """Chunk bookkeeping rows (id, source, version, mentioned names) for REGISTER_CHUNKS_QUERY."""
+    chunks = {}
+    for row in rows:
+        for chunk_id, source in zip(row['chunk_ids'], row['sources']):
+            chunk = chunks.setdefault(chunk_id, {
+                'chunk_id': chunk_id, 'source': source,
+                'extraction_version': row['edge_props'].get('extraction_version'), 'names': set()})
+            chunk['names'].update((row['node_1'], row['node_2']))
+    return [{**chunk, 'names': sorted(chunk['names'])} for chunk in chunks.values()]
+
+def _register_chunk_batch(tx, chunks: list) -> None:
+    tx.run(REGISTER_CHUNKS_QUERY, chunks=chunks).consume()
+
+def register_chunks(chunks: list, batch_size: int = NEO4J_BATCH_SIZE) -> None:
+    """Record chunks as present in the graph; run after their edges have been written."""
+    with neo4j_session() as session:
+        for offset in range(0, len(chunks), batch_size):
+            session.execute_write(_register_chunk_batch, chunks[offset:offset + batch_size])
+
+def _write_edge_batch(tx, rows: list) -> None:
+    tx.run(INSERT_EDGES_QUERY, rows=rows).consume()
+
+def write_edge_batch(session, rows: list) -> None:
+    """Write one batch in a managed transaction, recording its duration and size.
+
+    execute_write retries the whole batch on transient errors (deadlocks, leader changes),
+    so the recorded duration includes any retries.
+    """
+    start = time.perf_counter()
+    session.execute_write(_write_edge_batch, rows)
+    metrics.observe("neo4j_transaction_seconds", time.perf_counter() - start)
+    metrics.inc("neo4j_transactions_total")
+    metrics.inc("neo4j_rows_written_total", len(rows))
+
+def node_partition(name: str, partitions: int) -> int:
+    """Stable partition of a node name (crc32, so it does not change between processes)."""
+    return zlib.crc32(str(name).encode('utf-8')) % partitions
+
+def partition_schedule(partitions: int) -> list:
+    """Rounds of partition pairs in which no two pairs share a partition.
+
+    Every unordered pair {a, b} (including a == b) appears exactly once. The first round
+    holds the self-pairs; the rest follow the round-robin tournament ("circle") method.
+    """
+    rounds = [[(p, p) for p in range(partitions)]]
+    slots = list(range(partitions)) + ([None] if partitions % 2 else [])
+    n = len(slots)
+    for _ in range(n - 1):
+        pairs = [(slots[i], slots[n - 1 - i]) for i in range(n // 2)]
+        rounds.append([tuple(sorted(pair)) for pair in pairs if None not in pair])
+        slots = [slots[0], slots[-1]] + slots[1:-1]
+    return rounds
+
+def partition_edge_rows(rows: list, partitions: int) -> list:
+    """Group edge rows into schedule rounds of buckets with disjoint endpoint partitions.
+
+    An edge locks both of its endpoint nodes, so it is bucketed by the unordered pair of
+    their partitions. Buckets in the same round never share a partition, so their
+    transactions never touch the same node and can run concurrently without deadlocks.
+    """
+    buckets = {}
+    for row in rows:
+        pair = tuple(sorted((node_partition(row['node_1'], partitions), node_partition(row['node_2'], partitions))))
+        buckets.setdefault(pair, []).append(row)
+    return [[buckets[pair] for pair in round_pairs if pair in buckets]
+            for round_pairs in partition_schedule(partitions)]
+
+def _write_bucket(rows: list, batch_size: int) -> None:
+    with neo4j_session() as session:
+        for offset in range(0, len(rows), batch_size):
+            write_edge_batch(session, rows[offset:offset + batch_size])
+
+def write_edge_rows(rows: list, batch_size: int = NEO4J_BATCH_SIZE, workers: int = NEO4J_WRITE_WORKERS,
+                    partitions: int = NEO4J_WRITE_PARTITIONS) -> None:
+    """Write edge rows with up to `workers` concurrent transactions.
+
+    With more than one worker, rows are split by hashed endpoint names and written round by
+    round (see partition_edge_rows), so concurrent transactions never contend for node locks.
+    Within a bucket rows keep their input order.
+    """
+    if workers <= 1:
+        _write_bucket(rows, batch_size)
+        return
+    partitions = partitions or 2 * workers
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="neo4j-write") as executor:
+        for buckets in partition_edge_rows(rows, partitions):
+            # Finish the round before starting the next: its buckets may share partitions with this one
+            list(executor.map(_write_bucket, buckets, [batch_size] * len(buckets)))
+
+def insert_dataframe_to_neo4j(df: pd.DataFrame, batch_size: int = NEO4J_BATCH_SIZE,
+                              workers: int = NEO4J_WRITE_WORKERS) -> None:
+    with metrics.stage("neo4j_insert", rows_in=len(df)) as stage:
+        rows = dataframe_to_edge_rows(df)
+        start = time.perf_counter()
+        write_edge_rows(rows, batch_size, workers)
+        # Chunks are registered only once all of their edges are written
+        register_chunks(chunk_rows_from_edge_rows(rows))
+        bump_graph_version()
+        stage["rows_out"] = len(rows)
+    # Keep the query fast path aware of the new entities without a full reload
+    entity_index.add_names(name for row in rows for name in (row['node_1'], row['node_2']))
+    elapsed = time.perf_counter() - start
+    rate = len(rows) / elapsed if elapsed > 0 else 0.0
+    print(f"Inserted {len(rows)} edge(s) in {elapsed:.2f}s ({rate:.0f} edges/s, batch size {batch_size}, "
+          f"{max(1, workers)} writer(s))")
+    print("Data inserted into Neo4j successfully.")
 
 def execute_with_fallback(query: str, chain) -> str:
     try:
@@ -0,0 +1,138 @@
+# Incremental graph sync: apply only the chunks that changed since the last run
+
+import time
+import pandas as pd
+from config.settings import NEO4J_BATCH_SIZE, NEO4J_WRITE_WORKERS, SYNC_DELETE_BATCH
+from src.entity_index import entity_index
+from src.entity_resolution import resolve_graph
+from src.graph_handler import extract_edges, insert_dataframe_to_neo4j, register_chunks, extraction_version
+from src.graph_handler import bump_graph_version
+from src.lexical_index import get_lexical_index
+from src.metrics import metrics
+from src.neo4j_client import session as neo4j_session
+
+CHUNK_VERSIONS_QUERY = "MATCH (c:Chunk) RETURN c.chunk_id AS chunk_id, c.extraction_version AS version"
+
+# Drop the removed chunks from the provenance of every edge they contributed to and take
+# their occurrences off the edge count; edges left with no supporting chunk are deleted.
+# Edges are reached through the nodes each chunk mentioned, so the cost follows the size
+# of the change rather than the graph.
+RETRACT_EDGES_QUERY = """
+UNWIND $chunk_ids AS id
+MATCH (:Chunk {chunk_id: id})-[:EXTRACTED]->(:Node)-[r:RELATIONSHIP]->()
+WHERE id IN r.chunk_ids
+WITH r, collect(DISTINCT id) AS removed
+WITH r, r.chunk_ids AS ids, r.sources AS sources, coalesce(r.chunk_counts, []) AS counts,
+     [i IN range(0, size(r.chunk_ids) - 1) WHERE NOT r.chunk_ids[i] IN removed] AS keep
+WITH r, ids, sources, counts, keep,
+     reduce(total = 0, i IN range(0, size(ids) - 1) |
+            total + CASE WHEN i IN keep THEN 0 ELSE coalesce(counts[i], 1) END) AS dropped
+SET r.sources = [i IN keep | sources[i]], r.chunk_ids = [i IN keep | ids[i]],
+    r.chunk_counts = [i IN keep | coalesce(counts[i], 1)], r.count = coalesce(r.count, 0) - dropped
+WITH r WHERE size(r.chunk_ids) = 0
+DELETE r
+RETURN count(*) AS deleted
+"""
+
+# Remove the chunk nodes, then any node they mentioned that no longer has edges or mentions
+DELETE_CHUNKS_QUERY = """
+UNWIND $chunk_ids AS id
+MATCH (c:Chunk {chunk_id: id})
+OPTIONAL MATCH (c)-[:EXTRACTED]->(n:Node)
+WITH c, collect(n) AS mentioned
+DETACH DELETE c
+WITH mentioned
+UNWIND mentioned AS n
+WITH DISTINCT n
+WHERE NOT (n)-[:RELATIONSHIP]-() AND NOT (n)<-[:EXTRACTED]-(:Chunk)
+WITH n, n.name AS name
+DELETE n
+RETURN count(*) AS orphans, collect(name) AS names
+"""
+
+
+def graph_chunk_versions() -> dict:
+    """chunk_id -> extraction version for every chunk currently recorded in the graph."""
+    with neo4j_session() as session:
+        return {record["chunk_id"]: record["version"] for record in session.run(CHUNK_VERSIONS_QUERY)}
+
+
+def diff_chunks(current_ids, existing: dict, version: str) -> tuple:
+    """Split chunk ids into (stale, fresh, unchanged).
+
+    Stale chunks are in the graph but no longer in the corpus, or were extracted with another
+    model/prompt version; fresh ones are in the corpus but not (validly) in the graph.
+    """
+    current = set(current_ids)
+    stale = sorted(chunk_id for chunk_id, chunk_version in existing.items()
+                   if chunk_id not in current or chunk_version != version)
+    unchanged = {chunk_id for chunk_id in current if existing.get(chunk_id) == version}
+    fresh = sorted(current - unchanged)
+    return stale, fresh, unchanged
+
+
+def _retract_batch(tx, chunk_ids: list) -> tuple:
+    deleted = tx.run(RETRACT_EDGES_QUERY, chunk_ids=chunk_ids).single()["deleted"]
+    orphans = tx.run(DELETE_CHUNKS_QUERY, chunk_ids=chunk_ids).single()
+    return deleted, orphans["orphans"], orphans["names"]
+
+
+def remove_chunks(chunk_ids: list, batch_size: int = SYNC_DELETE_BATCH) -> dict:
+    """Retract the edges of `chunk_ids` and garbage-collect nodes left without edges."""
+    totals = {"chunks": len(chunk_ids), "edges_deleted": 0, "orphans_deleted": 0}
+    with neo4j_session() as session:
+        for offset in range(0, len(chunk_ids), batch_size):
+            # Retraction and chunk deletion share a transaction, so a crash never leaves
+            # a chunk node whose edges are already gone
+            deleted, orphans, names = session.execute_write(_retract_batch, chunk_ids[offset:offset + batch_size])
+            totals["edges_deleted"] += deleted
+            totals["orphans_deleted"] += orphans
+            # Deleted nodes must not keep answering questions through the fast path
+            entity_index.remove_names(names)
+    if chunk_ids:
+        bump_graph_version()
+    return totals
+
+
+def sync_graph(df_chunks: pd.DataFrame, model: str = "llama3", resolve: bool = True,
+               batch_size: int = NEO4J_BATCH_SIZE, workers: int = NEO4J_WRITE_WORKERS) -> dict:
+    """Bring the graph in line with `df_chunks`, touching only chunks that changed.
+
+    Chunk ids hash the chunk text and source, so an edited document shows up as removed
+    chunks plus new ones. Entity resolution only sees the newly extracted edges.
+    """
+    with metrics.stage("sync", rows_in=len(df_chunks)) as stage:
+        start = time.perf_counter()
+        version = extraction_version(model)
+        stale, fresh, unchanged = diff_chunks(df_chunks["chunk_id"], graph_chunk_versions(), version)
+        print(f"Sync: {len(unchanged)} unchanged, {len(stale)} stale and {len(fresh)} new chunk(s)")
+
+        totals = remove_chunks(stale)
+        # The chunk text index follows the corpus too; chunks it already holds are skipped
+        lexical_index = get_lexical_index()
+        lexical_index.remove(stale)
+        lexical_index.add(df_chunks)
+        totals.update(unchanged=len(unchanged), inserted_chunks=len(fresh), edges_inserted=0)
+        if fresh:
+            df_fresh = df_chunks[df_chunks["chunk_id"].isin(set(fresh))]
+            df_graph, failed = extract_edges(df_fresh, model=model)
+            if resolve and len(df_graph):
+                df_graph = resolve_graph(df_graph)
+            if len(df_graph):
+                insert_dataframe_to_neo4j(df_graph, batch_size, workers)
+            totals["edges_inserted"] = len(df_graph)
+            # Chunks that produced no edges are recorded too, so they are not re-extracted next time;
+            # failed ones are not, so the next sync retries them
+            extracted = df_fresh[~df_fresh["chunk_id"].isin(set(failed))]
+            register_chunks([{"chunk_id": row.chunk_id, "source": row.Source, "extraction_version": version,
+                              "names": []} for row in extracted[["chunk_id", "Source"]].itertuples(index=False)])
+            totals["failed_chunks"] = len(failed)
+            if failed:
+                print(f"Sync: {len(failed)} chunk(s) failed extraction and will be retried on the next sync")
+        stage["rows_out"] = totals["edges_inserted"]
+
+    for key in ("edges_deleted", "orphans_deleted", "edges_inserted"):
+        metrics.inc(f"sync_{key}_total", totals[key])
+    print(f"Sync finished in {time.perf_counter() - start:.1f}s: {totals['edges_deleted']} edge(s) and "
+          f"{totals['orphans_deleted']} orphan node(s) removed, {totals['edges_inserted']} edge(s) inserted")
+    return totals
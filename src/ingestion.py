@@ -0,0 +1,137 @@
+# Background ingestion job: fetch -> chunk -> schema -> incremental graph sync -> analytics
+#
+# Each stage records the corpus fingerprint it last completed for, so a run over an
+# unchanged corpus skips straight to the end. Heavy modules are imported inside the
+# stages, keeping this module cheap to import from the Streamlit app.
+
+import json
+import os
+import threading
+import time
+from config.settings import RAW_DATA_DIR, WIKI_TOPIC, WIKI_OUTPUT_FILE, CHUNKS_TABLE, INGEST_STATE_FILE
+from config.settings import WIKI_TOPICS, WIKI_CATEGORIES, WIKI_CATEGORY_DEPTH, WIKI_PAGES_DIR
+from src.file_reader import corpus_fingerprint
+
+STAGES = ("fetch", "chunk", "schema", "sync", "analytics")
+
+
+def load_ingest_state(path: str = INGEST_STATE_FILE) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_ingest_state(state: dict, path: str = INGEST_STATE_FILE) -> None:
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def fetch_stage(topics=WIKI_TOPICS, categories=WIKI_CATEGORIES, depth: int = WIKI_CATEGORY_DEPTH) -> None:
+    """Fetch the configured pages into the corpus; only pages with a new revision are downloaded."""
+    if not os.path.exists(WIKI_OUTPUT_FILE):
+        from src.text_processor import get_wikipedia_content, write_text_to_file
+        print("Fetching content from Wikipedia...")
+        write_text_to_file(WIKI_OUTPUT_FILE, get_wikipedia_content(WIKI_TOPIC))
+    if topics or categories:
+        from src.wiki_fetcher import fetch_pages, write_pages
+        written = write_pages(fetch_pages(topics, categories, depth), WIKI_PAGES_DIR)
+        print(f"{len(written)} page file(s) updated in {WIKI_PAGES_DIR}")
+
+
+def chunk_stage(fingerprint: str, state: dict):
+    """Chunk table for the corpus, re-split only when the corpus fingerprint changed."""
+    from src.storage import read_table, write_table, table_exists, CHUNK_SCHEMA
+    if state.get("chunk") == fingerprint and table_exists(CHUNKS_TABLE):
+        print(f"Corpus unchanged, reusing {CHUNKS_TABLE}")
+        return read_table(CHUNKS_TABLE)
+    from src.data_loader import load_documents, split_documents, documents_to_dataframe
+    df_chunks = documents_to_dataframe(split_documents(load_documents(RAW_DATA_DIR)))
+    write_table(df_chunks, CHUNKS_TABLE, CHUNK_SCHEMA)
+    return df_chunks
+
+
+class IngestionJob:
+    """Runs ingestion on a daemon thread so the app keeps answering queries meanwhile.
+
+    One instance is meant to be shared per process; `start` does nothing while a run is
+    in progress. `snapshot` returns the progress for display.
+    """
+
+    def __init__(self, state_file: str = INGEST_STATE_FILE):
+        self.state_file = state_file
+        self.status = "idle"          # idle | running | done | failed
+        self.stage = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.totals = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, model: str = "llama3", force: bool = False) -> bool:
+        """Start a run in the background; returns False if one is already running."""
+        with self._lock:
+            if self.running:
+                return False
+            self.status, self.stage, self.error, self.totals = "running", None, None, {}
+            self.started_at, self.finished_at = time.time(), None
+            self._thread = threading.Thread(target=self._run, args=(model, force), name="ingestion", daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self, model: str, force: bool) -> None:
+        try:
+            state = {} if force else load_ingest_state(self.state_file)
+            self.stage = "fetch"
+            fetch_stage()
+            fingerprint = corpus_fingerprint(RAW_DATA_DIR)
+
+            self.stage = "chunk"
+            df_chunks = chunk_stage(fingerprint, state)
+            state["chunk"] = fingerprint
+            save_ingest_state(state, self.state_file)
+            self.totals["chunks"] = len(df_chunks)
+
+            if state.get("sync") == fingerprint and state.get("model") == model:
+                print("Graph already ingested for this corpus and model")
+            else:
+                from src.graph_handler import initialise_neo4j_schema
+                from src.graph_sync import sync_graph
+                self.stage = "schema"
+                initialise_neo4j_schema()
+                self.stage = "sync"
+                self.totals.update(sync_graph(df_chunks, model=model))
+                failed = self.totals.get("failed_chunks", 0)
+                if failed:
+                    # Not recorded as synced, so the next run retries the chunks that failed
+                    state.pop("sync", None)
+                    state.update(failed_chunks=failed)
+                else:
+                    state.pop("failed_chunks", None)
+                    state.update(sync=fingerprint, model=model, synced_at=time.time())
+                save_ingest_state(state, self.state_file)
+
+            # No-op when the graph version has not moved since the last run
+            from src.graph_analytics import update_graph_analytics
+            self.stage = "analytics"
+            self.totals["analytics"] = update_graph_analytics()
+            self.status = "done"
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.status = "failed"
+            print(f"Ingestion failed during {self.stage}: {self.error}")
+        finally:
+            self.finished_at = time.time()
+
+    def snapshot(self) -> dict:
+        end = self.finished_at or time.time()
+        return {"status": self.status, "stage": self.stage, "error": self.error, "totals": dict(self.totals),
+                "seconds": end - self.started_at if self.started_at else 0.0}
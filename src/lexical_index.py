@@ -0,0 +1,319 @@
+# BM25 inverted index over chunk text, stored as memory-mapped NumPy postings
+
+import json
+import os
+import re
+import shutil
+import threading
+from collections import Counter
+import numpy as np
+import pandas as pd
+from config.settings import LEXICAL_INDEX_DIR, LEXICAL_MAX_SEGMENTS, BM25_K1, BM25_B
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "had", "has", "have", "he", "her",
+    "his", "in", "is", "it", "its", "of", "on", "or", "she", "that", "the", "their", "they", "this",
+    "to", "was", "were", "which", "who", "with", "what", "how", "did", "does", "do", "about", "tell", "me",
+}
+_MAX_TF = np.iinfo(np.uint16).max
+
+
+def tokenize(text: str) -> list:
+    """Lower-cased alphanumeric terms, without stopwords and single characters."""
+    return [t for t in _TOKEN.findall(str(text).lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+
+class Segment:
+    """One immutable batch of indexed chunks.
+
+    Postings are grouped by term id (CSR: `term_ptr` into `doc_ids`/`tfs`) and, like the
+    chunk text blob, are memory-mapped, so opening the index reads almost nothing from disk.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.term_ptr = np.load(os.path.join(path, "term_ptr.npy"), mmap_mode="r")
+        self.doc_ids = np.load(os.path.join(path, "doc_ids.npy"), mmap_mode="r")
+        self.tfs = np.load(os.path.join(path, "tfs.npy"), mmap_mode="r")
+        self.doc_len = np.load(os.path.join(path, "doc_len.npy"))
+        self.text_ptr = np.load(os.path.join(path, "text_ptr.npy"))
+        text_path = os.path.join(path, "text.bin")
+        # np.memmap cannot map an empty file
+        self.text = np.memmap(text_path, dtype=np.uint8, mode="r") if os.path.getsize(text_path) else np.zeros(0, np.uint8)
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.chunk_ids = meta["chunk_ids"]
+        self.sources = meta["sources"]
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    @property
+    def n_terms(self) -> int:
+        return len(self.term_ptr) - 1
+
+    def doc_freq(self, vocab_size: int, alive: np.ndarray = None) -> np.ndarray:
+        """Documents containing each term, counting only the `alive` ones when a mask is given."""
+        df = np.zeros(vocab_size, dtype=np.int64)
+        if alive is None or alive.all():
+            df[:self.n_terms] = np.diff(self.term_ptr)
+        else:
+            owners = np.repeat(np.arange(self.n_terms), np.diff(self.term_ptr))
+            live = alive[np.asarray(self.doc_ids, np.int64)]
+            df[:self.n_terms] = np.bincount(owners[live], minlength=self.n_terms)
+        return df
+
+    def chunk_text(self, doc: int) -> str:
+        return bytes(self.text[self.text_ptr[doc]:self.text_ptr[doc + 1]]).decode("utf-8")
+
+    def postings(self, term_ids: np.ndarray) -> tuple:
+        """(doc ids, term frequencies, index into `term_ids`) of every posting of `term_ids`."""
+        # Terms added to the vocabulary after this segment was written have no postings here
+        known = np.flatnonzero(term_ids < self.n_terms)
+        starts = self.term_ptr[term_ids[known]]
+        lengths = self.term_ptr[term_ids[known] + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.zeros(0, np.int64), np.zeros(0, np.float64), np.zeros(0, np.int64)
+        offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        positions = offsets + np.arange(total)
+        return np.asarray(self.doc_ids[positions], np.int64), np.asarray(self.tfs[positions], np.float64), \
+            np.repeat(known, lengths)
+
+
+def _write_segment(path: str, term_ids: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray, doc_len: np.ndarray,
+                   texts: list, chunk_ids: list, sources: list, vocab_size: int) -> None:
+    """Write a segment from unsorted (term, doc, tf) triples into a temp dir, then rename it into place."""
+    tmp = f"{path}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    order = np.lexsort((doc_ids, term_ids))
+    term_ptr = np.zeros(vocab_size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_ids, minlength=vocab_size), out=term_ptr[1:])
+    np.save(os.path.join(tmp, "term_ptr.npy"), term_ptr)
+    np.save(os.path.join(tmp, "doc_ids.npy"), doc_ids[order].astype(np.int32))
+    np.save(os.path.join(tmp, "tfs.npy"), np.minimum(tfs[order], _MAX_TF).astype(np.uint16))
+    np.save(os.path.join(tmp, "doc_len.npy"), doc_len.astype(np.int32))
+    encoded = [text.encode("utf-8") for text in texts]
+    text_ptr = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(blob) for blob in encoded], out=text_ptr[1:])
+    np.save(os.path.join(tmp, "text_ptr.npy"), text_ptr)
+    with open(os.path.join(tmp, "text.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"chunk_ids": chunk_ids, "sources": sources}, f)
+    os.replace(tmp, path)
+
+
+def _dump_json(path: str, value) -> None:
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(value, f)
+    os.replace(f"{path}.tmp", path)
+
+
+class LexicalIndex:
+    """Okapi BM25 over chunk text, updated by appending segments.
+
+    `add` writes new chunks as a new immutable segment and `remove` records tombstones, so
+    updates never rewrite existing postings; once there are more than `max_segments`
+    segments they are merged into one and tombstoned chunks are dropped. Term ids come from
+    one shared, append-only vocabulary, so document frequencies add up across segments.
+    Only one process should write to an index directory at a time.
+    """
+
+    def __init__(self, directory: str = LEXICAL_INDEX_DIR, max_segments: int = LEXICAL_MAX_SEGMENTS,
+                 k1: float = BM25_K1, b: float = BM25_B):
+        self.directory = directory
+        self.max_segments = max_segments
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._manifest_path = os.path.join(directory, "manifest.json")
+        self._vocab_path = os.path.join(directory, "vocab.json")
+        self.mtime = None
+        self.reload()
+
+    def reload(self) -> None:
+        """Re-read the manifest, picking up segments written by another process."""
+        manifest = {"segments": [], "next_segment": 0, "deleted": []}
+        vocab = []
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            with open(self._vocab_path, encoding="utf-8") as f:
+                vocab = json.load(f)
+            self.mtime = os.path.getmtime(self._manifest_path)
+        with self._lock:
+            self._next_segment = manifest["next_segment"]
+            self._deleted = set(manifest["deleted"])
+            self._terms = vocab
+            self._vocab = {term: i for i, term in enumerate(vocab)}
+            self._publish([Segment(os.path.join(self.directory, name)) for name in manifest["segments"]])
+
+    def _publish(self, segments: list) -> None:
+        """Swap in a new segment list together with the collection statistics derived from it."""
+        ids = {chunk_id for segment in segments for chunk_id in segment.chunk_ids}
+        alive = [np.array([c not in self._deleted for c in segment.chunk_ids], dtype=bool) for segment in segments]
+        doc_freq = np.zeros(len(self._terms), dtype=np.int64)
+        # Tombstoned chunks keep their postings until the next merge, but no longer count
+        for segment, mask in zip(segments, alive):
+            doc_freq += segment.doc_freq(len(self._terms), mask)
+        n_docs = sum(int(mask.sum()) for mask in alive)
+        total_len = sum(int(segment.doc_len[mask].sum()) for segment, mask in zip(segments, alive))
+        # Searches read this tuple once, so they never see a half-updated index
+        self._snapshot = (tuple(zip(segments, alive)), doc_freq, n_docs, total_len / n_docs if n_docs else 0.0)
+        self._indexed = ids
+
+    def _save_manifest(self, segments: list) -> None:
+        _dump_json(self._vocab_path, self._terms)
+        _dump_json(self._manifest_path, {
+            "segments": [os.path.basename(segment.path) for segment in segments],
+            "next_segment": self._next_segment,
+            "deleted": sorted(self._deleted),
+        })
+        self.mtime = os.path.getmtime(self._manifest_path)
+
+    def __len__(self) -> int:
+        return self._snapshot[2]
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._indexed and chunk_id not in self._deleted
+
+    @property
+    def segments(self) -> list:
+        return [segment for segment, _ in self._snapshot[0]]
+
+    def add(self, df: pd.DataFrame) -> int:
+        """Index chunks (`chunk_id`, `Source`, `Page Content` columns) not already present; returns how many."""
+        with self._lock:
+            revived, new = set(), {}
+            for chunk_id, source, text in zip(df["chunk_id"], df["Source"], df["Page Content"]):
+                if chunk_id in self._deleted:
+                    # Chunk ids hash the text, so a re-added chunk is the tombstoned copy
+                    revived.add(chunk_id)
+                elif chunk_id not in self._indexed and chunk_id not in new:
+                    new[chunk_id] = (str(source), str(text))
+            if not revived and not new:
+                return 0
+            self._deleted -= revived
+
+            segments = self.segments
+            if new:
+                segments.append(self._build_segment(list(new), [s for s, _ in new.values()], [t for _, t in new.values()]))
+            if len(segments) > self.max_segments:
+                segments = [self._merge(segments)]
+            os.makedirs(self.directory, exist_ok=True)
+            self._save_manifest(segments)
+            self._publish(segments)
+        return len(new) + len(revived)
+
+    def remove(self, chunk_ids) -> int:
+        """Tombstone chunks so they are no longer returned; their postings go at the next merge."""
+        with self._lock:
+            doomed = {chunk_id for chunk_id in chunk_ids if chunk_id in self._indexed} - self._deleted
+            if doomed:
+                self._deleted |= doomed
+                self._save_manifest(self.segments)
+                self._publish(self.segments)
+        return len(doomed)
+
+    def _term_id(self, term: str) -> int:
+        term_id = self._vocab.get(term)
+        if term_id is None:
+            term_id = self._vocab[term] = len(self._terms)
+            self._terms.append(term)
+        return term_id
+
+    def _segment_path(self) -> str:
+        self._next_segment += 1
+        return os.path.join(self.directory, f"seg-{self._next_segment:06d}")
+
+    def _build_segment(self, chunk_ids: list, sources: list, texts: list) -> Segment:
+        term_ids, doc_ids, tfs, doc_len = [], [], [], []
+        for doc, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_ids.append(self._term_id(term))
+                doc_ids.append(doc)
+                tfs.append(tf)
+        path = self._segment_path()
+        _write_segment(path, np.array(term_ids, np.int64), np.array(doc_ids, np.int64), np.array(tfs, np.int64),
+                       np.array(doc_len, np.int64), texts, chunk_ids, sources, len(self._terms))
+        return Segment(path)
+
+    def _merge(self, segments: list) -> Segment:
+        """Merge segments into one, dropping tombstoned chunks, without re-tokenising any text."""
+        term_ids, doc_ids, tfs, doc_len, texts, chunk_ids, sources = [], [], [], [], [], [], []
+        for segment in segments:
+            keep = np.array([c not in self._deleted for c in segment.chunk_ids], dtype=bool)
+            new_ids = np.cumsum(keep) - 1 + len(chunk_ids)
+            owners = np.repeat(np.arange(segment.n_terms), np.diff(segment.term_ptr))
+            docs = np.asarray(segment.doc_ids, np.int64)
+            live = keep[docs]
+            term_ids.append(owners[live])
+            doc_ids.append(new_ids[docs[live]])
+            tfs.append(np.asarray(segment.tfs, np.int64)[live])
+            doc_len.append(segment.doc_len[keep])
+            for doc in np.flatnonzero(keep):
+                texts.append(segment.chunk_text(doc))
+                chunk_ids.append(segment.chunk_ids[doc])
+                sources.append(segment.sources[doc])
+        path = self._segment_path()
+        _write_segment(path, np.concatenate(term_ids), np.concatenate(doc_ids), np.concatenate(tfs),
+                       np.concatenate(doc_len), texts, chunk_ids, sources, len(self._terms))
+        merged = Segment(path)
+        self._deleted.clear()
+        for segment in segments:
+            # Old segments are unlinked but stay readable through open memory maps until released
+            shutil.rmtree(segment.path, ignore_errors=True)
+        return merged
+
+    def search(self, question: str, k: int = 5) -> list:
+        """Top-`k` chunks for `question` by BM25, as dicts with chunk_id, source, text and score."""
+        segments, doc_freq, n_docs, avg_len = self._snapshot
+        term_ids = np.unique([self._vocab.get(t, -1) for t in tokenize(question)]).astype(np.int64)
+        # Terms a concurrent `add` has not published yet are ignored
+        term_ids = term_ids[(term_ids >= 0) & (term_ids < len(doc_freq))]
+        if term_ids.size == 0 or n_docs == 0:
+            return []
+        df = doc_freq[term_ids]
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+
+        candidates = []
+        for seg_no, (segment, alive) in enumerate(segments):
+            docs, tf, term = segment.postings(term_ids)
+            if docs.size == 0:
+                continue
+            norm = self.k1 * (1 - self.b + self.b * segment.doc_len[docs] / avg_len)
+            weights = idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            scores = np.bincount(docs, weights=weights, minlength=len(segment))
+            scores[~alive] = 0.0
+            top = np.argpartition(-scores, min(k, len(scores) - 1))[:k] if len(scores) > k else np.arange(len(scores))
+            candidates.extend((float(scores[doc]), seg_no, int(doc)) for doc in top if scores[doc] > 0)
+
+        candidates.sort(key=lambda c: (-c[0], c[1], c[2]))
+        hits = []
+        for score, seg_no, doc in candidates[:k]:
+            segment = segments[seg_no][0]
+            hits.append({"chunk_id": segment.chunk_ids[doc], "source": segment.sources[doc],
+                         "text": segment.chunk_text(doc), "score": score})
+        return hits
+
+
+_index = {"index": None}
+_index_lock = threading.Lock()
+
+
+def get_lexical_index(directory: str = LEXICAL_INDEX_DIR) -> LexicalIndex:
+    """Return the shared index, reloading it when another process has updated the manifest."""
+    with _index_lock:
+        index = _index["index"]
+        if index is None or index.directory != directory:
+            index = _index["index"] = LexicalIndex(directory)
+        else:
+            manifest = os.path.join(directory, "manifest.json")
+            if os.path.exists(manifest) and os.path.getmtime(manifest) != index.mtime:
+                index.reload()
+        return index
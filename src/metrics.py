@@ -0,0 +1,230 @@
+# Pipeline instrumentation: stage timers, counters and latency histograms
+
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from config.settings import METRICS_PREFIX, PROFILE_STAGE, PROFILE_DIR
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+DB_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+RATE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500)
+QUERY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HISTOGRAM_BUCKETS = {
+    "llm_request_seconds": LLM_BUCKETS,
+    "llm_tokens_per_second": RATE_BUCKETS,
+    "neo4j_transaction_seconds": DB_BUCKETS,
+    "query_seconds": QUERY_BUCKETS,
+    "query_first_result_seconds": QUERY_BUCKETS,
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list:
+        """(upper bound, observations <= bound) pairs, ending with +Inf."""
+        total, out = 0, []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            out.append((bound, total))
+        return out
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (None when empty)."""
+        if not self.count:
+            return None
+        target = q * self.count
+        for bound, total in self.cumulative():
+            if total >= target:
+                return bound
+        return float("inf")
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def _json_bound(bound):
+    # JSON has no infinity; quantiles beyond the last bucket are reported as "+Inf"
+    return "+Inf" if bound == float("inf") else bound
+
+
+class Metrics:
+    """Process-wide registry of counters, histograms and per-stage timings.
+
+    Stages are timed with `with metrics.stage("name", rows_in=n) as stage:` and report rows
+    out by setting `stage["rows_out"]`. Set PROFILE_STAGE to a stage name to capture a
+    cProfile dump of that stage under PROFILE_DIR.
+    """
+
+    def __init__(self, profile_stage: str = PROFILE_STAGE):
+        self.profile_stage = profile_stage
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started_at = time.time()
+            self.counters = {}
+            self.histograms = {}
+            self.stages = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _labels_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(HISTOGRAM_BUCKETS.get(name, LLM_BUCKETS))
+            histogram.observe(value)
+
+    def counter(self, name: str, **labels) -> float:
+        return self.counters.get((name, _labels_key(labels)), 0)
+
+    @contextmanager
+    def stage(self, name: str, rows_in: int = None):
+        record = {"rows_in": rows_in, "rows_out": None}
+        profiler = None
+        if self.profile_stage == name:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                self._dump_profile(name, profiler)
+            with self._lock:
+                totals = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "rows_in": 0, "rows_out": 0})
+                totals["calls"] += 1
+                totals["seconds"] += elapsed
+                totals["rows_in"] += record["rows_in"] or 0
+                totals["rows_out"] += record["rows_out"] or 0
+
+    def _dump_profile(self, name: str, profiler: cProfile.Profile) -> None:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{name}_{int(time.time())}.prof")
+        profiler.dump_stats(path)
+        print(f"Profile of stage '{name}' written to {path}; top functions by cumulative time:")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+
+    def derived(self) -> dict:
+        """Rates computed from the raw counters."""
+        llm = self.histograms.get(("llm_request_seconds", ()))
+        completion = self.counter("llm_completion_tokens_total")
+        out = {"llm_tokens_per_second": completion / llm.sum if llm and llm.sum else None}
+        for cache in ("extraction", "cypher"):
+            hits = self.counter("cache_requests_total", cache=cache, result="hit")
+            misses = self.counter("cache_requests_total", cache=cache, result="miss")
+            out[f"{cache}_cache_hit_rate"] = hits / (hits + misses) if hits + misses else None
+        return out
+
+    def report(self) -> dict:
+        """JSON-serialisable snapshot of everything recorded since the last reset."""
+        with self._lock:
+            stages = {name: {**totals, "seconds": round(totals["seconds"], 6),
+                             "rows_per_second": round(totals["rows_out"] / totals["seconds"], 2)
+                             if totals["seconds"] else None}
+                      for name, totals in self.stages.items()}
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            histograms = [{"name": name, "labels": dict(labels), "count": h.count, "sum": round(h.sum, 6),
+                           **{f"p{int(q * 100)}": _json_bound(h.quantile(q)) for q in (0.5, 0.95, 0.99)},
+                           "buckets": {_format_bound(b): c for b, c in h.cumulative()}}
+                          for (name, labels), h in sorted(self.histograms.items())]
+        return {
+            "started_at": self.started_at,
+            "duration_seconds": round(time.time() - self.started_at, 3),
+            "stages": stages,
+            "counters": counters,
+            "histograms": histograms,
+            "derived": self.derived(),
+        }
+
+    def write_report(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+        print(f"Run report written to {path}")
+
+    def to_prometheus(self) -> str:
+        """Everything recorded so far in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            stage_series = {
+                "stage_seconds_total": ("counter", "Wall-clock seconds spent in each pipeline stage", "seconds"),
+                "stage_calls_total": ("counter", "Times each pipeline stage ran", "calls"),
+                "stage_rows_in_total": ("counter", "Rows consumed by each pipeline stage", "rows_in"),
+                "stage_rows_out_total": ("counter", "Rows produced by each pipeline stage", "rows_out"),
+            }
+            for series, (kind, help_text, field) in stage_series.items():
+                name = f"{METRICS_PREFIX}_{series}"
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for stage, totals in sorted(self.stages.items()):
+                    lines.append(f'{name}{{stage="{stage}"}} {totals[field]}')
+
+            for counter_name in sorted({name for name, _ in self.counters}):
+                name = f"{METRICS_PREFIX}_{counter_name}"
+                lines.append(f"# TYPE {name} counter")
+                for (series, labels), value in sorted(self.counters.items()):
+                    if series == counter_name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+            for histogram_name in sorted({name for name, _ in self.histograms}):
+                name = f"{METRICS_PREFIX}_{histogram_name}"
+                lines.append(f"# TYPE {name} histogram")
+                for (series, labels), h in sorted(self.histograms.items()):
+                    if series != histogram_name:
+                        continue
+                    for bound, count in h.cumulative():
+                        lines.append(f"{name}_bucket{_format_labels(labels, (('le', _format_bound(bound)),))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {h.sum}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """Write the text format to `path`, e.g. for node_exporter's textfile collector."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+        print(f"Prometheus metrics written to {path}")
+
+
+metrics = Metrics()
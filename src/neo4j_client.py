@@ -0,0 +1,65 @@
+# Process-wide Neo4j connection pool shared by ingestion, schema setup and the query chain
+
+import atexit
+import threading
+from neo4j import GraphDatabase
+from langchain.graphs import Neo4jGraph
+from config.settings import NEO4J_URL, NEO4J_DATABASE, NEO4J_USER, NEO4J_PASSWORD, AUTH
+from config.settings import NEO4J_MAX_RETRY_TIME, NEO4J_MAX_POOL_SIZE, NEO4J_ACQUISITION_TIMEOUT
+
+_pool = {"driver": None, "graph": None}
+_pool_lock = threading.RLock()
+
+
+def driver_config() -> dict:
+    """Keyword arguments for GraphDatabase.driver, taken from settings."""
+    return {
+        "max_connection_pool_size": NEO4J_MAX_POOL_SIZE,
+        "connection_acquisition_timeout": NEO4J_ACQUISITION_TIMEOUT,
+        "max_transaction_retry_time": NEO4J_MAX_RETRY_TIME,
+    }
+
+
+def get_driver():
+    """Return the shared driver, creating it on first use.
+
+    The driver is thread-safe and owns the connection pool; callers open short-lived
+    sessions from it (see `session`) instead of creating drivers of their own.
+    """
+    if _pool["driver"] is None:
+        with _pool_lock:
+            if _pool["driver"] is None:
+                _pool["driver"] = GraphDatabase.driver(NEO4J_URL, auth=AUTH, **driver_config())
+    return _pool["driver"]
+
+
+def session(**kwargs):
+    """Open a session on the shared pool against the configured database."""
+    return get_driver().session(database=NEO4J_DATABASE, **kwargs)
+
+
+def get_graph() -> Neo4jGraph:
+    """Return the shared LangChain Neo4jGraph, backed by the same connection pool."""
+    if _pool["graph"] is None:
+        with _pool_lock:
+            if _pool["graph"] is None:
+                graph = Neo4jGraph(url=NEO4J_URL, username=NEO4J_USER, password=NEO4J_PASSWORD,
+                                   database=NEO4J_DATABASE)
+                # Neo4jGraph always builds a private driver; swap in the shared one
+                private = getattr(graph, "_driver", None)
+                if private is not None:
+                    graph._driver = get_driver()
+                    private.close()
+                _pool["graph"] = graph
+    return _pool["graph"]
+
+
+def close_driver() -> None:
+    """Close the pool; the next caller gets a fresh driver."""
+    with _pool_lock:
+        driver, _pool["driver"], _pool["graph"] = _pool["driver"], None, None
+    if driver is not None:
+        driver.close()
+
+
+atexit.register(close_driver)
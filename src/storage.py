@@ -0,0 +1,137 @@
+# Columnar storage for the tables passed between pipeline stages (chunks, extracted edges, graph)
+
+import os
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from config.settings import PARQUET_COMPRESSION, PARQUET_ROW_GROUP_SIZE
+
+# Low-cardinality / heavily repeated string columns are dictionary-encoded on disk and
+# come back as pandas categoricals
+_NAME = pa.dictionary(pa.int32(), pa.string())
+
+CHUNK_SCHEMA = pa.schema([
+    ("Page Content", pa.string()),
+    ("Source", _NAME),
+    ("chunk_id", pa.string()),
+])
+
+GRAPH_SCHEMA = pa.schema([
+    ("node_1", _NAME),
+    ("node_2", _NAME),
+    ("edge", pa.string()),
+    ("entity", _NAME),
+    ("importance", pa.int64()),
+    ("category", _NAME),
+    ("count", pa.int64()),
+])
+
+
+def _column(values: pd.Series, field: pa.Field) -> pa.Array:
+    if pa.types.is_dictionary(field.type):
+        strings = values.astype(object).where(values.notna(), None)
+        return pa.array(strings, type=pa.string(), from_pandas=True).dictionary_encode().cast(field.type)
+    if pa.types.is_integer(field.type):
+        numbers = pd.to_numeric(values, errors="coerce")
+        # Whole-number floats (an int column that went through NaN) are stored back as integers
+        return pa.array(numbers, from_pandas=True).cast(field.type, safe=False)
+    return pa.array(values.astype(object).where(values.notna(), None), type=field.type, from_pandas=True)
+
+
+def to_arrow(df: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    """Convert `df` to `schema`; missing schema columns become nulls and extra columns are kept."""
+    arrays, fields = [], []
+    for field in schema:
+        if field.name in df:
+            arrays.append(_column(df[field.name], field))
+        else:
+            arrays.append(pa.nulls(len(df), type=field.type))
+        fields.append(field)
+    for name in df.columns:
+        if name not in schema.names:
+            array = pa.array(df[name], from_pandas=True)
+            arrays.append(array)
+            fields.append(pa.field(name, array.type))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+class TableWriter:
+    """Writes a Parquet file one row group at a time, e.g. as extraction batches complete.
+
+    The file only becomes readable once the writer is closed, so runs that append across
+    restarts write one part file each into a directory (see `new_part_path`) and
+    `read_table` reads the directory as one table.
+    """
+
+    def __init__(self, path: str, schema: pa.Schema, compression: str = PARQUET_COMPRESSION):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.schema = schema
+        self.rows = 0
+        self._tmp = f"{path}.tmp"
+        self._writer = pq.ParquetWriter(self._tmp, schema, compression=compression)
+
+    def append(self, df: pd.DataFrame) -> None:
+        if len(df):
+            self.append_table(to_arrow(df, self.schema).select(self.schema.names))
+
+    def append_table(self, table: pa.Table) -> None:
+        self._writer.write_table(table, row_group_size=PARQUET_ROW_GROUP_SIZE)
+        self.rows += table.num_rows
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            # Readers never see a half-written file
+            os.replace(self._tmp, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def new_part_path(directory: str) -> str:
+    """Path of a new, uniquely named part file inside a table directory."""
+    return os.path.join(directory, f"part-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{time.monotonic_ns()}.parquet")
+
+
+def write_table(df: pd.DataFrame, path: str, schema: pa.Schema) -> None:
+    """Write a whole DataFrame, replacing any existing file at `path`."""
+    table = to_arrow(df, schema)
+    with TableWriter(path, table.schema) as writer:
+        writer.append_table(table)
+    print(f"Wrote {len(df)} row(s) to {path}")
+
+
+def read_table(path: str, columns: list = None) -> pd.DataFrame:
+    """Read a table file (or a directory of part files), decoding only `columns`.
+
+    Files are memory-mapped, so columns that are not requested are never read from disk.
+    Dictionary-encoded columns come back as pandas categoricals.
+    """
+    if os.path.isdir(path):
+        parts = sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".parquet"))
+        if not parts:
+            return pd.DataFrame(columns=columns)
+        tables = [pq.read_table(part, columns=columns, memory_map=True) for part in parts]
+        table = pa.concat_tables(tables, promote_options="default").unify_dictionaries()
+    else:
+        table = pq.read_table(path, columns=columns, memory_map=True)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def table_exists(path: str) -> bool:
+    return os.path.isfile(path) or (os.path.isdir(path) and any(n.endswith(".parquet") for n in os.listdir(path)))
+
+
+def convert_csv(csv_path: str, path: str, schema: pa.Schema) -> bool:
+    """One-off conversion of a CSV written by earlier versions; returns False if there is none."""
+    if not os.path.exists(csv_path):
+        return False
+    write_table(pd.read_csv(csv_path), path, schema)
+    return True
@@ -0,0 +1,259 @@
+# Streaming ingestion: load -> split -> extract -> normalize -> batch insert
+#
+# Stages run in their own threads and are connected by bounded queues, so a slow
+# stage blocks the ones feeding it instead of letting chunks pile up in memory.
+# Chunk ids whose edges have been committed are appended to a checkpoint file;
+# an interrupted run skips them when it is started again. Chunks whose extraction failed
+# are never checkpointed, so the next run retries them.
+
+import os
+import queue
+import threading
+import time
+import pandas as pd
+from config.settings import NEO4J_BATCH_SIZE
+from config.settings import EXTRACTION_WORKERS, STREAM_QUEUE_SIZE, STREAM_CHECKPOINT_FILE, STREAM_EDGES_DIR
+from config.settings import STREAM_FLUSH_CHUNKS, STREAM_FLUSH_BYTES
+from src.data_loader import iter_documents, get_splitter, chunk_id_for
+from src.extraction_cache import ExtractionCache
+from src.entity_index import entity_index
+from src.entity_resolution import normalize_name
+from src.graph_handler import graph_prompt_with_retry, result_records, edge_row, GRAPH_COLUMNS, write_edge_batch
+from src.graph_handler import extraction_version, register_chunks, bump_graph_version
+from src.lexical_index import get_lexical_index
+from src.metrics import metrics
+from src.neo4j_client import session as neo4j_session
+from src.storage import TableWriter, new_part_path, GRAPH_SCHEMA
+
+_DONE = object()
+
+
+def load_checkpoint(path: str = STREAM_CHECKPOINT_FILE) -> set:
+    """Return the chunk ids already committed by a previous run."""
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def iter_chunks(loader_path: str, chunk_size: int = 1500, chunk_overlap: int = 150, skip: set = None):
+    """Yield (chunk_id, text, source) tuples document by document, skipping already committed chunks."""
+    skip = skip or set()
+    splitter = get_splitter(chunk_size, chunk_overlap)
+    for document in iter_documents(loader_path):
+        for page in splitter.split_documents([document]):
+            source = page.metadata.get('source', 'N/A')
+            chunk_id = chunk_id_for(page.page_content, source, chunk_size, chunk_overlap)
+            if chunk_id not in skip:
+                yield chunk_id, page.page_content, source
+
+
+def normalize_result(result, chunk_id: str = None, source: str = None, version: str = None) -> list:
+    """Tidy the names of the typed edge records and convert them to insert parameter maps.
+
+    Repeats of an edge within the chunk are merged the way resolve_graph merges them: keyed on
+    (node_1, node_2, case-folded edge), `count` is the number of occurrences and `importance`
+    their maximum, so the streaming and batch paths write the same weights. Self-loops are dropped.
+    """
+    merged = {}     # key -> [values, count]
+    for record in result_records(result):
+        values = [record.get(column) for column in GRAPH_COLUMNS]
+        # Cross-chunk clustering needs the whole graph (see resolve_graph); here names are only cleaned up
+        values[0], values[1], values[2] = (normalize_name(value) for value in values[:3])
+        if values[0] == values[1]:
+            continue
+        key = (values[0], values[1], values[2].casefold())
+        if key not in merged:
+            merged[key] = [values, 0]
+        first = merged[key]
+        first[1] += 1
+        if values[4] is not None and (first[0][4] is None or values[4] > first[0][4]):
+            first[0][4] = values[4]
+    provenance = {'chunk_ids': [chunk_id], 'sources': [source]} if chunk_id is not None else {}
+    return [edge_row(*values, count=count, extraction_version=version, **provenance)
+            for values, count in merged.values()]
+
+
+def rows_to_frame(rows: list) -> pd.DataFrame:
+    """Flatten insert parameter maps back into graph table rows."""
+    return pd.DataFrame({
+        'node_1': [row['node_1'] for row in rows],
+        'node_2': [row['node_2'] for row in rows],
+        'edge': [row['edge'] for row in rows],
+        'entity': [row['node1_props'].get('entity') for row in rows],
+        'importance': [row['importance'] for row in rows],
+        'category': [row['edge_props'].get('category') for row in rows],
+        'count': [row['count'] for row in rows],
+        'chunk_id': [row['chunk_ids'][0] if row['chunk_ids'] else None for row in rows],
+        'source': [row['sources'][0] if row['sources'] else None for row in rows],
+        'extraction_version': [row['edge_props'].get('extraction_version') for row in rows],
+    })
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """Blocking put that gives up once the run is stopped; this is where backpressure applies."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _feed(chunks, chunk_queue: queue.Queue, workers: int, stop: threading.Event, errors: list) -> None:
+    try:
+        for item in chunks:
+            if not _put(chunk_queue, item, stop):
+                break
+    except Exception as e:
+        errors.append(e)
+    finally:
+        for _ in range(workers):
+            _put(chunk_queue, _DONE, stop)
+
+
+def _extract(chunk_queue: queue.Queue, result_queue: queue.Queue, model: str, cache: ExtractionCache,
+             stop: threading.Event, errors: list) -> None:
+    version = extraction_version(model)
+    try:
+        while not stop.is_set():
+            item = chunk_queue.get()
+            if item is _DONE:
+                break
+            chunk_id, text, source = item
+            result = cache.get(chunk_id, model) if cache is not None else None
+            if result is None:
+                result = graph_prompt_with_retry(text, {"chunk_id": chunk_id}, model)
+                if cache is not None:
+                    cache.put(chunk_id, model, result)
+            # None means the LLM call or parsing failed; a result with no edges is still a success
+            ok = result is not None
+            rows = normalize_result(result, chunk_id, source, version)
+            if not _put(result_queue, (chunk_id, source, text, rows, ok), stop):
+                break
+    except Exception as e:
+        errors.append(e)
+    finally:
+        _put(result_queue, _DONE, stop)
+
+
+def run_streaming_pipeline(loader_path: str, model: str = "llama3", chunk_size: int = 1500, chunk_overlap: int = 150,
+                           max_workers: int = EXTRACTION_WORKERS, batch_size: int = NEO4J_BATCH_SIZE,
+                           queue_size: int = STREAM_QUEUE_SIZE, checkpoint_file: str = STREAM_CHECKPOINT_FILE,
+                           use_cache: bool = True, edges_dir: str = STREAM_EDGES_DIR,
+                           flush_chunks: int = STREAM_FLUSH_CHUNKS, flush_bytes: int = STREAM_FLUSH_BYTES) -> dict:
+    """Stream documents from `loader_path` into Neo4j with bounded memory; returns run totals.
+
+    A batch is committed once it holds `batch_size` edges, `flush_chunks` chunks or
+    `flush_bytes` of chunk text, whichever comes first.
+
+    Every committed batch is also appended as a row group to a new part file in `edges_dir`
+    (None disables this), so the run's edges can be read back with `read_table(edges_dir)`.
+    """
+    done = load_checkpoint(checkpoint_file)
+    if done:
+        print(f"Resuming from checkpoint: {len(done)} chunk(s) already committed")
+    if os.path.dirname(checkpoint_file):
+        os.makedirs(os.path.dirname(checkpoint_file), exist_ok=True)
+
+    chunk_queue = queue.Queue(maxsize=queue_size)
+    result_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    cache = ExtractionCache() if use_cache else None
+    workers = max(1, max_workers)
+    edges_table = TableWriter(new_part_path(edges_dir), GRAPH_SCHEMA) if edges_dir else None
+    lexical_index = get_lexical_index()
+
+    threads = [threading.Thread(target=_feed, name="stream-load",
+                                args=(iter_chunks(loader_path, chunk_size, chunk_overlap, done), chunk_queue, workers, stop, errors))]
+    threads += [threading.Thread(target=_extract, name=f"stream-extract-{i}",
+                                 args=(chunk_queue, result_queue, model, cache, stop, errors))
+                for i in range(workers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    version = extraction_version(model)
+    totals = {"chunks": 0, "failed": 0, "edges": 0, "batches": 0}
+    start = time.perf_counter()
+    batch, batch_chunks = [], []
+    pending = {"bytes": 0}
+    try:
+        with neo4j_session() as session, open(checkpoint_file, 'a', encoding='utf-8') as checkpoint:
+
+            def flush():
+                if batch:
+                    write_edge_batch(session, list(batch))
+                    if edges_table is not None:
+                        edges_table.append(rows_to_frame(batch))
+                    entity_index.add_names(name for row in batch for name in (row['node_1'], row['node_2']))
+                    totals["batches"] += 1
+                    totals["edges"] += len(batch)
+                # Only record chunks once their edges are durable in Neo4j. Successful chunks
+                # without edges are registered too so incremental sync does not extract them
+                # again; failed ones are left out so that sync and resume retry them.
+                extracted = [(chunk_id, source) for chunk_id, source, _, ok in batch_chunks if ok]
+                if extracted:
+                    names = {}
+                    for row in batch:
+                        names.setdefault(row['chunk_ids'][0], set()).update((row['node_1'], row['node_2']))
+                    register_chunks([{'chunk_id': chunk_id, 'source': source, 'extraction_version': version,
+                                      'names': sorted(names.get(chunk_id, ()))} for chunk_id, source in extracted])
+                if batch_chunks:
+                    lexical_index.add(pd.DataFrame([chunk[:3] for chunk in batch_chunks],
+                                                   columns=['chunk_id', 'Source', 'Page Content']))
+                if batch or extracted:
+                    bump_graph_version()
+                checkpoint.writelines(f"{chunk_id}\n" for chunk_id, _ in extracted)
+                checkpoint.flush()
+                failed = len(batch_chunks) - len(extracted)
+                totals["chunks"] += len(extracted)
+                totals["failed"] += failed
+                metrics.inc("stream_chunks_committed_total", len(extracted))
+                metrics.inc("stream_chunks_failed_total", failed)
+                batch.clear()
+                batch_chunks.clear()
+                pending["bytes"] = 0
+
+            finished = 0
+            while finished < workers:
+                item = result_queue.get()
+                if item is _DONE:
+                    finished += 1
+                    continue
+                chunk_id, source, text, rows, ok = item
+                batch.extend(rows)
+                batch_chunks.append((chunk_id, source, text, ok))
+                pending["bytes"] += len(text.encode('utf-8'))
+                # Chunks yielding few or no edges would otherwise hold their text until the edge batch fills
+                if len(batch) >= batch_size or len(batch_chunks) >= flush_chunks or pending["bytes"] >= flush_bytes:
+                    flush()
+                    elapsed = time.perf_counter() - start
+                    print(f"Committed {totals['chunks']} chunk(s), {totals['edges']} edge(s) "
+                          f"({totals['chunks'] / elapsed:.2f} chunks/s)")
+            if errors:
+                raise errors[0]
+            flush()
+    finally:
+        stop.set()
+        if edges_table is not None:
+            edges_table.close()
+        # Extract workers may be parked on chunk_queue.get(); wake them so they can exit
+        for _ in range(workers):
+            try:
+                chunk_queue.put_nowait(_DONE)
+            except queue.Full:
+                break
+        for thread in threads:
+            thread.join(timeout=5)
+        if cache is not None:
+            cache.close()
+
+    totals["seconds"] = time.perf_counter() - start
+    print(f"Streaming run finished: {totals['chunks']} chunk(s), {totals['edges']} edge(s) "
+          f"in {totals['seconds']:.1f}s")
+    if totals["failed"]:
+        print(f"{totals['failed']} chunk(s) failed extraction and will be retried on the next run")
+    return totals
@@ -1,15 +1,17 @@
 # Processes text data
 
 import re
-import wikipedia
 
 def clean_text(text):
     return re.sub(r'[^a-zA-Z0-9 ]', '', text)
 
 def get_wikipedia_content(topic: str) -> str:
-    """Fetch and format Wikipedia content."""
-    page = wikipedia.page(topic)
-    return page.content.replace('==', '').replace('\n', ' ').strip()
+    """Fetch and format Wikipedia content; served from the page cache while its revision is unchanged."""
+    from src.wiki_fetcher import fetch_pages, format_content
+    pages = fetch_pages([topic])
+    if not pages:
+        raise LookupError(f"Wikipedia page not found: {topic}")
+    return format_content(pages[0]["text"])
 
 def write_text_to_file(file_path: str, text: str) -> None:
     """Write text with UTF-8 encoding."""
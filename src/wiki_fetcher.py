@@ -0,0 +1,245 @@
+# Concurrent Wikipedia fetcher with a revision-aware, compressed on-disk page cache
+#
+# Talks to the MediaWiki Action API directly (any compatible endpoint, e.g. a local stand-in,
+# via WIKI_API_URL). Revision ids for all titles are looked up in batches first; only pages
+# whose (title, revision) is not cached are downloaded, concurrently and under a shared rate limit.
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import WIKI_API_URL, WIKI_CACHE_PATH, WIKI_FETCH_WORKERS, WIKI_RATE_LIMIT
+from config.settings import WIKI_TIMEOUT, WIKI_RETRIES, WIKI_USER_AGENT, RAW_DATA_DIR
+from src.metrics import metrics
+
+TITLES_PER_REQUEST = 50     # MediaWiki limit on titles per query for anonymous clients
+
+
+def format_content(text: str) -> str:
+    """Flatten page text the way the pipeline has always stored it: no headings markup, one line."""
+    return text.replace('==', '').replace('\n', ' ').strip()
+
+
+class RateLimiter:
+    """Spaces requests at least 1 / `rate` seconds apart across all threads; 0 disables it."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class PageCache:
+    """SQLite store of zlib-compressed page text keyed by title + revision id.
+
+    Only the newest revision of a title is kept. Safe to share between fetch threads.
+    """
+
+    def __init__(self, path: str = WIKI_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                title TEXT NOT NULL,
+                revid INTEGER NOT NULL,
+                content BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (title, revid)
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, title: str, revid: int):
+        """Cached text of `title` at `revid`, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT content FROM pages WHERE title = ? AND revid = ?",
+                                     (title, revid)).fetchone()
+            if row is None:
+                self.misses += 1
+                metrics.inc("cache_requests_total", cache="wikipedia", result="miss")
+                return None
+            self.hits += 1
+            metrics.inc("cache_requests_total", cache="wikipedia", result="hit")
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, title: str, revid: int, text: str) -> None:
+        blob = zlib.compress(text.encode("utf-8"), 6)
+        with self._lock:
+            self._conn.execute("DELETE FROM pages WHERE title = ? AND revid != ?", (title, revid))
+            self._conn.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                               (title, revid, blob, len(text), time.time()))
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pages, raw, stored = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(content)), 0) FROM pages").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "pages": pages, "text_bytes": raw, "stored_bytes": stored}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class WikiClient:
+    """Minimal MediaWiki Action API client (JSON, formatversion=2) with retries and a rate limit."""
+
+    def __init__(self, api_url: str = WIKI_API_URL, rate: float = WIKI_RATE_LIMIT, timeout: float = WIKI_TIMEOUT,
+                 retries: int = WIKI_RETRIES, user_agent: str = WIKI_USER_AGENT):
+        self.api_url = api_url
+        self.timeout = timeout
+        self.retries = retries
+        self.user_agent = user_agent
+        self.limiter = RateLimiter(rate)
+        self.requests = 0
+
+    def get(self, **params) -> dict:
+        query = urllib.parse.urlencode({"action": "query", "format": "json", "formatversion": 2, **params})
+        request = urllib.request.Request(f"{self.api_url}?{query}", headers={"User-Agent": self.user_agent})
+        for attempt in range(self.retries + 1):
+            self.limiter.wait()
+            self.requests += 1
+            metrics.inc("wiki_requests_total")
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    return json.loads(response.read().decode("utf-8"))
+            except urllib.error.HTTPError as e:
+                # Throttling and server errors are worth another try; anything else is not
+                if e.code != 429 and e.code < 500 or attempt == self.retries:
+                    raise
+                delay = float(e.headers.get("Retry-After") or 2 ** attempt)
+            except urllib.error.URLError:
+                if attempt == self.retries:
+                    raise
+                delay = 2 ** attempt
+            print(f"Wikipedia request failed, retrying in {delay:.0f}s")
+            time.sleep(delay)
+
+    def revisions(self, titles: list) -> dict:
+        """Map each requested title to (canonical title, latest revision id); missing pages are left out."""
+        found = {}
+        for offset in range(0, len(titles), TITLES_PER_REQUEST):
+            batch = titles[offset:offset + TITLES_PER_REQUEST]
+            data = self.get(prop="revisions", rvprop="ids", redirects=1, titles="|".join(batch))["query"]
+            # Follow normalisation ("world war I" -> "World War I") and redirects back to the request
+            renamed = {entry["from"]: entry["to"] for entry in data.get("normalized", []) + data.get("redirects", [])}
+            latest = {page["title"]: page["revisions"][0]["revid"]
+                      for page in data.get("pages", []) if not page.get("missing") and page.get("revisions")}
+            for title in batch:
+                canonical = title
+                while canonical in renamed and canonical not in latest:
+                    canonical = renamed[canonical]
+                if canonical in latest:
+                    found[title] = (canonical, latest[canonical])
+                else:
+                    print(f"Wikipedia page not found: {title}")
+        return found
+
+    def content(self, title: str) -> str:
+        """Plain-text content of a page."""
+        data = self.get(prop="extracts", explaintext=1, titles=title)["query"]
+        return data["pages"][0].get("extract", "")
+
+    def category_members(self, category: str, depth: int = 0) -> list:
+        """Titles of the articles in a category, descending `depth` levels of subcategories."""
+        category = category if category.startswith("Category:") else f"Category:{category}"
+        titles, seen, level = [], {category}, [category]
+        for current_depth in range(depth + 1):
+            subcategories = []
+            for name in level:
+                params = {"list": "categorymembers", "cmtitle": name, "cmtype": "page|subcat", "cmlimit": 500}
+                while True:
+                    data = self.get(**params)
+                    for member in data["query"]["categorymembers"]:
+                        if member["ns"] == 14:
+                            if member["title"] not in seen:
+                                seen.add(member["title"])
+                                subcategories.append(member["title"])
+                        elif member["ns"] == 0:
+                            titles.append(member["title"])
+                    if "continue" not in data:
+                        break
+                    params.update(data["continue"])
+            if current_depth == depth:
+                break
+            level = subcategories
+        return list(dict.fromkeys(titles))
+
+
+def fetch_pages(topics=(), categories=(), depth: int = 0, workers: int = WIKI_FETCH_WORKERS,
+                client: WikiClient = None, cache: PageCache = None) -> list:
+    """Fetch the given topics plus every article of `categories`; returns page dicts in request order.
+
+    Each page is {title, revid, text, cached}. Pages whose current revision is already in the
+    cache are not downloaded again.
+    """
+    client = client or WikiClient()
+    own_cache = cache is None
+    cache = cache or PageCache()
+    try:
+        with metrics.stage("wikipedia_fetch") as stage:
+            titles = list(dict.fromkeys(list(topics) + [t for c in categories for t in client.category_members(c, depth)]))
+            revisions = client.revisions(titles)
+            pages = {}
+            for canonical, revid in revisions.values():
+                if canonical not in pages:
+                    text = cache.get(canonical, revid)
+                    pages[canonical] = {"title": canonical, "revid": revid, "text": text, "cached": text is not None}
+
+            stale = [page for page in pages.values() if page["text"] is None]
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                for page, text in zip(stale, executor.map(client.content, [page["title"] for page in stale])):
+                    page["text"] = text
+                    cache.put(page["title"], page["revid"], text)
+            stage["rows_out"] = len(pages)
+    finally:
+        if own_cache:
+            cache.close()
+    print(f"Wikipedia: {len(pages)} page(s), {len(stale)} downloaded, {len(pages) - len(stale)} unchanged")
+    return list(pages.values())
+
+
+def page_file_name(title: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", title).strip("_") + ".txt"
+
+
+def write_pages(pages: list, directory: str = RAW_DATA_DIR) -> list:
+    """Write pages as corpus files, touching only files whose text changed; returns the paths written.
+
+    Leaving unchanged files alone keeps the corpus fingerprint stable, so downstream stages skip them.
+    """
+    os.makedirs(directory, exist_ok=True)
+    written = []
+    for page in pages:
+        path = os.path.join(directory, page_file_name(page["title"]))
+        text = format_content(page["text"])
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                if f.read() == text:
+                    continue
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        written.append(path)
+    return written
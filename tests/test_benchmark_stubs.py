@@ -0,0 +1,15 @@
+import json
+
+from benchmarks.stubs import canned_extraction
+from config.prompt import GRAPH_SYS_PROMPT
+
+
+def edges(prompt: str) -> list:
+    return [(edge["node_1"], edge["node_2"]) for edge in json.loads(canned_extraction(prompt))["nodes"]]
+
+
+def test_single_chunk_edges_come_from_the_chunk_text():
+    first = edges(f"{GRAPH_SYS_PROMPT}\n\ncontext: ```Germany invaded Belgium and France.```")
+    second = edges(f"{GRAPH_SYS_PROMPT}\n\ncontext: ```Russia mobilised against Austria Hungary.```")
+    assert first == [("Germany", "Belgium"), ("Belgium", "France")]
+    assert second == [("Russia", "Austria Hungary")]
@@ -0,0 +1,29 @@
+import httpx
+import ollama
+import pytest
+
+from src.graph_handler import call_with_retry
+
+
+def failing(error: Exception):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise error
+    return fn, calls
+
+
+def test_transport_errors_are_retried_then_give_up_with_the_default():
+    for error in (httpx.ConnectTimeout("slow"), ConnectionError("refused"), ollama.ResponseError("busy", 503)):
+        fn, calls = failing(error)
+        assert call_with_retry(fn, retries=2, backoff=0, default="fallback") == "fallback"
+        assert len(calls) == 3, error
+
+
+def test_other_errors_are_raised_without_retrying():
+    for error in (KeyError("nodes"), TypeError("bad argument"), ollama.ResponseError("model not found", 404)):
+        fn, calls = failing(error)
+        with pytest.raises(type(error)):
+            call_with_retry(fn, retries=2, backoff=0)
+        assert len(calls) == 1, error
@@ -0,0 +1,11 @@
+from src.entity_index import EntityIndex
+
+
+def test_removed_names_are_no_longer_found():
+    index = EntityIndex(["World War", "World War II", "France", "france"])
+    assert index.find("France after World War II") == ["France", "france", "World War II"]
+
+    assert index.remove_names(["World War II", "France"]) == 1
+    # "World War" is still matched inside the longer name, and one spelling of France remains
+    assert index.find("France after World War II") == ["france", "World War"]
+    assert len(index) == 2
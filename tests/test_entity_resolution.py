@@ -0,0 +1,26 @@
+import pandas as pd
+from src.entity_resolution import resolve_graph
+from src.storage import write_table, read_table, GRAPH_SCHEMA
+
+
+def test_resolves_a_frame_read_back_from_parquet(tmp_path):
+    df = pd.DataFrame({
+        "node_1": ["Germany", "germany", "France", "Allies"],
+        "node_2": ["France", "France", "Germany", "Allies"],
+        "edge": ["declared war on", "declared war on", "fought", "includes"],
+        "entity": ["country", "country", "country", "group"],
+        "importance": [3, 5, 2, 1],
+        "category": ["war", "war", "war", "alliance"],
+        "count": [1, 1, 1, 1],
+    })
+    path = str(tmp_path / "graph.parquet")
+    write_table(df, path, GRAPH_SCHEMA)
+    stored = read_table(path)
+    assert isinstance(stored["node_1"].dtype, pd.CategoricalDtype)
+
+    resolved = resolve_graph(stored)
+
+    # The self-loop is dropped and the two spellings of the same edge are merged
+    assert len(resolved) == 2
+    merged = resolved[resolved["edge"] == "declared war on"].iloc[0]
+    assert (merged["count"], merged["importance"]) == (2, 5)
@@ -0,0 +1,47 @@
+from src.extraction_parser import parse_edges
+
+COMPLETE = '[{"node_1": "A", "node_2": "B", "edge": "x"}, {"node_1": "A", "node_2": "C", '
+
+
+def truncated(tail: str):
+    parser = parse_edges(COMPLETE + tail)
+    return parser, [edge for _, edge in parser.edges[1:]]
+
+
+def test_complete_value_without_closing_brace_is_recovered():
+    parser, edges = truncated('"edge": "y"')
+    assert [(edge["node_2"], edge["edge"]) for edge in edges] == [("C", "y")]
+    assert parser.stats() == {"recovered": 2, "repaired": 1, "dropped": 0}
+
+
+def test_value_cut_off_mid_string_is_not_trusted():
+    parser, edges = truncated('"edge": "y')
+    assert edges == []
+    assert parser.stats()["dropped"] == 1
+
+    # The same cut in an optional field only loses that field
+    parser, edges = truncated('"edge": "y", "entity": "Cou')
+    assert [(edge["edge"], edge["entity"]) for edge in edges] == [("y", None)]
+    assert parser.stats()["dropped"] == 0
+
+
+def test_complete_pairs_after_the_required_fields_are_kept():
+    parser, edges = truncated('"edge": "y", "entity": "A"')
+    assert [(edge["edge"], edge["entity"]) for edge in edges] == [("y", "A")]
+    assert parser.stats()["dropped"] == 0
+
+
+def test_dangling_key_is_removed():
+    for tail in ('"edge": "y", "entity"', '"edge": "y", "entity":', '"edge": "y", "ent'):
+        parser, edges = truncated(tail)
+        assert [(edge["edge"], edge["entity"]) for edge in edges] == [("y", None)], tail
+
+
+def test_only_closed_top_level_values_count_as_complete():
+    edge = '{"node_1": "A", "node_2": "B", "edge": "x"}'
+    for tail in ('"c1": ', f'"c1": {{"nodes": [{edge}, ', f'"c1": {{"nodes": [{edge}]'):
+        parser = parse_edges(f'{{"c0": {{"nodes": [{edge}]}}, {tail}')
+        assert parser.closed_keys == ["c0"], tail
+
+    parser = parse_edges(f'{{"c0": {{"nodes": [{edge}]}}, "c1": {{"nodes": []}}}}')
+    assert parser.closed_keys == ["c0", "c1"]
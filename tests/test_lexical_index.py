@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+
+from src.lexical_index import LexicalIndex
+
+
+def chunks(texts: dict) -> pd.DataFrame:
+    return pd.DataFrame({"chunk_id": list(texts), "Source": "doc.txt", "Page Content": list(texts.values())})
+
+
+def test_removed_chunks_do_not_count_towards_document_frequency(tmp_path):
+    index = LexicalIndex(str(tmp_path / "index"))
+    index.add(chunks({f"c{i}": "Verdun artillery" for i in range(5)}))
+    index.add(chunks({"d0": "Verdun treaty"}))
+    index.remove([f"c{i}" for i in range(5)])
+
+    _, doc_freq, n_docs, _ = index._snapshot
+    assert n_docs == 1
+    assert doc_freq.max() == 1
+    hits = index.search("Verdun treaty")
+    assert [hit["chunk_id"] for hit in hits] == ["d0"]
+    assert np.isfinite(hits[0]["score"]) and hits[0]["score"] > 0
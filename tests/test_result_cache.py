@@ -0,0 +1,20 @@
+from src.create_graph import ResultCache
+
+
+def test_version_reset_drops_entries_from_the_old_graph():
+    cache = ResultCache()
+    cache.put("MATCH (n) RETURN n", None, 5, ["old graph"])
+    assert cache.get("MATCH (n) RETURN n", None, 5) == ["old graph"]
+
+    # The graph is reset and its version restarts lower, then climbs back to 5
+    assert cache.get("MATCH (n) RETURN n", None, 1) is None
+    cache.put("MATCH (n) RETURN n", None, 1, ["new graph"])
+    assert cache.get("MATCH (n) RETURN n", None, 1) == ["new graph"]
+    assert cache.get("MATCH (n) RETURN n", None, 5) is None
+
+
+def test_result_read_before_a_write_is_not_stored():
+    cache = ResultCache()
+    assert cache.get("MATCH (n) RETURN n", None, 2) is None
+    cache.put("MATCH (n) RETURN n", None, 1, ["stale"])
+    assert cache.get("MATCH (n) RETURN n", None, 2) is None
@@ -0,0 +1,25 @@
+import pandas as pd
+
+from src.entity_resolution import resolve_graph
+from src.streaming_pipeline import normalize_result
+
+RESULT = {"nodes": [
+    {"node_1": "Germany", "node_2": "France", "edge": "declared war on", "importance": 2},
+    {"node_1": "Germany", "node_2": "France", "edge": "Declared war on", "importance": 4},
+    {"node_1": "Germany", "node_2": "Belgium", "edge": "invaded", "importance": 5},
+    {"node_1": "Germany", "node_2": "Germany", "edge": "mobilised", "importance": 3},
+]}
+
+
+def test_streaming_rows_carry_the_batch_path_weights():
+    rows = normalize_result(RESULT, "c1", "doc.txt", "llama3@v1")
+    streamed = {(row["node_1"], row["node_2"]): (row["count"], row["importance"], row["chunk_counts"])
+                for row in rows}
+
+    df = pd.DataFrame([{**edge, "entity": None, "category": None, "chunk_id": "c1", "source": "doc.txt"}
+                       for edge in RESULT["nodes"]])
+    resolved = resolve_graph(df)
+    batch = {(row.node_1, row.node_2): (row.count, row.importance, row.chunk_counts)
+             for row in resolved.itertuples(index=False)}
+
+    assert streamed == batch == {("Germany", "France"): (2, 4, [2]), ("Germany", "Belgium"): (1, 5, [1])}